@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from account.models import User, normalize_store_name
+
+
+class Command(BaseCommand):
+    help = "Fill User.store_key for users saved before the column existed."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of users updated per query.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        batch = []
+        updated = 0
+
+        for user in User.objects.only("id", "store_name", "store_key").iterator(
+            chunk_size=batch_size
+        ):
+            store_key = normalize_store_name(user.store_name)
+            if user.store_key != store_key:
+                user.store_key = store_key
+                batch.append(user)
+            if len(batch) >= batch_size:
+                updated += User.objects.bulk_update(batch, ["store_key"])
+                batch = []
+
+        if batch:
+            updated += User.objects.bulk_update(batch, ["store_key"])
+
+        self.stdout.write(self.style.SUCCESS(f"Updated {updated} store keys."))
@@ -29,10 +29,18 @@ class UserManager(BaseUserManager):
         return self.create_user(email, store_name, password, **extra_fields)
 
 
+def normalize_store_name(store_name):
+    """Case-insensitive lookup key for a store name."""
+    return (store_name or "").strip().casefold()
+
+
 class User(AbstractBaseUser, PermissionsMixin):
     email = models.EmailField(unique=True)
     full_name = models.CharField(max_length=200, blank=True, null=True)
     store_name = models.CharField(max_length=255, unique=True)
+    # normalize_store_name(store_name), maintained on save so public lookups
+    # can use an exact match on an index instead of store_name__iexact
+    store_key = models.CharField(max_length=255, unique=True, null=True, editable=False)
     niche = models.CharField(max_length=200, blank=True, null=True, db_index=True)
     location = models.CharField(max_length=200, null=True, blank=True)
     slug = AutoSlugField(
@@ -51,6 +59,32 @@ class User(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ["store_name"]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Absent when store_name was deferred
+        instance._loaded_store_name = instance.__dict__.get("store_name")
+        return instance
+
+    def store_name_changed(self):
+        if "store_name" not in self.__dict__:
+            return False
+        if self._state.adding:
+            return True
+        # Rows saved before store_key existed have none yet
+        if "store_key" in self.__dict__ and self.store_key is None:
+            return True
+        return self.store_name != getattr(self, "_loaded_store_name", None)
+
+    def save(self, *args, **kwargs):
+        if self.store_name_changed():
+            self.store_key = normalize_store_name(self.store_name)
+            update_fields = kwargs.get("update_fields")
+            if update_fields is not None and "store_name" in update_fields:
+                kwargs["update_fields"] = {*update_fields, "store_key"}
+        super().save(*args, **kwargs)
+        self._loaded_store_name = self.__dict__.get("store_name")
+
     def __str__(self):
         return self.email
 
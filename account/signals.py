@@ -1,6 +1,7 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, pre_save, post_delete
 from django.dispatch import receiver
-from .models import User, UserProfile
+from utils.stores import store_resolver
+from .models import User, UserProfile, normalize_store_name
 
 
 @receiver(post_save, sender=User)
@@ -12,3 +13,31 @@ def create_vendor_profile(sender, instance, created, **kwargs):
             full_name=instance.full_name,
             email=instance.email,
         )
+
+
+@receiver(pre_save, sender=User)
+def remember_previous_store_key(sender, instance, **kwargs):
+    loaded = getattr(instance, "_loaded_store_name", None)
+    if not instance.pk or not instance.store_name_changed():
+        # The name keeps its key, invalidated as the current one
+        instance._previous_store_key = None
+    elif loaded is not None:
+        instance._previous_store_key = normalize_store_name(loaded)
+    else:
+        instance._previous_store_key = (
+            User.objects.filter(pk=instance.pk)
+            .values_list("store_key", flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_store_resolver(sender, instance, **kwargs):
+    # Renames, deactivations and new signups all change what a name resolves to
+    # (store_key is absent when deferred: the name did not change)
+    store_resolver.invalidate(
+        instance.__dict__.get("store_key"),
+        getattr(instance, "_previous_store_key", None),
+    )
+    store_resolver.invalidate_matching(owner_id=instance.pk)
@@ -1,3 +1,53 @@
 from django.test import TestCase
 
-# Create your tests here.
+from .models import User
+
+
+class StoreKeyTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="key@example.com",
+            store_name="  Key Store ",
+            niche="fashion",
+            password="x",
+        )
+
+    def test_new_user_gets_a_key(self):
+        self.assertEqual(self.user.store_key, "key store")
+
+    def test_rename_updates_the_key(self):
+        user = User.objects.get(pk=self.user.pk)
+        user.store_name = "Renamed Store"
+        user.save(update_fields=["store_name"])
+        user.refresh_from_db()
+        self.assertEqual(user.store_key, "renamed store")
+
+    def test_key_is_kept_when_the_name_is_unchanged(self):
+        # A stale key shows whether save recomputed it
+        User.objects.filter(pk=self.user.pk).update(store_key="stale")
+        user = User.objects.get(pk=self.user.pk)
+        user.full_name = "Key Owner"
+        user.save()
+        user.refresh_from_db()
+        self.assertEqual(user.store_key, "stale")
+
+    def test_missing_key_is_filled_in(self):
+        User.objects.filter(pk=self.user.pk).update(store_key=None)
+        user = User.objects.get(pk=self.user.pk)
+        user.save()
+        user.refresh_from_db()
+        self.assertEqual(user.store_key, "key store")
+
+    def test_save_reads_no_previous_key(self):
+        user = User.objects.get(pk=self.user.pk)
+        user.store_name = "Renamed Store"
+        with self.assertNumQueries(1):
+            user.save(update_fields=["store_name"])
+        self.assertEqual(user._previous_store_key, "key store")
+
+    def test_deferred_name_is_not_loaded(self):
+        user = User.objects.only("id", "full_name").get(pk=self.user.pk)
+        user.full_name = "Key Owner"
+        with self.assertNumQueries(1):
+            user.save()
+        self.assertNotIn("store_name", user.__dict__)
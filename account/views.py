@@ -6,7 +6,7 @@ from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from .serializers import UserSerializer, UserProfileSerializer
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from .models import User
+from .models import User, normalize_store_name
 import logging
 
 
@@ -33,7 +33,7 @@ class SignUpView(generics.CreateAPIView):
             )
 
         # Check if store_name exists
-        if User.objects.filter(store_name=store_name).exists():
+        if User.objects.filter(store_key=normalize_store_name(store_name)).exists():
             return Response(
                 {"error": "This store name already exists"},
                 status=status.HTTP_400_BAD_REQUEST,
@@ -63,6 +63,8 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
+    "public.middleware.TenantMiddleware",
+    "public.middleware.ReadReplicaMiddleware",
     "django.middleware.http.ConditionalGetMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
@@ -90,11 +92,19 @@ WSGI_APPLICATION = "core.wsgi.application"
 
 # Database configuration
 if DEBUG:
+    # The replica is the primary's own file; tests get two separate files.
+    # utils.sqlite_backend lets filters on boolean columns use indexes.
     DATABASES = {
         "default": {
-            "ENGINE": "django.db.backends.sqlite3",
+            "ENGINE": "utils.sqlite_backend",
             "NAME": BASE_DIR / "db.sqlite3",
-        }
+            "TEST": {"NAME": BASE_DIR / "test_db.sqlite3"},
+        },
+        "replica": {
+            "ENGINE": "utils.sqlite_backend",
+            "NAME": BASE_DIR / "db.sqlite3",
+            "TEST": {"NAME": BASE_DIR / "test_db.replica.sqlite3"},
+        },
     }
 else:
     DATABASES = {
@@ -110,6 +120,26 @@ else:
             },
         }
     }
+    if os.getenv("DB_REPLICA_HOST"):
+        DATABASES["replica"] = {
+            **DATABASES["default"],
+            "HOST": get_env_variable("DB_REPLICA_HOST"),
+            "PORT": get_env_variable("DB_REPLICA_PORT", DATABASES["default"]["PORT"]),
+        }
+
+# Read replica
+# Safe-method requests to public views read from DATABASE_REPLICA_ALIAS,
+# see utils.replicas. A client that wrote, and every reader of a store
+# edited, stays on the primary for DATABASE_REPLICA_LAG seconds.
+DATABASE_ROUTERS = ["utils.replicas.ReplicaRouter"]
+DATABASE_REPLICA_ALIAS = "replica"
+DATABASE_REPLICA_ROUTING = (
+    get_env_variable("DATABASE_REPLICA_ROUTING", "false" if DEBUG else "true").lower()
+    == "true"
+)
+DATABASE_REPLICA_VIEWS = ["public."]
+DATABASE_REPLICA_LAG = 5
+DATABASE_REPLICA_COOKIE = "primary_pin"
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -142,9 +172,23 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 
 
 # Media files
+# Uploads are named by content hash (utils.storage.ContentAddressedStorage),
+# so identical files are stored once and can be cached as immutable.
 if DEBUG:
     MEDIA_URL = "/media/"
     MEDIA_ROOT = BASE_DIR / "media"
+    STORAGES = {
+        "staticfiles": {
+            "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
+        },
+        "default": {
+            "BACKEND": "utils.storage.ContentAddressedStorage",
+            "OPTIONS": {
+                # Also accepts presigned PUTs, see utils.uploads
+                "backend": "utils.uploads.LocalUploadStorage",
+            },
+        },
+    }
 else:
     STORAGES = {
         "staticfiles": {
@@ -159,18 +203,105 @@ else:
             },
         },
         "default": {
-            "BACKEND": "helper.cloudflare.storages.MediaStorage",
+            "BACKEND": "utils.storage.ContentAddressedStorage",
             "OPTIONS": {
-                "bucket_name": get_env_variable("CLOUDFLARE_R2_BUCKET"),
-                "access_key": get_env_variable("CLOUDFLARE_R2_ACCESS_KEY"),
-                "secret_key": get_env_variable("CLOUDFLARE_R2_SECRETE_KEY"),
-                "endpoint_url": get_env_variable("CLOUDFLARE_R2_BUCKET_ENDPOINT"),
-                "default_acl": "public-read",
-                "signature_version": "s3v4",
+                "backend": "helper.cloudflare.storages.MediaStorage",
+                "options": {
+                    "bucket_name": get_env_variable("CLOUDFLARE_R2_BUCKET"),
+                    "access_key": get_env_variable("CLOUDFLARE_R2_ACCESS_KEY"),
+                    "secret_key": get_env_variable("CLOUDFLARE_R2_SECRETE_KEY"),
+                    "endpoint_url": get_env_variable(
+                        "CLOUDFLARE_R2_BUCKET_ENDPOINT"
+                    ),
+                    "default_acl": "public-read",
+                    "signature_version": "s3v4",
+                    "object_parameters": {
+                        "CacheControl": "public, max-age=31536000, immutable",
+                    },
+                },
             },
         },
     }
 
+# Caching
+# "default" backs store content versions, "responses" holds rendered public
+# responses. Both evict least recently used entries once MAX_ENTRIES is hit.
+REDIS_URL = get_env_variable("REDIS_URL", "")
+if REDIS_URL:
+    # Configure the server with maxmemory and maxmemory-policy allkeys-lru
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        },
+        "responses": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+            "KEY_PREFIX": "responses",
+        },
+    }
+elif DEBUG:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "default",
+        },
+        "responses": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "responses",
+            "OPTIONS": {"MAX_ENTRIES": 500},
+        },
+    }
+else:
+    # File-based so that every worker process shares the same entries
+    CACHES = {
+        "default": {
+            "BACKEND": "utils.cache_backends.LRUFileBasedCache",
+            "LOCATION": BASE_DIR / "cache" / "default",
+            "OPTIONS": {"MAX_ENTRIES": 10000},
+        },
+        "responses": {
+            "BACKEND": "utils.cache_backends.LRUFileBasedCache",
+            "LOCATION": BASE_DIR / "cache" / "responses",
+            "OPTIONS": {"MAX_ENTRIES": 5000},
+        },
+    }
+
+RESPONSE_CACHE_ALIAS = "responses"
+RESPONSE_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Product search
+# "auto" uses SQLite FTS5 or MySQL FULLTEXT depending on the database, and
+# falls back to product.search.InMemorySearchBackend otherwise.
+PRODUCT_SEARCH_BACKEND = get_env_variable("PRODUCT_SEARCH_BACKEND", "auto")
+PRODUCT_SEARCH_LIMIT = 1000
+
+# Storefront tenants
+# Requests to <store>.sellexplore.shop (or <store>.localhost in development)
+# are resolved to that store by public.middleware.TenantMiddleware
+TENANT_HOST_SUFFIXES = [".sellexplore.shop", ".localhost"]
+TENANT_RESERVED_SUBDOMAINS = ["www", "api"]
+
+# Image derivatives
+# Resized variants generated off the request thread for every uploaded image
+IMAGE_DERIVATIVE_WIDTHS = [320, 640, 1024, 1600]
+IMAGE_DERIVATIVE_FORMATS = ["webp", "jpeg"]
+# 0 generates derivatives inline, right after the upload commits
+IMAGE_DERIVATIVE_WORKERS = int(get_env_variable("IMAGE_DERIVATIVE_WORKERS", "2"))
+# Concurrent storage uploads per multi-image request
+IMAGE_UPLOAD_WORKERS = 4
+
+# Direct uploads
+# Clients PUT files straight to storage with a presigned URL, then finalize
+UPLOAD_TICKET_MAX_AGE = 60 * 15
+UPLOAD_MAX_SIZE = 10 * 1024 * 1024
+
+# Bulk product import and export
+# Rows validated and inserted per transaction
+PRODUCT_IMPORT_CHUNK_SIZE = 500
+# Products fetched per query, with their images and options, when exporting
+PRODUCT_EXPORT_CHUNK_SIZE = 500
+
 # Custom user model
 AUTH_USER_MODEL = "account.User"
 
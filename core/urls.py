@@ -6,6 +6,8 @@ from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
 )
+from utils.storage import serve_media
+from utils.uploads import local_upload
 
 
 urlpatterns = [
@@ -19,6 +21,13 @@ urlpatterns = [
     path("api/", include("product.urls")),
 ]
 
+# Presigned upload target of the local storage stand-in, 404 otherwise
+urlpatterns += [
+    path("uploads/local/<str:token>/", local_upload, name="local-upload"),
+]
+
 if settings.DEBUG:
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    urlpatterns += static(
+        settings.MEDIA_URL, view=serve_media, document_root=settings.MEDIA_ROOT
+    )
@@ -31,6 +31,8 @@ class Store(models.Model):
     image_one = models.ImageField(upload_to="", null=True, blank=True)
     image_two = models.ImageField(upload_to="", null=True, blank=True)
     image_three = models.ImageField(upload_to="", null=True, blank=True)
+    # Measurements of the images above, see utils.images
+    image_meta = models.JSONField(default=dict, blank=True, editable=False)
 
     # Social Links
     twitter = models.CharField(max_length=255, blank=True, null=True)
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from utils.images import ImageMetaField
 from .models import Store, StoreFAQ
 
 
@@ -10,6 +11,9 @@ class StoreFAQSerializer(serializers.ModelSerializer):
 
 class StoreSerializer(serializers.ModelSerializer):
     faqs = StoreFAQSerializer(many=True, read_only=True)
+    image_one_meta = ImageMetaField("image_one")
+    image_two_meta = ImageMetaField("image_two")
+    image_three_meta = ImageMetaField("image_three")
 
     class Meta:
         model = Store 
@@ -28,6 +32,9 @@ class StoreSerializer(serializers.ModelSerializer):
             "image_one",
             "image_two",
             "image_three",
+            "image_one_meta",
+            "image_two_meta",
+            "image_three_meta",
             "twitter",
             "facebook",
             "tiktok",
@@ -1,6 +1,14 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
 from account.models import User
+from utils.stores import store_resolver
+from utils.images import capture_image_meta
+from utils.storage import (
+    claim_new_blobs,
+    release_deleted_blobs,
+    release_replaced_blobs,
+    remember_blobs,
+)
 from .models import Store
 
 
@@ -9,8 +17,35 @@ def create_vendor_profile(sender, instance, created, **kwargs):
 
     if created:
         Store.objects.create(
-            user=instance,
+            user=instance.profile,
+            name=instance.store_name,
         )
 
 
+@receiver(post_save, sender=Store)
+def invalidate_new_store_tenant(sender, instance, created, **kwargs):
+    # The resolved tenant carries the store id
+    if created:
+        store_resolver.invalidate_matching(owner_id=instance.user.user_id)
+
+
+@receiver(post_delete, sender=Store)
+def invalidate_deleted_store_tenant(sender, instance, **kwargs):
+    store_resolver.invalidate_matching(store_id=instance.pk)
+
+
+@receiver(pre_save, sender=Store)
+def prepare_image_fields(sender, instance, update_fields=None, **kwargs):
+    remember_blobs(instance, update_fields)
+    claim_new_blobs(instance, update_fields)
+    capture_image_meta(instance, update_fields)
+
+
+@receiver(post_save, sender=Store)
+def release_replaced_image_blobs(sender, instance, **kwargs):
+    release_replaced_blobs(instance)
+
 
+@receiver(post_delete, sender=Store)
+def release_deleted_image_blobs(sender, instance, **kwargs):
+    release_deleted_blobs(instance)
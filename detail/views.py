@@ -2,6 +2,7 @@ from rest_framework import status, permissions
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.shortcuts import get_object_or_404
+from utils.storage import atomic_with_uploads
 
 from .models import Store, StoreFAQ
 from .serializers import StoreSerializer, StoreFAQSerializer
@@ -17,6 +18,7 @@ class StoreView(APIView):
         serializer = StoreSerializer(store, context={"request": request})
         return Response(serializer.data)
 
+    @atomic_with_uploads
     def put(self, request):
         """Update store details"""
         profile = request.user.profile
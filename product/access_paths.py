@@ -0,0 +1,76 @@
+from collections import namedtuple
+
+from .models import Product
+
+
+def newest_products(owner_id):
+    """A store's products, newest first (product_owner_created_idx)."""
+    return Product.objects.filter(owner_id=owner_id).order_by("-created_at")
+
+
+def owner_product_list(owner_id):
+    """An owner's dashboard product list (product_owner_created_idx)."""
+    return Product.objects.filter(owner_id=owner_id).order_by("-created_at", "-id")
+
+
+def featured_products(owner_id, limit=20):
+    """A store's first featured products (product_owner_featured_idx)."""
+    return Product.objects.filter(owner_id=owner_id, featured=True).order_by("id")[
+        :limit
+    ]
+
+
+def recent_products(owner_id, limit=20):
+    """A store's products flagged recent, newest first (product_owner_recent_idx)."""
+    return Product.objects.filter(owner_id=owner_id, recent=True).order_by(
+        "-created_at", "-id"
+    )[:limit]
+
+
+def hot_deal_products(owner_id, limit=20):
+    """A store's hot deals, newest first (product_owner_hot_deal_idx)."""
+    return Product.objects.filter(owner_id=owner_id, hot_deal=True).order_by(
+        "-created_at", "-id"
+    )[:limit]
+
+
+# The product queries of the storefront and dashboard, as the views build
+# them. `build(owner_id, category_slug)` returns the queryset; every one
+# must be answered from `index`, one of Product.Meta.indexes, without a
+# scan or a sort.
+AccessPath = namedtuple("AccessPath", ["name", "index", "build"])
+
+ACCESS_PATHS = (
+    AccessPath(
+        "newest",
+        "product_owner_created_idx",
+        lambda owner_id, slug: newest_products(owner_id)[:10],
+    ),
+    AccessPath(
+        "newest in category",
+        "product_owner_category_idx",
+        lambda owner_id, slug: newest_products(owner_id).filter(category__slug=slug)[
+            :10
+        ],
+    ),
+    AccessPath(
+        "featured",
+        "product_owner_featured_idx",
+        lambda owner_id, slug: featured_products(owner_id),
+    ),
+    AccessPath(
+        "recent",
+        "product_owner_recent_idx",
+        lambda owner_id, slug: recent_products(owner_id),
+    ),
+    AccessPath(
+        "hot deals",
+        "product_owner_hot_deal_idx",
+        lambda owner_id, slug: hot_deal_products(owner_id),
+    ),
+    AccessPath(
+        "owner list",
+        "product_owner_created_idx",
+        lambda owner_id, slug: owner_product_list(owner_id)[:20],
+    ),
+)
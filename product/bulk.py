@@ -0,0 +1,84 @@
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers
+from public.versioning import bump_store_version
+from .models import Product
+
+
+# Fields that can be changed on many products in one request
+BULK_UPDATE_FIELDS = [
+    "price",
+    "discount_price",
+    "quantity",
+    "availability",
+    "hot_deal",
+    "featured",
+    "recent",
+]
+
+
+class BulkProductChangeSerializer(serializers.ModelSerializer):
+    """One `{id, ...fields}` entry of a bulk update; fields are optional."""
+
+    id = serializers.IntegerField()
+
+    class Meta:
+        model = Product
+        fields = ["id"] + BULK_UPDATE_FIELDS
+        extra_kwargs = {field: {"required": False} for field in BULK_UPDATE_FIELDS}
+
+    def validate(self, attrs):
+        if len(attrs) == 1:
+            raise serializers.ValidationError(
+                f"Give at least one of {', '.join(BULK_UPDATE_FIELDS)}."
+            )
+        return attrs
+
+
+class BulkProductUpdateSerializer(serializers.ListSerializer):
+    child = BulkProductChangeSerializer()
+
+    def validate(self, attrs):
+        ids = [change["id"] for change in attrs]
+        if len(set(ids)) != len(ids):
+            raise serializers.ValidationError("Each product can appear only once.")
+        return attrs
+
+
+def bulk_update_products(owner, changes):
+    """
+    Apply validated `changes` to the owner's products in one transaction:
+    one query checks ownership, one UPDATE writes every row. Returns the
+    updated products, or raises ValidationError naming the ids that are
+    not the owner's.
+    """
+    ids = [change["id"] for change in changes]
+    with transaction.atomic():
+        # Rows are locked: fields a change leaves alone are written back too
+        products = (
+            Product.objects.select_for_update()
+            .filter(owner=owner, id__in=ids)
+            .only("id", "owner", *BULK_UPDATE_FIELDS)
+        )
+        products = {product.id: product for product in products}
+        missing = [pk for pk in ids if pk not in products]
+        if missing:
+            raise serializers.ValidationError(
+                {"id": [f"Products not found: {missing}."]}
+            )
+
+        # bulk_update skips save(), so auto_now has to be applied by hand
+        now = timezone.now()
+        fields = {"updated_at"}
+        for change in changes:
+            product = products[change["id"]]
+            for field, value in change.items():
+                if field != "id":
+                    setattr(product, field, value)
+                    fields.add(field)
+            product.updated_at = now
+
+        Product.objects.bulk_update(products.values(), sorted(fields))
+        # No post_save per row: bump the store's content version once
+        bump_store_version(owner.pk)
+    return [products[pk] for pk in ids]
@@ -0,0 +1,81 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from .models import Category, CategoryProductCount, Product
+
+
+def adjust_category_counts(owner_id, deltas):
+    """Apply `{category_id: delta}` to an owner's category counters."""
+    for category_id, delta in deltas.items():
+        if category_id is None or not delta:
+            continue
+        counters = CategoryProductCount.objects.filter(
+            owner_id=owner_id, category_id=category_id
+        )
+        if counters.update(count=Greatest(F("count") + delta, Value(0))) or delta < 0:
+            continue
+        try:
+            with transaction.atomic():
+                CategoryProductCount.objects.create(
+                    owner_id=owner_id, category_id=category_id, count=delta
+                )
+        except IntegrityError:
+            # Created by a concurrent write in the meantime
+            counters.update(count=F("count") + delta)
+
+
+def annotate_product_counts(categories, owner_id):
+    """Annotate `product_count`, the owner's products in each category."""
+    counts = CategoryProductCount.objects.filter(
+        owner_id=owner_id, category=OuterRef("pk")
+    ).values("count")[:1]
+    return categories.annotate(product_count=Coalesce(Subquery(counts), 0))
+
+
+def store_categories(owner_id):
+    """The categories an owner has products in, with their product_count."""
+    categories = Category.objects.filter(
+        product_counts__owner_id=owner_id, product_counts__count__gt=0
+    )
+    return annotate_product_counts(categories, owner_id).order_by("name")
+
+
+def reconcile_category_counts(owner_ids=None):
+    """
+    Rebuild the counters from the products, for every owner or only
+    `owner_ids`. Returns the number of counters created, fixed or deleted.
+    """
+    products = Product.objects.filter(category__isnull=False)
+    counters = CategoryProductCount.objects.all()
+    if owner_ids is not None:
+        products = products.filter(owner_id__in=owner_ids)
+        counters = counters.filter(owner_id__in=owner_ids)
+
+    actual = {
+        (row["owner_id"], row["category_id"]): row["count"]
+        for row in products.values("owner_id", "category_id")
+        .annotate(count=Count("id"))
+        .order_by()
+    }
+
+    with transaction.atomic():
+        stale = []
+        missing = dict(actual)
+        extra = []
+        for counter in counters.select_for_update():
+            key = (counter.owner_id, counter.category_id)
+            count = missing.pop(key, None)
+            if count is None:
+                extra.append(counter.pk)
+            elif counter.count != count:
+                counter.count = count
+                stale.append(counter)
+
+        CategoryProductCount.objects.bulk_update(stale, ["count"])
+        CategoryProductCount.objects.bulk_create(
+            CategoryProductCount(owner_id=owner_id, category_id=category_id, count=count)
+            for (owner_id, category_id), count in missing.items()
+        )
+        CategoryProductCount.objects.filter(pk__in=extra).delete()
+
+    return len(stale) + len(missing) + len(extra)
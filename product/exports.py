@@ -0,0 +1,121 @@
+import csv
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+from utils.media import MediaURLBuilder
+from .models import Product, ProductImage, ProductOptions
+
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+}
+
+# Same columns as the import accepts, so an export can be imported again
+EXPORT_FIELDS = [
+    "id",
+    "name",
+    "category",
+    "description",
+    "price",
+    "discount_price",
+    "quantity",
+    "availability",
+    "hot_deal",
+    "featured",
+    "recent",
+    "extra_info",
+    "options",
+    "images",
+]
+
+
+def export_queryset(owner):
+    """The owner's products, loading only the columns an export writes."""
+    product_fields = [
+        field for field in EXPORT_FIELDS if field not in ("category", "options", "images")
+    ]
+    return (
+        Product.objects.filter(owner=owner)
+        .select_related("category")
+        .only(*product_fields, "category__slug")
+        .prefetch_related(
+            Prefetch(
+                "images",
+                queryset=ProductImage.objects.only("product", "image").order_by(
+                    "-is_thumbnail", "id"
+                ),
+            ),
+            Prefetch(
+                "product_options",
+                queryset=ProductOptions.objects.select_related("note").order_by("id"),
+            ),
+        )
+        .order_by("id")
+    )
+
+
+def export_rows(queryset, request=None, chunk_size=None):
+    """
+    Yield one dict per product. Products are fetched `chunk_size` at a
+    time, with images and options prefetched for each chunk, so memory
+    stays flat whatever the size of the catalog.
+    """
+    chunk_size = chunk_size or settings.PRODUCT_EXPORT_CHUNK_SIZE
+    urls = MediaURLBuilder.for_field(ProductImage, "image", request)
+
+    for product in queryset.iterator(chunk_size=chunk_size):
+        yield {
+            "id": product.id,
+            "name": product.name,
+            "category": product.category.slug if product.category else None,
+            "description": product.description,
+            "price": product.price,
+            "discount_price": product.discount_price,
+            "quantity": product.quantity,
+            "availability": product.availability,
+            "hot_deal": product.hot_deal,
+            "featured": product.featured,
+            "recent": product.recent,
+            "extra_info": product.extra_info,
+            "options": [
+                {
+                    "template_name": option.template_name,
+                    "note": option.note.note if option.note else None,
+                    "options": option.options,
+                    "as_template": option.as_template,
+                }
+                for option in product.product_options.all()
+            ],
+            "images": [urls.url(image.image.name) for image in product.images.all()],
+        }
+
+
+class Echo:
+    """File-like object handing back what the csv writer writes to it."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        # Nested values go in as JSON, the way the import reads them back
+        row["options"] = json.dumps(row["options"])
+        row["images"] = json.dumps(row["images"])
+        yield writer.writerow(
+            "" if row[field] is None else row[field] for field in EXPORT_FIELDS
+        )
+
+
+def stream_jsonl(rows):
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder) + "\n"
+
+
+def stream_export(rows, fmt):
+    return stream_csv(rows) if fmt == "csv" else stream_jsonl(rows)
@@ -0,0 +1,200 @@
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from public.versioning import bump_store_version
+from utils.images import public_image_meta, read_image_meta, schedule_derivatives
+from utils.storage import claim_blobs, is_blob_name, release_blobs
+from .models import Product, ProductImage
+
+
+PRIMARY_IMAGE_FIELDS = [
+    "primary_image",
+    "primary_image_path",
+    "primary_image_width",
+    "primary_image_height",
+]
+
+
+def image_dimensions(image):
+    """
+    Return `(width, height)` of a ProductImage from its image_meta, or
+    `(None, None)` until the image has been measured.
+    """
+    meta = public_image_meta(image.image.name, (image.image_meta or {}).get("image"))
+    if meta:
+        return meta["width"], meta["height"]
+    return None, None
+
+
+def refresh_primary_images(product_ids):
+    """
+    Recompute the denormalized primary image of the given products.
+
+    The primary image is the thumbnail, or the oldest image when there is
+    none. Its dimensions come from image_meta; images stored before they
+    were measured get them once the derivative worker records the meta.
+    Returns the number of products updated.
+    """
+    product_ids = {pk for pk in product_ids if pk is not None}
+    if not product_ids:
+        return 0
+
+    primaries = {}
+    images = ProductImage.objects.filter(product_id__in=product_ids).order_by(
+        "product_id", "-is_thumbnail", "id"
+    )
+    for image in images:
+        primaries.setdefault(image.product_id, image)
+
+    changed = []
+    products = Product.objects.filter(pk__in=product_ids).only(
+        "id", *PRIMARY_IMAGE_FIELDS
+    )
+    for product in products:
+        image = primaries.get(product.pk)
+        if image:
+            values = (image, image.image.name, *image_dimensions(image))
+        else:
+            values = (None, "", None, None)
+        current = (
+            product.primary_image_id,
+            product.primary_image_path,
+            product.primary_image_width,
+            product.primary_image_height,
+        )
+        if current == (image.pk if image else None, *values[1:]):
+            continue
+
+        for field_name, value in zip(PRIMARY_IMAGE_FIELDS, values):
+            setattr(product, field_name, value)
+        changed.append(product)
+
+    if changed:
+        Product.objects.bulk_update(changed, PRIMARY_IMAGE_FIELDS)
+    return len(changed)
+
+
+class ImageUploadError(Exception):
+    """Raised when a batch of images could not be stored; nothing was kept."""
+
+
+def store_image_file(field, instance, file):
+    """Measure an uploaded file, then store it. Returns `(name, meta entry)`."""
+    try:
+        meta = read_image_meta(file)
+    except (OSError, ValueError):
+        meta = None
+    name = field.generate_filename(instance, file.name)
+    name = field.storage.save(name, file, max_length=field.max_length)
+    if meta is not None:
+        meta["source"] = name
+    return name, meta
+
+
+def discard_image_files(storage, names):
+    # Shared blobs are only deleted when no other row uses them
+    release_blobs({name: [] for name in names if is_blob_name(name)})
+    for name in names:
+        if not is_blob_name(name):
+            storage.delete(name)
+
+
+def select_inserted_images(product, images):
+    """
+    Set the keys of just-inserted `images` without INSERT ... RETURNING:
+    per file name, the newest rows of `product`, in insert order.
+    """
+    counts = Counter(image.image.name for image in images)
+    rows = (
+        ProductImage.objects.filter(product=product, image__in=counts)
+        .order_by("-pk")
+        .values_list("pk", "image")
+    )
+    newest = defaultdict(list)
+    for pk, name in rows:
+        if len(newest[name]) < counts[name]:
+            newest[name].append(pk)
+    for image in reversed(images):
+        image.pk = newest[image.image.name].pop(0)
+        image._state.adding = False
+        image._state.db = rows.db
+
+
+def upload_product_images(product, uploads):
+    """
+    Store `uploads`, a list of `(file, is_thumbnail)`, as images of `product`.
+
+    Files are pushed to storage concurrently, then the rows are written
+    with one statement clearing the previous thumbnail and one bulk insert,
+    and read back by name for their keys.
+    If any upload or the insert fails, the stored files are released again
+    and ImageUploadError is raised.
+    """
+    if not uploads:
+        return []
+
+    field = ProductImage._meta.get_field("image")
+    template = ProductImage(product=product)
+    workers = min(settings.IMAGE_UPLOAD_WORKERS, len(uploads))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(store_image_file, field, template, file)
+            for file, _ in uploads
+        ]
+    names, metas, errors = [], [], []
+    for future in futures:
+        try:
+            name, meta = future.result()
+        except Exception as e:
+            errors.append(e)
+        else:
+            names.append(name)
+            metas.append(meta)
+
+    if errors:
+        discard_image_files(field.storage, names)
+        raise ImageUploadError(
+            f"{len(errors)} of {len(uploads)} uploads failed: {errors[0]}"
+        )
+
+    # The last image asked to be the thumbnail is the one
+    thumbnail = max(
+        (i for i, (_, is_thumbnail) in enumerate(uploads) if is_thumbnail), default=None
+    )
+    images = [
+        ProductImage(
+            product=product,
+            image=name,
+            image_meta={"image": meta} if meta else {},
+            is_thumbnail=i == thumbnail,
+        )
+        for i, (name, meta) in enumerate(zip(names, metas))
+    ]
+    try:
+        with transaction.atomic():
+            # A release may have deleted a shared blob since the workers
+            # found it in storage; the lock keeps it until the rows exist
+            missing = set(claim_blobs(names, field.storage))
+            for name, (file, _) in zip(names, uploads):
+                if name in missing:
+                    field.storage.save(name, file, max_length=field.max_length)
+
+            if thumbnail is not None:
+                ProductImage.objects.filter(product=product, is_thumbnail=True).update(
+                    is_thumbnail=False
+                )
+            ProductImage.objects.bulk_create(images)
+            select_inserted_images(product, images)
+    except DatabaseError as e:
+        discard_image_files(field.storage, names)
+        raise ImageUploadError(f"Could not save the images: {e}") from e
+
+    # bulk_create sends no signals: do what the ProductImage receivers do
+    refresh_primary_images([product.pk])
+    bump_store_version(product.owner_id)
+    for image in images:
+        schedule_derivatives(image)
+    return images
@@ -0,0 +1,258 @@
+import codecs
+import csv
+import json
+from collections import Counter
+from itertools import islice
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from rest_framework import serializers
+from public.versioning import bump_store_version
+from utils.db import bulk_create_with_pks
+from .counts import adjust_category_counts
+from .models import Category, OptionsNote, Product, ProductOptions
+from .search import get_search_backend
+
+
+IMPORT_FORMATS = ("csv", "jsonl")
+
+
+class ProductImportOptionSerializer(serializers.Serializer):
+    template_name = serializers.CharField(
+        max_length=200, required=False, allow_null=True, allow_blank=True
+    )
+    note = serializers.CharField(required=False, allow_null=True, allow_blank=True)
+    options = serializers.ListField(required=False, default=list)
+    as_template = serializers.BooleanField(required=False, default=False)
+
+
+class ProductImportSerializer(serializers.ModelSerializer):
+    """One imported row. `category` is a slug, `options` a list of options."""
+
+    category = serializers.SlugField(required=False, allow_blank=True, allow_null=True)
+    options = ProductImportOptionSerializer(many=True, required=False)
+
+    class Meta:
+        model = Product
+        fields = [
+            "name",
+            "category",
+            "description",
+            "price",
+            "discount_price",
+            "quantity",
+            "availability",
+            "hot_deal",
+            "featured",
+            "recent",
+            "extra_info",
+            "options",
+        ]
+
+
+def import_format(filename, requested=None):
+    """The import format named by `requested` or by the file extension."""
+    fmt = (requested or filename.rsplit(".", 1)[-1]).lower()
+    if fmt == "ndjson":
+        fmt = "jsonl"
+    return fmt if fmt in IMPORT_FORMATS else None
+
+
+def read_csv(file):
+    """Yield `(data, error)` per CSV record; `options` holds JSON text."""
+    lines = codecs.iterdecode(file, "utf-8-sig")
+    records = csv.DictReader(lines)
+    while True:
+        try:
+            record = next(records)
+        except StopIteration:
+            return
+        except UnicodeDecodeError:
+            # Nothing after an undecodable line can be trusted
+            yield None, "The file is not UTF-8 encoded; save it as CSV UTF-8."
+            return
+
+        # Empty cells count as missing, so optional columns can stay blank
+        data = {
+            key.strip(): value
+            for key, value in record.items()
+            if key and value not in ("", None)
+        }
+        if "options" in data:
+            try:
+                data["options"] = json.loads(data["options"])
+            except ValueError:
+                yield None, "The options column is not valid JSON."
+                continue
+        yield data, None
+
+
+def read_jsonl(file):
+    """Yield `(data, error)` per non-empty JSON line."""
+    for line in file:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError:
+            yield None, "The line is not valid JSON."
+            continue
+        if not isinstance(data, dict):
+            yield None, "Each line must be a JSON object."
+            continue
+        yield data, None
+
+
+def read_records(file, fmt):
+    """Stream `(row number, data, error)` from an open binary file."""
+    reader = read_csv if fmt == "csv" else read_jsonl
+    for row, (data, error) in enumerate(reader(file), start=1):
+        yield row, data, error
+
+
+class ProductImporter:
+    """
+    Import products for `owner` from a stream of records, one chunk at a
+    time: validate the chunk, resolve its categories in one query, then
+    bulk insert its products, notes and options in one transaction. Rows
+    that fail are reported and skipped; a failing chunk is rolled back and
+    reported as a whole.
+    """
+
+    def __init__(self, owner, chunk_size=None):
+        self.owner = owner
+        self.chunk_size = chunk_size or settings.PRODUCT_IMPORT_CHUNK_SIZE
+        self.created = 0
+        self.errors = []
+
+    def run(self, records):
+        records = iter(records)
+        while True:
+            chunk = list(islice(records, self.chunk_size))
+            if not chunk:
+                break
+            self.import_chunk(chunk)
+
+        if self.created:
+            bump_store_version(self.owner.pk)
+        self.errors.sort(key=lambda error: error["row"])
+        return {"created": self.created, "errors": self.errors}
+
+    def add_error(self, row, errors):
+        if isinstance(errors, str):
+            errors = {"non_field_errors": [errors]}
+        self.errors.append({"row": row, "errors": errors})
+
+    def validate_chunk(self, chunk):
+        valid = []
+        for row, data, error in chunk:
+            if error:
+                self.add_error(row, error)
+                continue
+            serializer = ProductImportSerializer(data=data)
+            if serializer.is_valid():
+                valid.append((row, serializer.validated_data))
+            else:
+                self.add_error(row, serializer.errors)
+        return valid
+
+    def resolve_chunk(self, valid):
+        """Drop rows with unknown categories or clashing template names."""
+        slugs = {data["category"] for _, data in valid if data.get("category")}
+        categories = dict(
+            Category.objects.filter(slug__in=slugs).values_list("slug", "id")
+        )
+
+        template_names = {
+            option["template_name"]
+            for _, data in valid
+            for option in data.get("options", [])
+            if option.get("template_name")
+        }
+        taken = set(
+            ProductOptions.objects.filter(template_name__in=template_names).values_list(
+                "template_name", flat=True
+            )
+        )
+
+        resolved = []
+        for row, data in valid:
+            slug = data.get("category")
+            if slug and slug not in categories:
+                self.add_error(row, {"category": [f"Unknown category '{slug}'."]})
+                continue
+
+            names = [
+                option["template_name"]
+                for option in data.get("options", [])
+                if option.get("template_name")
+            ]
+            clashes = [name for name in names if name in taken]
+            if clashes or len(set(names)) != len(names):
+                self.add_error(
+                    row, {"options": [f"Template name already used: {clashes or names}."]}
+                )
+                continue
+            taken.update(names)
+
+            data["category_id"] = categories.get(slug)
+            resolved.append((row, data))
+        return resolved
+
+    def import_chunk(self, chunk):
+        rows = self.resolve_chunk(self.validate_chunk(chunk))
+        if not rows:
+            return
+
+        products = []
+        for _, data in rows:
+            fields = {
+                key: value
+                for key, value in data.items()
+                if key not in ("category", "options")
+            }
+            products.append(Product(owner=self.owner, **fields))
+
+        try:
+            with transaction.atomic():
+                products = bulk_create_with_pks(
+                    Product.objects.filter(owner=self.owner), products
+                )
+                self.create_options(products, [data for _, data in rows])
+                adjust_category_counts(
+                    self.owner.pk, Counter(product.category_id for product in products)
+                )
+        except DatabaseError as e:
+            for row, _ in rows:
+                self.add_error(row, f"Could not save this row's chunk: {e}")
+            return
+
+        # bulk_create sends no signals: the chunk is counted above and
+        # indexed here explicitly
+        get_search_backend().index(products)
+        self.created += len(products)
+
+    def create_options(self, products, rows):
+        options = []
+        notes = []
+        for product, data in zip(products, rows):
+            for option in data.get("options", []):
+                note = None
+                if option.get("note"):
+                    note = OptionsNote(note=option["note"])
+                    notes.append(note)
+                options.append(
+                    ProductOptions(
+                        product=product,
+                        note=note,
+                        options=option.get("options", []),
+                        as_template=option.get("as_template", False),
+                        template_name=option.get("template_name") or None,
+                    )
+                )
+
+        if notes:
+            bulk_create_with_pks(OptionsNote.objects.all(), notes)
+        if options:
+            ProductOptions.objects.bulk_create(options)
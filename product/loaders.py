@@ -0,0 +1,12 @@
+from .models import Category, ProductImage
+
+
+def load_categories(category_ids):
+    return Category.objects.in_bulk(category_ids)
+
+
+def load_product_images(product_ids):
+    images = {}
+    for image in ProductImage.objects.filter(product_id__in=product_ids).order_by("id"):
+        images.setdefault(image.product_id, []).append(image)
+    return images
@@ -0,0 +1,54 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from utils.images import process_image_meta
+from utils.storage import BLOB_FIELDS
+
+
+class Command(BaseCommand):
+    help = (
+        "Record width, height, size, MIME type and placeholder of every "
+        "stored image that has none yet. Safe to re-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="Number of rows processed in parallel.",
+        )
+
+    def handle(self, *args, **options):
+        self.threaded = options["workers"] > 1
+
+        jobs = []
+        for label in BLOB_FIELDS:
+            model = apps.get_model(label)
+            for pk in model.objects.order_by("pk").values_list("pk", flat=True):
+                jobs.append((model, pk))
+
+        self.stdout.write(f"Checking {len(jobs)} rows...")
+        if self.threaded:
+            with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+                results = list(executor.map(lambda job: self.process(*job), jobs))
+        else:
+            results = [self.process(*job) for job in jobs]
+
+        failed = results.count(False)
+        if failed:
+            self.stdout.write(self.style.WARNING(f"{failed} rows failed."))
+        self.stdout.write(self.style.SUCCESS("Image metadata is up to date."))
+
+    def process(self, model, pk):
+        try:
+            process_image_meta(model, pk)
+            return True
+        except Exception as e:
+            self.stderr.write(f"{model.__name__} {pk}: {e}")
+            return False
+        finally:
+            if self.threaded:
+                close_old_connections()
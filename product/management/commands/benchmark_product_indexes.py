@@ -0,0 +1,106 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from product.access_paths import ACCESS_PATHS
+from product.models import Product
+from utils.seed import seed_categories, seed_store
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a synthetic store and time every storefront access path with "
+        "Product's indexes and with the single owner index they replaced. "
+        "Everything, schema changes included, is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--products",
+            type=int,
+            default=100_000,
+            help="Products of the synthetic store.",
+        )
+        parser.add_argument(
+            "--neighbours",
+            type=int,
+            default=20_000,
+            help="Products of another store sharing the table.",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=20,
+            help="Number of runs per query; the best one is reported.",
+        )
+
+    def handle(self, *args, **options):
+        if not connection.features.can_rollback_ddl:
+            raise CommandError(
+                f"{connection.vendor} cannot roll back index changes; "
+                "run the benchmark on SQLite or PostgreSQL."
+            )
+        if options["products"] < 1:
+            raise CommandError("The store needs at least one product.")
+
+        with transaction.atomic():
+            self.stdout.write(f"Seeding {options['products']} products...")
+            owner = seed_store(
+                "Index Benchmark", options["products"], images=0, options=0, faqs=0
+            )
+            if options["neighbours"]:
+                seed_store(
+                    "Index Benchmark Neighbour",
+                    options["neighbours"],
+                    images=0,
+                    options=0,
+                    faqs=0,
+                )
+            slug = seed_categories(1)[0].slug
+
+            indexed = self.measure(owner.pk, slug, options["repeat"])
+            self.drop_indexes()
+            baseline = self.measure(owner.pk, slug, options["repeat"])
+            transaction.set_rollback(True)
+
+        self.stdout.write(
+            f"{'access path':<22}{'owner index':>14}{'indexes':>12}{'speedup':>10}"
+        )
+        for path in ACCESS_PATHS:
+            before, after = baseline[path.name], indexed[path.name]
+            self.stdout.write(
+                f"{path.name:<22}{before * 1000:>11.2f} ms{after * 1000:>9.2f} ms"
+                f"{before / after:>9.1f}x"
+            )
+
+    def drop_indexes(self):
+        """Swap Product's indexes for the single owner_id index of old."""
+        # Plain DDL: SQLite's schema editor refuses to run inside a transaction
+        quote = connection.ops.quote_name
+        owner_column = Product._meta.get_field("owner").column
+        with connection.cursor() as cursor:
+            for index in Product._meta.indexes:
+                cursor.execute(f"DROP INDEX {quote(index.name)}")
+            cursor.execute(
+                f"CREATE INDEX {quote('product_owner_benchmark')} "
+                f"ON {quote(Product._meta.db_table)} ({quote(owner_column)})"
+            )
+
+    def measure(self, owner_id, slug, repeat):
+        self.analyze()
+        timings = {}
+        for path in ACCESS_PATHS:
+            queryset = path.build(owner_id, slug)
+            best = None
+            for _ in range(repeat):
+                start = time.perf_counter()
+                list(queryset.all())
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            timings[path.name] = best
+        return timings
+
+    def analyze(self):
+        # Fresh statistics, so the planner weighs the indexes it has
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
@@ -0,0 +1,106 @@
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from product.images import refresh_primary_images
+from product.models import ProductImage
+from utils.images import derivative_fields, derivative_name, process_derivatives
+from utils.storage import (
+    BLOB_FIELDS,
+    BLOB_PREFIX,
+    blob_name,
+    blob_references,
+    is_blob_name,
+    unwrap,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Move existing media to content-addressed blob names, so duplicate "
+        "uploads collapse into one file, then delete the old copies."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report what would be moved without changing anything.",
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        storage = unwrap(default_storage)
+
+        blobs = {}  # legacy name -> blob name
+        widths = {}  # legacy name -> widths of its derivatives
+        moved = 0
+        saved_bytes = 0
+        for label, field_names in BLOB_FIELDS.items():
+            model = apps.get_model(label)
+            for field_name in field_names:
+                rows = (
+                    model.objects.exclude(**{field_name: ""})
+                    .exclude(**{f"{field_name}__isnull": True})
+                    .exclude(**{f"{field_name}__startswith": f"{BLOB_PREFIX}/"})
+                    .values_list("pk", field_name)
+                )
+                has_derivatives = field_name in derivative_fields(model)
+                if has_derivatives:
+                    rows = rows.values_list("pk", field_name, "image_derivatives")
+                for pk, name, *derivatives in rows:
+                    entry = (derivatives[0] or {}).get(field_name) if derivatives else None
+                    if entry and entry.get("source") == name:
+                        widths.setdefault(name, set()).update(entry["widths"])
+                    if name not in blobs:
+                        blob = self.store_blob(storage, name, dry_run)
+                        if blob is None:
+                            continue
+                        if blob in blobs.values():
+                            saved_bytes += storage.size(name)
+                        blobs[name] = blob
+                    moved += 1
+                    if not dry_run:
+                        model.objects.filter(pk=pk).update(**{field_name: blobs[name]})
+                        self.refresh_row(model, pk, field_name)
+
+        self.stdout.write(
+            f"{moved} references to {len(blobs)} files point at "
+            f"{len(set(blobs.values()))} blobs, {saved_bytes} bytes of duplicates."
+        )
+        if dry_run:
+            return
+
+        for name in blobs:
+            self.delete_legacy(storage, name, widths.get(name, ()))
+        self.stdout.write(self.style.SUCCESS("Media deduplicated."))
+
+    def store_blob(self, storage, name, dry_run):
+        if not storage.exists(name):
+            self.stderr.write(f"Missing file, skipped: {name}")
+            return None
+        with storage.open(name, "rb") as content:
+            blob = blob_name(name, content)
+            if not dry_run and not storage.exists(blob):
+                storage.save(blob, content)
+        return blob
+
+    def refresh_row(self, model, pk, field_name):
+        # Derived data keyed by the old name follows the row to its blob
+        if model is ProductImage:
+            product_id = model.objects.filter(pk=pk).values_list("product_id", flat=True)
+            refresh_primary_images(product_id)
+        if field_name in derivative_fields(model):
+            process_derivatives(model, pk, [field_name])
+
+    def delete_legacy(self, storage, name, widths):
+        if blob_references(name) or is_blob_name(name):
+            return
+        targets = [name] + [
+            derivative_name(name, width, fmt)
+            for width in widths
+            for fmt in settings.IMAGE_DERIVATIVE_FORMATS
+        ]
+        for target in targets:
+            if storage.exists(target):
+                storage.delete(target)
@@ -0,0 +1,61 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from utils.images import derivative_fields, derivative_models, process_derivatives
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate missing WebP/JPEG derivatives for every image field listed "
+        "in utils.images.DERIVATIVE_FIELDS. Safe to re-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="Number of rows processed in parallel.",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Also re-check storage for rows whose derivatives are recorded.",
+        )
+
+    def handle(self, *args, **options):
+        self.force = options["force"]
+        self.threaded = options["workers"] > 1
+
+        jobs = []
+        for model in derivative_models():
+            field_names = derivative_fields(model)
+            for pk in model.objects.order_by("pk").values_list("pk", flat=True):
+                jobs.append((model, pk, field_names))
+
+        self.stdout.write(f"Checking {len(jobs)} rows...")
+        if self.threaded:
+            with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+                results = list(executor.map(lambda job: self.process(*job), jobs))
+        else:
+            results = [self.process(*job) for job in jobs]
+
+        failed = results.count(False)
+        if failed:
+            self.stdout.write(self.style.WARNING(f"{failed} rows failed."))
+        self.stdout.write(self.style.SUCCESS("Image derivatives are up to date."))
+
+    def process(self, model, pk, field_names):
+        try:
+            if self.force:
+                # Existing files are skipped, only missing ones are rewritten
+                model.objects.filter(pk=pk).update(image_derivatives={})
+            process_derivatives(model, pk, field_names)
+            return True
+        except Exception as e:
+            self.stderr.write(f"{model.__name__} {pk}: {e}")
+            return False
+        finally:
+            if self.threaded:
+                close_old_connections()
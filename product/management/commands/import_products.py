@@ -0,0 +1,45 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from product.imports import IMPORT_FORMATS, ProductImporter, import_format, read_records
+from utils.stores import store_resolver
+
+
+class Command(BaseCommand):
+    help = "Import products into a store from a CSV or JSONL file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("store_name", help="Store the products are imported into.")
+        parser.add_argument("path", help="CSV or JSONL file to import.")
+        parser.add_argument(
+            "--file-format",
+            choices=IMPORT_FORMATS,
+            help="Format of the file, by default taken from its extension.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=None,
+            help="Rows inserted per transaction (PRODUCT_IMPORT_CHUNK_SIZE).",
+        )
+
+    def handle(self, *args, **options):
+        tenant = store_resolver.resolve(options["store_name"])
+        if tenant is None:
+            raise CommandError(f"Store '{options['store_name']}' not found.")
+        owner = get_user_model().objects.get(pk=tenant.owner_id)
+
+        fmt = import_format(options["path"], options["file_format"])
+        if fmt is None:
+            raise CommandError("Pass --file-format for files without a .csv or .jsonl extension.")
+
+        importer = ProductImporter(owner, options["chunk_size"])
+        with open(options["path"], "rb") as file:
+            report = importer.run(read_records(file, fmt))
+
+        for error in report["errors"]:
+            self.stderr.write(f"Row {error['row']}: {error['errors']}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {report['created']} products, {len(report['errors'])} rows failed."
+            )
+        )
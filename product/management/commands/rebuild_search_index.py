@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from product.models import Product
+from product.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuild the product search index from scratch."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of products indexed per batch.",
+        )
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        self.stdout.write(f"Rebuilding search index with {type(backend).__name__}...")
+        backend.rebuild(Product.objects.all(), batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS("Search index rebuilt."))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from product.counts import reconcile_category_counts
+from utils.stores import store_resolver
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-store category product counts from the products."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "store_names",
+            nargs="*",
+            help="Stores to reconcile; every store when omitted.",
+        )
+
+    def handle(self, *args, **options):
+        owner_ids = None
+        if options["store_names"]:
+            owner_ids = []
+            for store_name in options["store_names"]:
+                tenant = store_resolver.resolve(store_name)
+                if tenant is None:
+                    raise CommandError(f"Store '{store_name}' not found.")
+                owner_ids.append(tenant.owner_id)
+
+        changed = reconcile_category_counts(owner_ids)
+        self.stdout.write(self.style.SUCCESS(f"Reconciled {changed} category counts."))
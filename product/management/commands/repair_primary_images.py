@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from product.images import refresh_primary_images
+from product.models import Product
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized primary image of every product."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of products repaired per batch.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        product_ids = Product.objects.order_by("id").values_list("id", flat=True)
+
+        updated = 0
+        batch = []
+        for product_id in product_ids.iterator(chunk_size=batch_size):
+            batch.append(product_id)
+            if len(batch) >= batch_size:
+                updated += refresh_primary_images(batch)
+                batch = []
+        updated += refresh_primary_images(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"Repaired {updated} products."))
@@ -6,6 +6,8 @@ from django.utils.text import slugify
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
     image = models.ImageField(upload_to="category/images/", blank=True, null=True)
+    image_derivatives = models.JSONField(default=dict, blank=True, editable=False)
+    image_meta = models.JSONField(default=dict, blank=True, editable=False)
     slug = models.SlugField(unique=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -27,7 +29,10 @@ class Category(models.Model):
 
 
 class Product(models.Model):
-    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="products")
+    # Indexed as the leading column of every index in Meta.indexes
+    owner = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="products", db_index=False
+    )
     name = models.CharField(max_length=255)
     category = models.ForeignKey(
         Category,
@@ -50,18 +55,90 @@ class Product(models.Model):
     recent = models.BooleanField(default=False)
     extra_info = models.TextField(blank=True)
 
+    # Denormalized display image (thumbnail first, else the oldest image),
+    # kept in sync by ProductImage signals, see product.images
+    primary_image = models.ForeignKey(
+        "ProductImage",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+        editable=False,
+    )
+    primary_image_path = models.CharField(max_length=255, blank=True, editable=False)
+    primary_image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    primary_image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    # Marks the rows of one bulk insert, see utils.db.bulk_create_with_pks
+    insert_batch = models.UUIDField(null=True, blank=True, editable=False, db_index=True)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        # One index per storefront access path, see product.access_paths:
+        # every query filters on the owner and reads newest first or by id
+        indexes = [
+            models.Index(
+                fields=["owner", "-created_at", "-id"],
+                name="product_owner_created_idx",
+            ),
+            models.Index(
+                fields=["owner", "category", "-created_at"],
+                name="product_owner_category_idx",
+            ),
+            models.Index(
+                fields=["owner", "featured", "id"],
+                name="product_owner_featured_idx",
+            ),
+            models.Index(
+                fields=["owner", "recent", "-created_at", "-id"],
+                name="product_owner_recent_idx",
+            ),
+            models.Index(
+                fields=["owner", "hot_deal", "-created_at", "-id"],
+                name="product_owner_hot_deal_idx",
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
 
+class CategoryProductCount(models.Model):
+    """
+    Number of an owner's products in a category.
+
+    Kept current by product.signals (and the bulk import) so category lists
+    can show store-scoped counts without a GROUP BY over every product.
+    `reconcile_category_counts` rebuilds it from the products.
+    """
+
+    owner = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="category_counts"
+    )
+    category = models.ForeignKey(
+        Category, on_delete=models.CASCADE, related_name="product_counts"
+    )
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["owner", "category"], name="unique_category_count"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.owner_id} - {self.category_id}: {self.count}"
+
+
 class ProductImage(models.Model):
     product = models.ForeignKey(
         Product, on_delete=models.CASCADE, related_name="images"
     )
     image = models.ImageField(upload_to="products/images/")
+    image_derivatives = models.JSONField(default=dict, blank=True, editable=False)
+    image_meta = models.JSONField(default=dict, blank=True, editable=False)
     is_thumbnail = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -73,6 +150,8 @@ class ProductImage(models.Model):
 class OptionsNote(models.Model):
 
     note = models.TextField()
+    # Marks the rows of one bulk insert, see utils.db.bulk_create_with_pks
+    insert_batch = models.UUIDField(null=True, blank=True, editable=False, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -102,3 +181,18 @@ class ProductOptions(models.Model):
         return f"{self.product.name} - {'Template: ' + self.template_name if self.as_template else 'Option'}"
 
 
+
+
+class Blob(models.Model):
+    """
+    Lock row of a shared, content-addressed file (see utils.storage).
+
+    Saves that start referencing the file and releases that may delete it
+    both lock this row, so a release never deletes a file a concurrent
+    save has just found in storage and is about to reference.
+    """
+
+    name = models.CharField(max_length=255, unique=True)
+
+    def __str__(self):
+        return self.name
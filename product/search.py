@@ -0,0 +1,399 @@
+import math
+import re
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import DatabaseError, OperationalError, connection
+from django.db.models import Case, IntegerField, Q, When
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or "").lower())
+
+
+class BaseSearchBackend:
+    """
+    Interface of the product search backends.
+
+    `search` returns product ids of one store ranked by relevance, matching
+    every term of the query as a prefix. `index` and `remove` keep the index
+    in step with Product writes; `rebuild` reindexes a queryset in bulk.
+    """
+
+    def search(self, owner_id, query, limit):
+        raise NotImplementedError
+
+    def index(self, products):
+        pass
+
+    def remove(self, product_ids):
+        pass
+
+    def rebuild(self, queryset, batch_size=1000):
+        pass
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    """Development backend built on an SQLite FTS5 virtual table."""
+
+    table = "product_product_fts"
+    # bm25 column weights: a match in the name counts more than in the description
+    ranking = "bm25(product_product_fts, 10.0, 1.0)"
+
+    def ensure_table(self):
+        """Create the FTS table if needed, indexing existing products once."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+                [self.table],
+            )
+            if cursor.fetchone():
+                return
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE {self.table} USING fts5("
+                "name, description, owner_id UNINDEXED, tokenize = 'unicode61')"
+            )
+        from .models import Product
+
+        self.rebuild(Product.objects.all())
+
+    def execute(self, sql, params=(), many=False):
+        try:
+            return self._execute(sql, params, many)
+        except OperationalError:
+            self.ensure_table()
+            return self._execute(sql, params, many)
+
+    def _execute(self, sql, params, many):
+        with connection.cursor() as cursor:
+            if many:
+                cursor.executemany(sql, params)
+                return []
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def search(self, owner_id, query, limit):
+        terms = tokenize(query)
+        if not terms:
+            return []
+        match = " ".join(f'"{term}"*' for term in terms)
+        rows = self.execute(
+            f"SELECT rowid FROM {self.table} "
+            f"WHERE {self.table} MATCH %s AND owner_id = %s "
+            f"ORDER BY {self.ranking} LIMIT %s",
+            [match, owner_id, limit],
+        )
+        return [row[0] for row in rows]
+
+    def index(self, products):
+        rows = [(p.pk, p.name, p.description, p.owner_id) for p in products]
+        if rows:
+            self.remove([row[0] for row in rows])
+            self.execute(
+                f"INSERT INTO {self.table} (rowid, name, description, owner_id) "
+                "VALUES (%s, %s, %s, %s)",
+                rows,
+                many=True,
+            )
+
+    def remove(self, product_ids):
+        product_ids = list(product_ids)
+        if product_ids:
+            self.execute(
+                f"DELETE FROM {self.table} WHERE rowid IN "
+                f"({', '.join(['%s'] * len(product_ids))})",
+                product_ids,
+            )
+
+    def rebuild(self, queryset, batch_size=1000):
+        self.execute(f"DELETE FROM {self.table}")
+        products = queryset.only("id", "owner_id", "name", "description")
+        batch = []
+        for product in products.iterator(chunk_size=batch_size):
+            batch.append(product)
+            if len(batch) >= batch_size:
+                self.index(batch)
+                batch = []
+        self.index(batch)
+
+
+def split_fulltext_terms(terms, min_token_size, stopwords):
+    """
+    Split `terms` into those a FULLTEXT index holds and those it drops:
+    shorter than `min_token_size` or stopwords.
+    """
+    indexed, unindexed = [], []
+    for term in terms:
+        if len(term) < min_token_size or term in stopwords:
+            unindexed.append(term)
+        else:
+            indexed.append(term)
+    return indexed, unindexed
+
+
+class MySQLFullTextBackend(BaseSearchBackend):
+    """
+    Production backend using a MySQL FULLTEXT index on (name, description).
+
+    MySQL maintains the index on every write, so `index`/`remove` are
+    no-ops; `rebuild` creates the index when it is missing. Terms the index
+    drops (shorter than innodb_ft_min_token_size, or stopwords) would
+    never match as required terms: they are matched with `icontains`.
+    """
+
+    index_name = "product_product_name_description_ft"
+
+    def __init__(self):
+        self._token_rules = None
+
+    def token_rules(self):
+        """The server's `(min token size, stopwords)`, read once."""
+        if self._token_rules is None:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT @@innodb_ft_min_token_size, @@innodb_ft_enable_stopword, "
+                    "@@innodb_ft_server_stopword_table"
+                )
+                min_token_size, enabled, table = cursor.fetchone()
+                stopwords = set()
+                if enabled:
+                    if table:
+                        quote = connection.ops.quote_name
+                        schema, name = table.split("/", 1)
+                        cursor.execute(
+                            f"SELECT value FROM {quote(schema)}.{quote(name)}"
+                        )
+                    else:
+                        cursor.execute(
+                            "SELECT value FROM "
+                            "information_schema.INNODB_FT_DEFAULT_STOPWORD"
+                        )
+                    stopwords = {row[0].lower() for row in cursor.fetchall()}
+            self._token_rules = (min_token_size, stopwords)
+        return self._token_rules
+
+    def search(self, owner_id, query, limit):
+        from .models import Product
+
+        terms = tokenize(query)
+        if not terms:
+            return []
+        indexed, unindexed = split_fulltext_terms(terms, *self.token_rules())
+
+        products = Product.objects.filter(owner_id=owner_id)
+        for term in unindexed:
+            products = products.filter(
+                Q(name__icontains=term) | Q(description__icontains=term)
+            )
+        if indexed:
+            against = " ".join(f"+{term}*" for term in indexed)
+            products = (
+                products.annotate(
+                    score=RawSQL(
+                        "MATCH (name, description) AGAINST (%s IN BOOLEAN MODE)",
+                        [against],
+                    )
+                )
+                .filter(score__gt=0)
+                .order_by("-score", "-id")
+            )
+        else:
+            # Nothing to rank on
+            products = products.order_by("-id")
+        return list(products.values_list("id", flat=True)[:limit])
+
+    def rebuild(self, queryset, batch_size=1000):
+        table = queryset.model._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM information_schema.statistics "
+                "WHERE table_schema = DATABASE() AND table_name = %s "
+                "AND index_name = %s",
+                [table, self.index_name],
+            )
+            if cursor.fetchone():
+                cursor.execute(f"OPTIMIZE TABLE {table}")
+            else:
+                cursor.execute(
+                    f"ALTER TABLE {table} ADD FULLTEXT INDEX "
+                    f"{self.index_name} (name, description)"
+                )
+
+
+class InMemorySearchBackend(BaseSearchBackend):
+    """
+    Pure-Python inverted index, used by tests and when no database engine
+    support is available. A store is loaded lazily on its first search.
+    """
+
+    # Same weighting as the FTS backend: name matches count more
+    name_weight = 10
+    description_weight = 1
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self._postings = {}  # term -> {product_id: weight}
+        self._terms = []  # sorted vocabulary, for prefix lookups
+        self._documents = {}  # product_id -> (owner_id, terms)
+        self._loaded_owners = set()
+
+    def search(self, owner_id, query, limit):
+        terms = tokenize(query)
+        if not terms:
+            return []
+        self._load_owner(owner_id)
+
+        with self._lock:
+            total = max(len(self._documents), 1)
+            scores = None
+            for term in terms:
+                term_scores = defaultdict(float)
+                for word in self._expand(term):
+                    postings = self._postings.get(word, {})
+                    idf = math.log(1 + total / len(postings)) if postings else 0
+                    for product_id, weight in postings.items():
+                        if self._documents[product_id][0] == owner_id:
+                            term_scores[product_id] += weight * idf
+                if scores is None:
+                    scores = dict(term_scores)
+                else:
+                    scores = {
+                        pk: score + term_scores[pk]
+                        for pk, score in scores.items()
+                        if pk in term_scores
+                    }
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], -item[0]))
+        return [product_id for product_id, _ in ranked[:limit]]
+
+    def _expand(self, prefix):
+        start = bisect_left(self._terms, prefix)
+        for word in self._terms[start:]:
+            if not word.startswith(prefix):
+                break
+            yield word
+
+    def _load_owner(self, owner_id):
+        if owner_id in self._loaded_owners:
+            return
+        from .models import Product
+
+        self.index(
+            Product.objects.filter(owner_id=owner_id).only(
+                "id", "owner_id", "name", "description"
+            )
+        )
+        with self._lock:
+            self._loaded_owners.add(owner_id)
+
+    def index(self, products):
+        for product in products:
+            weights = defaultdict(int)
+            for term in tokenize(product.name):
+                weights[term] += self.name_weight
+            for term in tokenize(product.description):
+                weights[term] += self.description_weight
+
+            with self._lock:
+                self._remove(product.pk)
+                self._documents[product.pk] = (product.owner_id, set(weights))
+                for term, weight in weights.items():
+                    if term not in self._postings:
+                        self._postings[term] = {}
+                        self._terms.insert(bisect_left(self._terms, term), term)
+                    self._postings[term][product.pk] = weight
+
+    def remove(self, product_ids):
+        with self._lock:
+            for product_id in product_ids:
+                self._remove(product_id)
+
+    def _remove(self, product_id):
+        document = self._documents.pop(product_id, None)
+        if document is None:
+            return
+        for term in document[1]:
+            self._postings[term].pop(product_id, None)
+
+    def rebuild(self, queryset, batch_size=1000):
+        with self._lock:
+            self.clear()
+        self.index(
+            queryset.only("id", "owner_id", "name", "description").iterator(
+                chunk_size=batch_size
+            )
+        )
+        with self._lock:
+            self._loaded_owners.update(self._owner_ids())
+
+    def _owner_ids(self):
+        return {owner_id for owner_id, _ in self._documents.values()}
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def default_backend_path():
+    if connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA compile_options")
+            options = {row[0] for row in cursor.fetchall()}
+        if "ENABLE_FTS5" in options:
+            return "product.search.SQLiteFTSBackend"
+    elif connection.vendor == "mysql":
+        return "product.search.MySQLFullTextBackend"
+    return "product.search.InMemorySearchBackend"
+
+
+def get_search_backend():
+    """Return the backend named by PRODUCT_SEARCH_BACKEND ("auto" picks by database)."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                path = getattr(settings, "PRODUCT_SEARCH_BACKEND", "auto")
+                if path == "auto":
+                    path = default_backend_path()
+                _backend = import_string(path)()
+    return _backend
+
+
+def reset_search_backend():
+    global _backend
+    with _backend_lock:
+        _backend = None
+
+
+def search_products(queryset, owner_id, query):
+    """
+    Restrict `queryset` to the store's products matching `query`, ordered
+    by relevance.
+    """
+    limit = getattr(settings, "PRODUCT_SEARCH_LIMIT", 1000)
+    try:
+        product_ids = get_search_backend().search(owner_id, query, limit)
+    except DatabaseError:
+        # e.g. the FULLTEXT index has not been created yet
+        return queryset.filter(
+            Q(name__icontains=query) | Q(description__icontains=query)
+        )
+
+    if not product_ids:
+        return queryset.none()
+
+    ranking = Case(
+        *[When(pk=pk, then=position) for position, pk in enumerate(product_ids)],
+        output_field=IntegerField(),
+    )
+    return queryset.filter(pk__in=product_ids).order_by(ranking)
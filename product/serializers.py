@@ -2,11 +2,16 @@ import json
 from rest_framework import serializers
 from .models import OptionsNote, Product, ProductImage, ProductOptions, Category
 from django.db import transaction
+from utils.images import ImageMetaField, SrcsetField
+from utils.media import MediaURLBuilder
 
 class ProductImageSerializer(serializers.ModelSerializer):
+    image_srcset = SrcsetField("image")
+    image_meta = ImageMetaField("image")
+
     class Meta:
         model = ProductImage
-        fields = ["id", "image", "is_thumbnail"]
+        fields = ["id", "image", "image_srcset", "image_meta", "is_thumbnail"]
 
     def to_representation(self, instance):
         representation = super().to_representation(instance)
@@ -171,23 +176,32 @@ class ProductSummarySerializer(serializers.ModelSerializer):
         fields = ["id", "name", "images"]
 
     def get_images(self, obj):
-        image = obj.images.filter(is_thumbnail=True).first() or obj.images.first()
-        if image:
-            return ProductImageSerializer(image).data
-        return None
+        # The denormalized primary image: no query when the caller
+        # select_related("primary_image")
+        if obj.primary_image_id is None:
+            return None
+        return ProductImageSerializer(obj.primary_image, context=self.context).data
 
 class CategorySerializer(serializers.ModelSerializer):
     product_count = serializers.IntegerField(read_only=True)
     image = serializers.SerializerMethodField()
+    image_srcset = SrcsetField("image")
+    image_meta = ImageMetaField("image")
 
     class Meta:
         model = Category
-        fields = ["id", "name", "image", "slug", "product_count"]
+        fields = [
+            "id",
+            "name",
+            "image",
+            "image_srcset",
+            "image_meta",
+            "slug",
+            "product_count",
+        ]
 
     def get_image(self, obj):
-        request = self.context.get("request")
-        if obj.image:
-            return request.build_absolute_uri(obj.image.url)
-        return None
+        urls = MediaURLBuilder.for_context(self.context, Category, "image")
+        return urls.url(obj.image.name)
 
 
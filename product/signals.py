@@ -0,0 +1,86 @@
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+from utils.images import capture_image_meta, schedule_derivatives
+from utils.storage import (
+    claim_new_blobs,
+    release_deleted_blobs,
+    release_replaced_blobs,
+    remember_blobs,
+)
+from .counts import adjust_category_counts
+from .images import refresh_primary_images
+from .models import Category, Product, ProductImage
+from .search import get_search_backend
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, **kwargs):
+    get_search_backend().index([instance])
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    get_search_backend().remove([instance.pk])
+
+
+@receiver(pre_save, sender=Product)
+def remember_product_category(sender, instance, update_fields=None, **kwargs):
+    instance._previous_category_id = None
+    if instance.pk is None:
+        return
+    if update_fields is not None and "category" not in update_fields:
+        return
+    instance._previous_category_id = (
+        Product.objects.filter(pk=instance.pk)
+        .values_list("category_id", flat=True)
+        .first()
+    )
+
+
+@receiver(post_save, sender=Product)
+def count_saved_product(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        adjust_category_counts(instance.owner_id, {instance.category_id: 1})
+    elif update_fields is None or "category" in update_fields:
+        previous = getattr(instance, "_previous_category_id", None)
+        if previous != instance.category_id:
+            adjust_category_counts(
+                instance.owner_id, {previous: -1, instance.category_id: 1}
+            )
+
+
+@receiver(post_delete, sender=Product)
+def count_deleted_product(sender, instance, **kwargs):
+    adjust_category_counts(instance.owner_id, {instance.category_id: -1})
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def refresh_product_primary_image(sender, instance, **kwargs):
+    refresh_primary_images([instance.product_id])
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_save, sender=Category)
+def generate_image_derivatives(sender, instance, **kwargs):
+    schedule_derivatives(instance)
+
+
+@receiver(pre_save, sender=ProductImage)
+@receiver(pre_save, sender=Category)
+def prepare_image_fields(sender, instance, update_fields=None, **kwargs):
+    remember_blobs(instance, update_fields)
+    claim_new_blobs(instance, update_fields)
+    capture_image_meta(instance, update_fields)
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_save, sender=Category)
+def release_replaced_image_blobs(sender, instance, **kwargs):
+    release_replaced_blobs(instance)
+
+
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_delete, sender=Category)
+def release_deleted_image_blobs(sender, instance, **kwargs):
+    release_deleted_blobs(instance)
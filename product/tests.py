@@ -1,3 +1,1381 @@
-from django.test import TestCase
+import base64
+import hashlib
+import json
+import posixpath
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.files.storage import default_storage
+from django.db import DatabaseError, connection
+from django.db.models import Prefetch
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from PIL import ExifTags, Image
+from rest_framework import serializers
+from rest_framework.test import APIClient
+
+from account.models import User
+from public.models import StoreContentVersion
+from public.versioning import get_store_version
+from store_setting.models import Logo
+from utils.db import plan_problems
+from utils.images import public_image_meta, read_image_meta
+from utils.querysets import optimize_queryset
+from utils.seed import seed_store
+from utils.storage import blob_path
+from .access_paths import ACCESS_PATHS
+from .bulk import bulk_update_products
+from .counts import annotate_product_counts, store_categories
+from .exports import EXPORT_FORMATS, export_queryset, export_rows
+from .images import store_image_file, upload_product_images
+from .imports import ProductImporter
+from .models import (
+    Blob,
+    Category,
+    CategoryProductCount,
+    OptionsNote,
+    Product,
+    ProductImage,
+    ProductOptions,
+)
+from .serializers import (
+    ListCreateProductSerializer,
+    ProductImageSerializer,
+    ProductSummarySerializer,
+)
+from .search import (
+    default_backend_path,
+    reset_search_backend,
+    search_products,
+    split_fulltext_terms,
+)
+
+
+class OwnerProductListTests(TestCase):
+    url = "/api/products/"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            email="owner@example.com",
+            store_name="Owner Store",
+            niche="fashion",
+            password="x",
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def add_products(self, count):
+        products = Product.objects.bulk_create(
+            Product(owner=self.owner, name=f"Product {i}", price=i + 1)
+            for i in range(count)
+        )
+        products = Product.objects.filter(owner=self.owner, images__isnull=True)
+        ProductImage.objects.bulk_create(
+            ProductImage(product=product, image=f"products/images/{product.pk}-{i}.jpg")
+            for product in products
+            for i in range(2)
+        )
+
+    def assert_list_queries(self, path, queries):
+        with self.assertNumQueries(queries):
+            response = self.client.get(path)
+            if response.streaming:
+                body = b"".join(response.streaming_content)
+            else:
+                body = response.content
+        self.assertEqual(response.status_code, 200)
+        return json.loads(body)
+
+    def test_list_is_a_bare_array_by_default(self):
+        self.add_products(3)
+        # The products and their images
+        data = self.assert_list_queries(self.url, 2)
+        self.assertEqual(len(data), 3)
+        self.assertEqual(len(data[0]["images"]), 2)
+
+    def test_page_queries_do_not_grow_with_catalog(self):
+        # COUNT, the page and its images
+        self.add_products(3)
+        data = self.assert_list_queries(f"{self.url}?page=1", 3)
+        self.assertEqual(data["count"], 3)
+        self.assertEqual(len(data["results"][0]["images"]), 2)
+
+        self.add_products(40)
+        data = self.assert_list_queries(f"{self.url}?page=1", 3)
+        self.assertEqual(data["count"], 43)
+        self.assertEqual(len(data["results"]), 20)
+
+    def test_page_size_is_capped(self):
+        self.add_products(120)
+        data = self.assert_list_queries(f"{self.url}?page_size=500", 3)
+        self.assertEqual(len(data["results"]), 100)
+
+    def test_list_streams_every_product(self):
+        self.add_products(30)
+        with self.settings(PRODUCT_EXPORT_CHUNK_SIZE=10):
+            # One product query, images once per chunk of ten
+            data = self.assert_list_queries(self.url, 4)
+        self.assertEqual(len(data), 30)
+        self.assertTrue(all(len(product["images"]) == 2 for product in data))
+
+    def test_other_owners_products_are_excluded(self):
+        other = User.objects.create_user(
+            email="other@example.com",
+            store_name="Other Store",
+            niche="fashion",
+            password="x",
+        )
+        Product.objects.create(owner=other, name="Not mine", price=1)
+        self.add_products(2)
+
+        data = self.assert_list_queries(self.url, 2)
+        self.assertEqual(
+            {product["name"] for product in data}, {"Product 0", "Product 1"}
+        )
+
+
+class StorePaginationTests(TestCase):
+    """Keyset and uncounted modes of utils.pagination.StorePagination."""
+
+    url = "/api/items/Paged Store/items/"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            email="paged@example.com",
+            store_name="Paged Store",
+            niche="fashion",
+            password="x",
+        )
+        Product.objects.bulk_create(
+            Product(owner=cls.owner, name=f"Product {i}", price=i + 1)
+            for i in range(25)
+        )
+        cls.ordered_ids = list(
+            Product.objects.filter(owner=cls.owner)
+            .order_by("-created_at", "-id")
+            .values_list("id", flat=True)
+        )
+
+    def get(self, path):
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_cursor_pages_walk_the_whole_catalog(self):
+        data = self.get(f"{self.url}?cursor=&page_size=10")
+        self.assertEqual(data["count"], 25)
+        self.assertNotIn("previous", data)
+
+        ids = []
+        pages = 0
+        while True:
+            pages += 1
+            ids.extend(product["id"] for product in data["results"])
+            if data["next"] is None:
+                break
+            self.assertIn("cursor=", data["next"])
+            data = self.get(data["next"])
+        self.assertEqual(pages, 3)
+        self.assertEqual(ids, self.ordered_ids)
+
+    def test_tampered_cursor_is_not_found(self):
+        data = self.get(f"{self.url}?cursor=&page_size=10")
+        cursor = data["next"].split("cursor=")[1].split("&")[0]
+        tampered = cursor[:-1] + ("A" if cursor[-1] != "A" else "B")
+
+        response = self.client.get(f"{self.url}?cursor={tampered}&page_size=10")
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(f"{self.url}?cursor=not-a-cursor")
+        self.assertEqual(response.status_code, 404)
+
+    def test_skip_count_drops_the_count_query(self):
+        counted = self.get(f"{self.url}?page_size=10")
+        with CaptureQueriesContext(connection) as captured:
+            data = self.get(f"{self.url}?page_size=10&skip_count=true")
+        self.assertFalse(
+            any("COUNT(" in query["sql"] for query in captured.captured_queries)
+        )
+        self.assertNotIn("count", data)
+        self.assertEqual(data["results"], counted["results"])
+        self.assertIn("page=2", data["next"])
+        self.assertIsNone(data["previous"])
+
+        data = self.get(f"{self.url}?cursor=&page_size=10&skip_count=true")
+        self.assertNotIn("count", data)
+        self.assertEqual(len(data["results"]), 10)
+
+    def test_page_size_is_at_least_one(self):
+        for page_size in ("0", "-5"):
+            with self.subTest(page_size=page_size):
+                for mode in ("cursor=&", "skip_count=true&", ""):
+                    data = self.get(f"{self.url}?{mode}page_size={page_size}")
+                    self.assertEqual(len(data["results"]), 1)
+
+        response = self.client.get(f"{self.url}?cursor=&page_size=many")
+        self.assertEqual(response.status_code, 404)
+
+class AccessPathIndexTests(TestCase):
+    """Storefront queries are answered from an index, without a scan or a sort."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = seed_store("Indexed Store", products=60)
+        seed_store("Neighbour Store", products=60)
+
+    def setUp(self):
+        if connection.vendor not in ("sqlite", "mysql", "postgresql"):
+            self.skipTest(f"No query plan checks for {connection.vendor}.")
+        # Plan with statistics, as a production database would
+        statement = "ANALYZE"
+        if connection.vendor == "mysql":
+            statement = f"ANALYZE TABLE {Product._meta.db_table}"
+        with connection.cursor() as cursor:
+            cursor.execute(statement)
+
+    def test_access_paths_use_indexes(self):
+        for path in ACCESS_PATHS:
+            with self.subTest(path.name):
+                queryset = path.build(self.owner.pk, "seed-category-1")
+                self.assertTrue(queryset.exists())
+                self.assertEqual(plan_problems(queryset), [])
+
+    def test_access_path_indexes_exist(self):
+        # The database's own index list, whatever its planner or its support
+        # for partial indexes
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, Product._meta.db_table
+            )
+        declared = {index.name: index for index in Product._meta.indexes}
+        for path in ACCESS_PATHS:
+            with self.subTest(path.name):
+                self.assertIn(path.index, declared)
+                self.assertIn(path.index, constraints)
+                self.assertTrue(constraints[path.index]["index"])
+                columns = [
+                    Product._meta.get_field(name.lstrip("-")).column
+                    for name in declared[path.index].fields
+                ]
+                self.assertEqual(constraints[path.index]["columns"], columns)
+                self.assertIsNone(declared[path.index].condition)
+
+    def test_unindexed_queries_are_reported(self):
+        queryset = Product.objects.filter(name__startswith="Indexed").order_by("name")
+        self.assertTrue(plan_problems(queryset))
+
+
+class BulkProductUpdateTests(TestCase):
+    url = "/api/products/bulk/"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            "bulk@example.com", "Bulk Store", niche="fashion", password="x"
+        )
+        neighbour = User.objects.create_user(
+            "neighbour@example.com", "Neighbour Store", niche="fashion", password="x"
+        )
+        cls.lamp, cls.chair = Product.objects.bulk_create(
+            Product(owner=cls.owner, name=name, price=10, quantity=1)
+            for name in ("Lamp", "Chair")
+        )
+        cls.foreign = Product.objects.create(owner=neighbour, name="Desk", price=10)
+
+    def setUp(self):
+        caches["default"].clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+        self.version = get_store_version(self.owner.pk)[0]
+        self.rows = self.snapshot()
+
+    def snapshot(self):
+        return list(
+            Product.objects.order_by("pk").values_list(
+                "pk", "price", "quantity", "featured", "updated_at"
+            )
+        )
+
+    def patch(self, changes):
+        return self.client.patch(self.url, changes, format="json")
+
+    def assertUnchanged(self):
+        self.assertEqual(self.snapshot(), self.rows)
+        version = StoreContentVersion.objects.get(owner=self.owner).version
+        self.assertEqual(version, self.version)
+
+    def test_every_change_is_applied(self):
+        response = self.patch(
+            [
+                {"id": self.chair.pk, "quantity": 0, "availability": False},
+                {"id": self.lamp.pk, "price": "7.50", "featured": True},
+            ]
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [product["id"] for product in response.data], [self.chair.pk, self.lamp.pk]
+        )
+        lamp = Product.objects.get(pk=self.lamp.pk)
+        self.assertEqual(
+            (str(lamp.price), lamp.featured, lamp.quantity), ("7.50", True, 1)
+        )
+        self.assertGreater(lamp.updated_at, self.lamp.updated_at)
+        self.assertEqual(Product.objects.get(pk=self.chair.pk).quantity, 0)
+        version = StoreContentVersion.objects.get(owner=self.owner).version
+        self.assertEqual(version, self.version + 1)
+
+    def test_errors_are_reported_per_entry(self):
+        response = self.patch(
+            [
+                {"id": self.lamp.pk, "price": "7.50"},
+                {"id": self.chair.pk, "quantity": -1},
+                {"id": self.foreign.pk},
+            ]
+        )
+
+        self.assertEqual(response.status_code, 400)
+        # Keyed by the index of each failing entry
+        self.assertEqual(
+            {index: list(errors) for index, errors in response.data.items()},
+            {1: ["quantity"], 2: ["non_field_errors"]},
+        )
+        self.assertUnchanged()
+
+    def test_duplicate_ids_are_rejected(self):
+        response = self.patch(
+            [{"id": self.lamp.pk, "price": "1.00"}, {"id": self.lamp.pk, "quantity": 5}]
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("non_field_errors", response.data)
+        self.assertUnchanged()
+
+    def test_other_owners_products_write_nothing(self):
+        response = self.patch(
+            [
+                {"id": self.lamp.pk, "price": "1.00"},
+                {"id": self.foreign.pk, "price": "1.00"},
+            ]
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.data["id"], [f"Products not found: [{self.foreign.pk}]."]
+        )
+        self.assertUnchanged()
+
+    def test_failed_write_is_rolled_back(self):
+        changes = [{"id": self.lamp.pk, "price": "1.00"}]
+        with mock.patch(
+            "product.bulk.bump_store_version", side_effect=DatabaseError
+        ), self.assertRaises(DatabaseError):
+            bulk_update_products(self.owner, changes)
+        self.assertUnchanged()
+
+
+class ExportImportTests(TestCase):
+    """An export, imported into another store, recreates the catalog."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            "exporter@example.com", "Export Store", niche="fashion", password="x"
+        )
+        category = Category.objects.create(name="Export Lamps")
+        desk = Product.objects.create(
+            owner=cls.owner,
+            name="Desk Lamp",
+            category=category,
+            description='Brass, 40cm\nSays "hello"',
+            price="12.50",
+            discount_price="9.99",
+            quantity=3,
+            availability=True,
+            featured=True,
+            extra_info="Bulb included",
+        )
+        Product.objects.create(owner=cls.owner, name="Plain Lamp", price=5)
+        ProductOptions.objects.create(
+            product=desk,
+            note=OptionsNote.objects.create(note="Pick a shade"),
+            options=["Warm", "Cold"],
+        )
+        ProductOptions.objects.create(product=desk, options=["S", "M"])
+
+    def catalog(self, owner):
+        rows = export_rows(export_queryset(owner))
+        return [{**row, "id": None, "images": None} for row in rows]
+
+    def test_round_trip(self):
+        for i, fmt in enumerate(EXPORT_FORMATS):
+            with self.subTest(fmt=fmt):
+                client = APIClient()
+                client.force_authenticate(self.owner)
+                response = client.get(f"/api/products/export/{fmt}/")
+                body = b"".join(response.streaming_content)
+
+                importer = User.objects.create_user(
+                    f"importer-{fmt}@example.com",
+                    f"Import Store {i}",
+                    niche="fashion",
+                    password="x",
+                )
+                client.force_authenticate(importer)
+                response = client.post(
+                    "/api/products/import/",
+                    {"file": SimpleUploadedFile(f"products.{fmt}", body)},
+                    format="multipart",
+                )
+
+                self.assertEqual(response.status_code, 201)
+                self.assertEqual(response.data, {"created": 2, "errors": []})
+                self.assertEqual(self.catalog(importer), self.catalog(self.owner))
+
+
+class ImportFileTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            "files@example.com", "File Store", niche="fashion", password="x"
+        )
+
+    def post(self, name, body):
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        return client.post(
+            "/api/products/import/",
+            {"file": SimpleUploadedFile(name, body)},
+            format="multipart",
+        )
+
+    def test_non_utf8_csv_is_a_row_error(self):
+        body = "name,price\nCaf\u00e9 cup,3.00\n".encode("latin-1")
+        response = self.post("products.csv", body)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["created"], 0)
+        [error] = response.data["errors"]
+        self.assertEqual(error["row"], 1)
+        self.assertIn("UTF-8", error["errors"]["non_field_errors"][0])
+
+    def test_rows_before_an_undecodable_line_are_imported(self):
+        body = "name,price\nMug,2.00\n".encode() + "Caf\u00e9,3.00\n".encode("latin-1")
+        response = self.post("products.csv", body)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["created"], 1)
+        self.assertEqual([error["row"] for error in response.data["errors"]], [2])
+
+
+class ImportWithoutReturningTests(TestCase):
+    """Imports on backends that cannot return keys from a bulk insert (MySQL)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            email="importer@example.com",
+            store_name="Importer Store",
+            niche="fashion",
+            password="x",
+        )
+        # Another store's notes, none of which may gain imported options
+        cls.foreign_notes = OptionsNote.objects.bulk_create(
+            OptionsNote(note=f"Neighbour note {i}") for i in range(3)
+        )
+
+    def test_options_attach_to_their_own_notes(self):
+        records = [
+            (
+                row,
+                {
+                    "name": f"Imported {row}",
+                    "price": "10.00",
+                    "options": [{"note": f"Note of {row}", "options": ["S", "M"]}],
+                },
+                None,
+            )
+            for row in range(1, 5)
+        ]
+        with mock.patch.object(
+            type(connection.features), "can_return_rows_from_bulk_insert", False
+        ), CaptureQueriesContext(connection) as captured:
+            result = ProductImporter(self.owner).run(records)
+
+        self.assertEqual(result, {"created": 4, "errors": []})
+        # One insert per table, the keys read back by their batch marker
+        for table in ("product_product", "product_optionsnote"):
+            inserts = [
+                query
+                for query in captured.captured_queries
+                if query["sql"].startswith(f'INSERT INTO "{table}"')
+            ]
+            self.assertEqual(len(inserts), 1)
+        self.assertFalse(
+            ProductOptions.objects.filter(note__in=self.foreign_notes).exists()
+        )
+        options = ProductOptions.objects.filter(product__owner=self.owner)
+        self.assertEqual(options.count(), 4)
+        for option in options.select_related("product", "note"):
+            row = option.product.name.split()[-1]
+            self.assertEqual(option.note.note, f"Note of {row}")
+        self.assertEqual(
+            list(OptionsNote.objects.filter(note__startswith="Neighbour").order_by("pk")),
+            self.foreign_notes,
+        )
+
+
+def png_bytes(size=(4, 3), color="red"):
+    buffer = BytesIO()
+    Image.new("RGB", size, color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class LocalStorageMixin:
+    """Content-addressed local storage in a temporary MEDIA_ROOT."""
+
+    def use_local_storage(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        storages = override_settings(
+            MEDIA_ROOT=media_root,
+            MEDIA_URL="/media/",
+            STORAGES={
+                "default": {
+                    "BACKEND": "utils.storage.ContentAddressedStorage",
+                    "OPTIONS": {"backend": "utils.uploads.LocalUploadStorage"},
+                },
+                "staticfiles": {
+                    "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
+                },
+            },
+        )
+        storages.enable()
+        self.addCleanup(storages.disable)
+
+
+class DirectUploadTests(LocalStorageMixin, TestCase):
+    """Ticket, PUT and finalize against the LocalUploadStorage stand-in."""
+
+    def setUp(self):
+        self.use_local_storage()
+        self.owner = User.objects.create_user(
+            "uploads@example.com", "Upload Store", niche="fashion", password="pass12345"
+        )
+        self.product = Product.objects.create(owner=self.owner, name="Lamp", price=10)
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+        self.base = f"/api/products/{self.product.pk}/images/upload"
+
+    def ticket(self, body, content_type="image/png"):
+        response = self.client.post(
+            f"{self.base}/ticket/",
+            {
+                "content_type": content_type,
+                "size": len(body),
+                "sha256": hashlib.sha256(body).hexdigest(),
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.data
+
+    def put(self, payload, body):
+        return self.client.generic(
+            "PUT",
+            payload["upload_url"],
+            body,
+            content_type=payload["headers"]["Content-Type"],
+        )
+
+    def finalize(self, payload):
+        return self.client.post(
+            f"{self.base}/finalize/", {"ticket": payload["ticket"]}, format="json"
+        )
+
+    def test_upload_round_trip(self):
+        body = png_bytes()
+        payload = self.ticket(body)
+        self.assertFalse(payload["exists"])
+        self.assertEqual(self.put(payload, body).status_code, 200)
+
+        response = self.finalize(payload)
+        self.assertEqual(response.status_code, 201)
+        image = ProductImage.objects.get(product=self.product)
+        self.assertEqual(
+            image.image.name, blob_path(hashlib.sha256(body).hexdigest(), ".png")
+        )
+        self.assertEqual(default_storage.open(image.image.name).read(), body)
+
+        # The blob is shared: a second ticket for it needs no PUT
+        self.assertTrue(self.ticket(body)["exists"])
+
+    def test_put_with_other_content_is_rejected(self):
+        payload = self.ticket(png_bytes())
+        self.assertEqual(self.put(payload, png_bytes(color="blue")).status_code, 400)
+        response = self.finalize(payload)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ProductImage.objects.exists())
+
+    def test_object_not_matching_ticket_is_rejected_and_dropped(self):
+        # A backend that ignored the checksum let other bytes of the same
+        # size in under the blob name
+        body = png_bytes()
+        payload = self.ticket(body)
+        name = blob_path(hashlib.sha256(body).hexdigest(), ".png")
+        default_storage.save(name, ContentFile(b"x" * len(body)))
+
+        response = self.finalize(payload)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ProductImage.objects.exists())
+        self.assertFalse(default_storage.exists(name))
+
+    def test_finalize_checks_metadata_without_reading_the_object(self):
+        body = png_bytes()
+        payload = self.ticket(body)
+        self.put(payload, body)
+        backend = type(default_storage.backend)
+        metadata = {
+            "size": len(body),
+            "content_type": "image/png",
+            "sha256": hashlib.sha256(body).hexdigest(),
+        }
+
+        with mock.patch.object(
+            backend, "object_metadata", return_value=metadata
+        ), mock.patch.object(backend, "open", side_effect=AssertionError):
+            self.assertEqual(self.finalize(payload).status_code, 201)
+
+        metadata["content_type"] = "image/jpeg"
+        payload = self.ticket(body)
+        with mock.patch.object(backend, "object_metadata", return_value=metadata):
+            self.assertEqual(self.finalize(payload).status_code, 400)
+
+    @override_settings(IMAGE_DERIVATIVE_WORKERS=0)
+    def test_worker_measures_direct_uploads(self):
+        body = png_bytes()
+        payload = self.ticket(body)
+        self.put(payload, body)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.finalize(payload).status_code, 201)
+
+        image = ProductImage.objects.get(product=self.product)
+        self.assertEqual(image.image_meta["image"]["width"], 4)
+        self.assertEqual(image.image_derivatives["image"]["source"], image.image.name)
+        product = Product.objects.get(pk=self.product.pk)
+        self.assertEqual(product.primary_image_width, 4)
+
+    @override_settings(IMAGE_DERIVATIVE_WORKERS=0)
+    def test_upload_that_does_not_decode_is_left_unmeasured(self):
+        body = b"not an image at all"
+        payload = self.ticket(body)
+        self.put(payload, body)
+        with self.assertLogs("utils.images", "WARNING"):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(self.finalize(payload).status_code, 201)
+
+        image = ProductImage.objects.get(product=self.product)
+        self.assertEqual(image.image_meta, {})
+        self.assertEqual(image.image_derivatives, {})
+
+class BlobStorageTests(LocalStorageMixin, TestCase):
+    """Identical uploads share one blob, released with its last reference."""
+
+    def setUp(self):
+        self.use_local_storage()
+        self.owner = User.objects.create_user(
+            "blobs@example.com", "Blob Store", niche="fashion", password="pass12345"
+        )
+        self.product = Product.objects.create(owner=self.owner, name="Lamp", price=10)
+        self.body = png_bytes()
+        self.name = blob_path(hashlib.sha256(self.body).hexdigest(), ".png")
+
+    def upload(self, filename="lamp.png"):
+        return ProductImage.objects.create(
+            product=self.product, image=SimpleUploadedFile(filename, self.body)
+        )
+
+    def test_identical_uploads_share_a_blob(self):
+        first = self.upload("lamp.png")
+        second = self.upload("LAMP copy.PNG")
+
+        self.assertEqual(first.image.name, self.name)
+        self.assertEqual(second.image.name, self.name)
+        _, files = default_storage.listdir(posixpath.dirname(self.name))
+        self.assertEqual(files, [posixpath.basename(self.name)])
+        self.assertEqual(list(Blob.objects.values_list("name", flat=True)), [self.name])
+
+    def test_blob_is_deleted_with_its_last_reference(self):
+        first, second = self.upload(), self.upload()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(default_storage.exists(self.name))
+        self.assertTrue(Blob.objects.filter(name=self.name).exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(default_storage.exists(self.name))
+        self.assertFalse(Blob.objects.exists())
+
+    def test_replaced_blob_is_released(self):
+        image = self.upload()
+        image.image = SimpleUploadedFile("other.png", png_bytes(color="blue"))
+        with self.captureOnCommitCallbacks(execute=True):
+            image.save()
+        self.assertFalse(default_storage.exists(self.name))
+        self.assertTrue(default_storage.exists(image.image.name))
+
+    def test_blob_released_during_an_upload_is_stored_again(self):
+        def store_then_release(field, instance, file):
+            # Another row's release deletes the blob right after this
+            # upload found it in storage
+            name, meta = store_image_file(field, instance, file)
+            default_storage.delete(name)
+            return name, meta
+
+        with mock.patch("product.images.store_image_file", store_then_release):
+            images = upload_product_images(
+                self.product, [(SimpleUploadedFile("lamp.png", self.body), True)]
+            )
+
+        self.assertEqual(images[0].image.name, self.name)
+        self.assertEqual(default_storage.open(self.name).read(), self.body)
+
+    def put_logo(self, body):
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        data = {"logo": SimpleUploadedFile("logo.png", body)}
+        return client.put("/api/logo/", data, format="multipart")
+
+    def test_views_store_uploads_before_their_transaction(self):
+        backend = type(default_storage.backend)
+        backend_save = backend._save
+        depths = []
+
+        def save(storage, name, content):
+            depths.append(len(connection.atomic_blocks))
+            return backend_save(storage, name, content)
+
+        depth = len(connection.atomic_blocks)
+        sha256 = mock.Mock(wraps=hashlib.sha256)
+        with mock.patch.object(backend, "_save", save), mock.patch(
+            "utils.storage.hashlib.sha256", sha256
+        ):
+            response = self.put_logo(self.body)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Logo.objects.get(user__user=self.owner).logo.name, self.name)
+        # Stored once, outside the view's transaction, and hashed once
+        self.assertEqual(depths, [depth])
+        self.assertEqual(sha256.call_count, 1)
+
+    def test_uploads_of_rejected_requests_are_released(self):
+        body = b"not an image"
+        response = self.put_logo(body)
+
+        self.assertEqual(response.status_code, 400)
+        name = blob_path(hashlib.sha256(body).hexdigest(), ".png")
+        self.assertFalse(default_storage.exists(name))
+        self.assertFalse(Blob.objects.exists())
+
+class ProductImageUploadMixin(LocalStorageMixin):
+    """Multipart upload of several images through ProductImageUpdateView."""
+
+    def setUp(self):
+        self.use_local_storage()
+        self.owner = User.objects.create_user(
+            "images@example.com", "Image Store", niche="fashion", password="pass12345"
+        )
+        self.product = Product.objects.create(owner=self.owner, name="Lamp", price=10)
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+        self.url = f"/api/products/{self.product.pk}/images/update/"
+        self.bodies = [png_bytes(color=color) for color in ("red", "green", "blue")]
+
+    def post_images(self):
+        data = {
+            "images": json.dumps(
+                [{"file_index": i, "is_thumbnail": i == 1} for i in range(3)]
+            )
+        }
+        for i, body in enumerate(self.bodies):
+            data[f"image_files_{i}"] = SimpleUploadedFile(f"image-{i}.png", body)
+        return self.client.post(self.url, data, format="multipart")
+
+
+class ProductImageUploadTests(ProductImageUploadMixin, TestCase):
+    def test_failed_upload_keeps_nothing(self):
+        def fail_on_green(field, instance, file):
+            if file.name == "image-1.png":
+                raise OSError("storage unavailable")
+            return store_image_file(field, instance, file)
+
+        with mock.patch("product.images.store_image_file", fail_on_green):
+            response = self.post_images()
+
+        self.assertEqual(response.status_code, 502)
+        self.assertFalse(ProductImage.objects.exists())
+        # The images stored before the failure are deleted again
+        for body in self.bodies:
+            name = blob_path(hashlib.sha256(body).hexdigest(), ".png")
+            self.assertFalse(default_storage.exists(name))
+        self.assertFalse(Blob.objects.exists())
+
+
+    def test_rows_are_read_back_without_returning(self):
+        # The same content twice, and already on the product: one blob name
+        self.bodies[2] = self.bodies[0]
+        existing = ProductImage.objects.create(
+            product=self.product,
+            image=SimpleUploadedFile("old.png", self.bodies[0]),
+            is_thumbnail=True,
+        )
+        with mock.patch.object(
+            type(connection.features), "can_return_rows_from_bulk_insert", False
+        ), CaptureQueriesContext(connection) as captured:
+            response = self.post_images()
+
+        self.assertEqual(response.status_code, 201)
+        inserts = [
+            query
+            for query in captured.captured_queries
+            if query["sql"].startswith('INSERT INTO "product_productimage"')
+        ]
+        self.assertEqual(len(inserts), 1)
+        ids = [image["id"] for image in response.data]
+        new_images = ProductImage.objects.exclude(pk=existing.pk)
+        self.assertEqual(ids, sorted(new_images.values_list("pk", flat=True)))
+        self.assertEqual(
+            [image["is_thumbnail"] for image in response.data], [False, True, False]
+        )
+        self.assertFalse(ProductImage.objects.get(pk=existing.pk).is_thumbnail)
+        self.assertEqual(
+            Product.objects.get(pk=self.product.pk).primary_image_id, ids[1]
+        )
+
+
+@override_settings(IMAGE_DERIVATIVE_WORKERS=0)
+class ProductImageDerivativeTests(ProductImageUploadMixin, TransactionTestCase):
+    # Commits for real: derivatives generated inline exist before the
+    # response is rendered, as in production
+    def test_response_lists_inline_derivatives(self):
+        response = self.post_images()
+
+        self.assertEqual(response.status_code, 201)
+        thumbnails = [image["is_thumbnail"] for image in response.data]
+        self.assertEqual(thumbnails, [False, True, False])
+        for image, body in zip(response.data, self.bodies):
+            name = blob_path(hashlib.sha256(body).hexdigest(), ".png")
+            self.assertEqual(image["image"], f"http://testserver/media/{name}")
+            self.assertEqual(image["image_meta"]["width"], 4)
+            self.assertIn(" 4w", image["image_srcset"]["webp"])
+
+
+class ImageMetaTests(LocalStorageMixin, TestCase):
+    def lqip_image(self, meta):
+        prefix = "data:image/webp;base64,"
+        self.assertTrue(meta["lqip"].startswith(prefix))
+        image = Image.open(BytesIO(base64.b64decode(meta["lqip"][len(prefix) :])))
+        self.assertEqual(image.format, "WEBP")
+        return image
+
+    def test_png_is_measured(self):
+        body = png_bytes(size=(64, 48))
+        meta = read_image_meta(ContentFile(body))
+
+        self.assertEqual(meta["width"], 64)
+        self.assertEqual(meta["height"], 48)
+        self.assertEqual(meta["size"], len(body))
+        self.assertEqual(meta["mime"], "image/png")
+        self.assertEqual(self.lqip_image(meta).size, (16, 12))
+
+    def test_exif_rotation_swaps_dimensions(self):
+        exif = Image.Exif()
+        exif[ExifTags.Base.Orientation] = 6
+        buffer = BytesIO()
+        Image.new("RGB", (64, 48), "red").save(buffer, format="JPEG", exif=exif)
+        meta = read_image_meta(ContentFile(buffer.getvalue()))
+
+        self.assertEqual((meta["width"], meta["height"]), (48, 64))
+        self.assertEqual(meta["mime"], "image/jpeg")
+        self.assertEqual(self.lqip_image(meta).size, (12, 16))
+
+    def test_saved_image_records_its_meta(self):
+        self.use_local_storage()
+        owner = User.objects.create_user(
+            "meta@example.com", "Meta Store", niche="fashion", password="pass12345"
+        )
+        product = Product.objects.create(owner=owner, name="Lamp", price=10)
+        body = png_bytes(size=(64, 48))
+        image = ProductImage.objects.create(
+            product=product, image=SimpleUploadedFile("lamp.png", body)
+        )
+
+        entry = image.image_meta["image"]
+        self.assertEqual(entry["source"], image.image.name)
+        self.assertEqual((entry["width"], entry["height"]), (64, 48))
+        # Exposed without reading the file again
+        with mock.patch("utils.images.Image.open") as image_open:
+            data = ProductImageSerializer(image).data
+        image_open.assert_not_called()
+        self.assertEqual(data["image_meta"]["size"], len(body))
+        self.assertNotIn("source", data["image_meta"])
+        product.refresh_from_db()
+        self.assertEqual(
+            (product.primary_image_width, product.primary_image_height), (64, 48)
+        )
+
+        # An entry describing another file is not exposed
+        self.assertIsNone(public_image_meta("other.png", entry))
+
+
+class PrimaryImageTests(LocalStorageMixin, TestCase):
+    """Product.primary_image follows thumbnail changes and deletions."""
+
+    def setUp(self):
+        self.use_local_storage()
+        self.owner = User.objects.create_user(
+            "primary@example.com", "Primary Store", niche="fashion", password="x"
+        )
+        self.product = Product.objects.create(owner=self.owner, name="Lamp", price=10)
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def add_image(self, width, **fields):
+        return ProductImage.objects.create(
+            product=self.product,
+            image=SimpleUploadedFile(f"{width}.png", png_bytes(size=(width, 10))),
+            **fields,
+        )
+
+    def assertPrimary(self, image):
+        product = Product.objects.get(pk=self.product.pk)
+        if image is None:
+            expected = (None, "", None, None)
+        else:
+            width = image.image_meta["image"]["width"]
+            expected = (image.pk, image.image.name, width, 10)
+        self.assertEqual(
+            (
+                product.primary_image_id,
+                product.primary_image_path,
+                product.primary_image_width,
+                product.primary_image_height,
+            ),
+            expected,
+        )
+
+    def test_oldest_image_is_primary_until_a_thumbnail_is_set(self):
+        first = self.add_image(20)
+        self.add_image(30)
+        self.assertPrimary(first)
+
+        thumbnail = self.add_image(40, is_thumbnail=True)
+        self.assertPrimary(thumbnail)
+
+    def test_thumbnail_switch_through_put(self):
+        first = self.add_image(20, is_thumbnail=True)
+        second = self.add_image(30)
+        self.assertPrimary(first)
+
+        response = self.client.put(
+            f"/api/products/{self.product.pk}/images/{second.pk}/",
+            {"is_thumbnail": True},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(ProductImage.objects.get(pk=first.pk).is_thumbnail)
+        self.assertPrimary(second)
+
+    def test_deleting_the_thumbnail_falls_back_to_the_oldest_image(self):
+        first = self.add_image(20)
+        self.add_image(30)
+        thumbnail = self.add_image(40, is_thumbnail=True)
+
+        response = self.client.delete(f"/api/products/images/{thumbnail.pk}/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertPrimary(first)
+
+    def test_deleting_the_last_image_clears_the_primary_image(self):
+        image = self.add_image(20)
+        self.assertPrimary(image)
+
+        self.client.delete(f"/api/products/images/{image.pk}/")
+
+        self.assertPrimary(None)
+
+    def test_summary_serializes_the_primary_image(self):
+        self.add_image(20)
+        thumbnail = self.add_image(30, is_thumbnail=True)
+        product = Product.objects.select_related("primary_image").get(
+            pk=self.product.pk
+        )
+
+        with self.assertNumQueries(0):
+            data = ProductSummarySerializer(product).data
+        self.assertEqual(data["images"], ProductImageSerializer(thumbnail).data)
+
+        product = Product.objects.create(owner=self.owner, name="Bare", price=1)
+        self.assertIsNone(ProductSummarySerializer(product).data["images"])
+
+
+class CategoryCountTests(TestCase):
+    """CategoryProductCount follows product writes; reconcile repairs drift."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            "counts@example.com", "Count Store", niche="fashion", password="pass12345"
+        )
+        cls.neighbour = User.objects.create_user(
+            "others@example.com", "Other Counts", niche="fashion", password="pass12345"
+        )
+        cls.lamps = Category.objects.create(name="Lamps")
+        cls.chairs = Category.objects.create(name="Chairs")
+
+    def add(self, category, owner=None):
+        return Product.objects.create(
+            owner=owner or self.owner, name="Product", price=1, category=category
+        )
+
+    def counts(self, owner=None):
+        return dict(
+            CategoryProductCount.objects.filter(owner=owner or self.owner).values_list(
+                "category__name", "count"
+            )
+        )
+
+    def test_create_counts_the_product(self):
+        self.add(self.lamps)
+        self.add(self.lamps)
+        self.add(None)
+        self.add(self.lamps, owner=self.neighbour)
+
+        self.assertEqual(self.counts(), {"Lamps": 2})
+        self.assertEqual(self.counts(self.neighbour), {"Lamps": 1})
+        categories = Category.objects.order_by("name")
+        categories = annotate_product_counts(categories, self.owner.pk)
+        self.assertEqual(
+            [(c.name, c.product_count) for c in categories],
+            [("Chairs", 0), ("Lamps", 2)],
+        )
+
+    def test_move_updates_both_categories(self):
+        product = self.add(self.lamps)
+        self.add(self.lamps)
+
+        product.category = self.chairs
+        product.save()
+        self.assertEqual(self.counts(), {"Lamps": 1, "Chairs": 1})
+
+        product.category = None
+        product.save(update_fields=["category"])
+        self.assertEqual(self.counts(), {"Lamps": 1, "Chairs": 0})
+        self.assertEqual([c.name for c in store_categories(self.owner.pk)], ["Lamps"])
+
+        # A save leaving the category out does not touch the counters
+        product.name = "Renamed"
+        product.save(update_fields=["name"])
+        self.assertEqual(self.counts(), {"Lamps": 1, "Chairs": 0})
+
+    def test_delete_uncounts_the_product(self):
+        first, second = self.add(self.lamps), self.add(self.lamps)
+
+        first.delete()
+        self.assertEqual(self.counts(), {"Lamps": 1})
+        second.delete()
+        self.assertEqual(self.counts(), {"Lamps": 0})
+
+        # Counters never go below zero, even when they had drifted
+        third = self.add(self.chairs)
+        CategoryProductCount.objects.filter(category=self.chairs).update(count=0)
+        third.delete()
+        self.assertEqual(self.counts(), {"Lamps": 0, "Chairs": 0})
+
+    def test_reconcile_command_repairs_drift(self):
+        self.add(self.lamps)
+        self.add(self.lamps)
+        self.add(self.chairs)
+        self.add(self.lamps, owner=self.neighbour)
+        counters = CategoryProductCount.objects.filter(owner=self.owner)
+        counters.filter(category=self.lamps).update(count=7)
+        counters.filter(category=self.chairs).delete()
+        CategoryProductCount.objects.filter(owner=self.neighbour).update(count=5)
+        stray = Category.objects.create(name="Stray")
+        CategoryProductCount.objects.create(owner=self.owner, category=stray, count=3)
+
+        out = StringIO()
+        call_command("reconcile_category_counts", "Count Store", stdout=out)
+
+        self.assertIn("Reconciled 3 category counts.", out.getvalue())
+        self.assertEqual(self.counts(), {"Lamps": 2, "Chairs": 1})
+        # Other stores are left alone when stores are named
+        self.assertEqual(self.counts(self.neighbour), {"Lamps": 5})
+
+        call_command("reconcile_category_counts", stdout=StringIO())
+        self.assertEqual(self.counts(self.neighbour), {"Lamps": 1})
+
+
+class SearchTestsMixin:
+    """Search behaviour every backend must share; subclasses pick one."""
+
+    backend = None
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            "search@example.com", "Search Store", niche="fashion", password="pass12345"
+        )
+        cls.neighbour = User.objects.create_user(
+            "other@example.com", "Other Store", niche="fashion", password="pass12345"
+        )
+
+    def setUp(self):
+        settings = override_settings(PRODUCT_SEARCH_BACKEND=self.backend)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        # The backend is a process-wide singleton
+        reset_search_backend()
+        self.addCleanup(reset_search_backend)
+
+    def add(self, name, description="", owner=None):
+        return Product.objects.create(
+            owner=owner or self.owner, name=name, description=description, price=1
+        )
+
+    def search(self, query):
+        products = Product.objects.filter(owner=self.owner)
+        return list(
+            search_products(products, self.owner.pk, query).values_list("name", flat=True)
+        )
+
+    def test_name_matches_rank_above_description_matches(self):
+        self.add("Reading Chair", "Has a lamp clip")
+        self.add("Desk Lamp", "Bright")
+        self.add("Floor Lamp", "Lamp with a lamp shade")
+        self.add("Sofa", "Comfortable")
+
+        results = self.search("lamp")
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[-1], "Reading Chair")
+        self.assertEqual(set(results[:2]), {"Desk Lamp", "Floor Lamp"})
+
+    def test_every_term_matches_as_a_prefix(self):
+        self.add("Desk Lamp")
+        self.add("Desktop Stand")
+        self.add("Floor Lamp")
+
+        self.assertEqual(set(self.search("des")), {"Desk Lamp", "Desktop Stand"})
+        self.assertEqual(self.search("des lam"), ["Desk Lamp"])
+        self.assertEqual(self.search("LAMP desk"), ["Desk Lamp"])
+        self.assertEqual(self.search("lamps"), [])
+        self.assertEqual(self.search("!!"), [])
+
+    def test_only_the_store_products_match(self):
+        self.add("Desk Lamp")
+        self.add("Desk Lamp", owner=self.neighbour)
+
+        products = search_products(Product.objects.all(), self.owner.pk, "lamp")
+        self.assertEqual([p.owner_id for p in products], [self.owner.pk])
+
+    def test_index_follows_product_save_and_delete(self):
+        product = self.add("Desk Lamp")
+        self.assertEqual(self.search("lamp"), ["Desk Lamp"])
+
+        product.name = "Desk Organizer"
+        product.save()
+        self.assertEqual(self.search("lamp"), [])
+        self.assertEqual(self.search("organ"), ["Desk Organizer"])
+
+        product.delete()
+        self.assertEqual(self.search("organ"), [])
+        self.assertEqual(self.search("desk"), [])
+
+    def test_storefront_search_uses_the_ranking(self):
+        self.add("Reading Chair", "Has a lamp clip")
+        self.add("Desk Lamp")
+        response = APIClient().get("/api/items/Search Store/items/?search=lamp")
+        self.assertEqual(
+            [p["name"] for p in response.json()["results"]],
+            ["Desk Lamp", "Reading Chair"],
+        )
+
+    def test_cursor_pages_keep_the_ranking(self):
+        self.add("Reading Chair", "Has a lamp clip")
+        self.add("Desk Lamp")
+        self.add("Floor Lamp")
+        url = "/api/items/Search Store/items/?search=lamp&page_size=2&cursor="
+        data = APIClient().get(url).json()
+        names = [p["name"] for p in data["results"]]
+        data = APIClient().get(data["next"]).json()
+        names += [p["name"] for p in data["results"]]
+
+        self.assertEqual(names[2], "Reading Chair")
+        self.assertEqual(set(names[:2]), {"Desk Lamp", "Floor Lamp"})
+        self.assertIsNone(data["next"])
+
+
+class InMemorySearchTests(SearchTestsMixin, TestCase):
+    backend = "product.search.InMemorySearchBackend"
+
+
+class SQLiteFTSSearchTests(SearchTestsMixin, TestCase):
+    backend = "product.search.SQLiteFTSBackend"
+
+    def setUp(self):
+        if default_backend_path() != self.backend:
+            self.skipTest("Needs SQLite with FTS5")
+        super().setUp()
+
+
+class PlanCategorySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Category
+        fields = ["id", "name"]
+
+
+class PlanProductSerializer(serializers.ModelSerializer):
+    category = PlanCategorySerializer()
+    images = ProductImageSerializer(many=True)
+
+    class Meta:
+        model = Product
+        fields = ["id", "name", "category", "images"]
+
+
+class PlanSummarySerializer(serializers.ModelSerializer):
+    summary = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Product
+        fields = ["id", "summary"]
+
+    def get_summary(self, obj):
+        return f"{obj.name}: {obj.description} ({obj.extra_info})"
+
+
+class QuerysetPlanTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            email="plan@example.com",
+            store_name="Plan Store",
+            niche="fashion",
+            password="x",
+        )
+        category = Category.objects.create(name="Plan Lamps")
+        products = Product.objects.bulk_create(
+            Product(
+                owner=cls.owner,
+                name=f"Product {i}",
+                price=i + 1,
+                category=category,
+                description=f"Description {i}",
+                extra_info=f"Info {i}",
+            )
+            for i in range(3)
+        )
+        # No files behind these rows: bulk_create skips measuring them
+        ProductImage.objects.bulk_create(
+            ProductImage(product=product, image=f"products/{product.pk}.png")
+            for product in products
+            for _ in range(2)
+        )
+
+    def optimize(self, serializer):
+        return optimize_queryset(
+            Product.objects.filter(owner=self.owner).order_by("id"), serializer
+        )
+
+    def only(self, queryset):
+        names, defer = queryset.query.deferred_loading
+        self.assertFalse(defer)
+        return set(names)
+
+    def test_nested_serializers(self):
+        queryset = self.optimize(PlanProductSerializer)
+
+        self.assertEqual(queryset.query.select_related, {"category": {}})
+        self.assertEqual(
+            self.only(queryset),
+            {"id", "name", "category", "category__id", "category__name"},
+        )
+        [prefetch] = queryset._prefetch_related_lookups
+        self.assertIsInstance(prefetch, Prefetch)
+        self.assertEqual(prefetch.prefetch_through, "images")
+        self.assertEqual(
+            self.only(prefetch.queryset),
+            {
+                "product",
+                "id",
+                "image",
+                "image_derivatives",
+                "image_meta",
+                "is_thumbnail",
+            },
+        )
+
+        # One query for the products and categories, one for the images
+        with self.assertNumQueries(2):
+            data = PlanProductSerializer(queryset, many=True).data
+        self.assertEqual(data[0]["category"]["name"], "Plan Lamps")
+        self.assertEqual(len(data[0]["images"]), 2)
+
+    def test_primary_key_relation_reads_the_foreign_key(self):
+        queryset = self.optimize(ListCreateProductSerializer)
+
+        self.assertFalse(queryset.query.select_related)
+        self.assertIn("category", self.only(queryset))
+        self.assertNotIn("category__name", self.only(queryset))
+        self.assertEqual(
+            [p.prefetch_through for p in queryset._prefetch_related_lookups],
+            ["images"],
+        )
+
+    def test_method_field_loads_every_column(self):
+        queryset = self.optimize(PlanSummarySerializer)
+
+        self.assertEqual(
+            self.only(queryset),
+            {field.name for field in Product._meta.concrete_fields},
+        )
+        # Columns the method reads are not deferred, so rendering runs
+        # no query per product
+        with self.assertNumQueries(1):
+            data = PlanSummarySerializer(queryset, many=True).data
+        self.assertEqual(data[0]["summary"], "Product 0: Description 0 (Info 0)")
+
+    def test_serializer_without_fields_is_untouched(self):
+        queryset = Product.objects.all()
+
+        class RawSerializer(serializers.BaseSerializer):
+            def to_representation(self, instance):
+                return instance.pk
+
+        self.assertIs(optimize_queryset(queryset, RawSerializer), queryset)
+
+
+class FullTextTermsTests(SimpleTestCase):
+    def test_terms_the_index_drops_are_not_required(self):
+        indexed, unindexed = split_fulltext_terms(
+            ["the", "tv", "a4", "stand"], 3, {"the", "a"}
+        )
+        self.assertEqual(indexed, ["stand"])
+        self.assertEqual(unindexed, ["the", "tv", "a4"])
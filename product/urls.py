@@ -1,11 +1,16 @@
 from django.urls import path
 from .views import (
     CategoryDetailView,
+    CategoryImageDirectUploadView,
     CategoryListCreateView,
+    ProductBulkUpdateView,
     ProductCreateView,
     ProductDetailView,
+    ProductExportView,
     # ProductImageDeleteView,
     ProductImageUpdateView,
+    ProductImageDirectUploadView,
+    ProductImportView,
     ProductOptionsDetailView,
     ProductOptionsListCreateView,
     PaginatedProductListView,
@@ -20,6 +25,16 @@ urlpatterns = [
     ),
     # create product with details
     path("products/", ProductCreateView.as_view(), name="product-create"),
+    # bulk import products from a CSV or JSONL file
+    path("products/import/", ProductImportView.as_view(), name="product-import"),
+    # update price, stock and flags of many products at once
+    path("products/bulk/", ProductBulkUpdateView.as_view(), name="product-bulk-update"),
+    # stream the whole catalog as CSV or JSONL
+    path(
+        "products/export/<str:fmt>/",
+        ProductExportView.as_view(),
+        name="product-export",
+    ),
     # create product images
     path(
         "products/<int:product_pk>/images/update/",
@@ -32,6 +47,19 @@ urlpatterns = [
         ProductImageUpdateView.as_view(),
         name="productimage-bulk-update",
     ),
+    # direct-to-storage product image upload: ticket, then finalize
+    path(
+        "products/<int:product_pk>/images/upload/ticket/",
+        ProductImageDirectUploadView.as_view(),
+        {"step": "ticket"},
+        name="productimage-upload-ticket",
+    ),
+    path(
+        "products/<int:product_pk>/images/upload/finalize/",
+        ProductImageDirectUploadView.as_view(),
+        {"step": "finalize"},
+        name="productimage-upload-finalize",
+    ),
     # delete product image
     path(
         "products/images/<int:image_id>/",
@@ -46,6 +74,19 @@ urlpatterns = [
     ),
     # update and delete category
     path("categories/<int:pk>/", CategoryDetailView.as_view(), name="category-detail"),
+    # direct-to-storage category image upload: ticket, then finalize
+    path(
+        "categories/<int:pk>/image/upload/ticket/",
+        CategoryImageDirectUploadView.as_view(),
+        {"step": "ticket"},
+        name="category-image-upload-ticket",
+    ),
+    path(
+        "categories/<int:pk>/image/upload/finalize/",
+        CategoryImageDirectUploadView.as_view(),
+        {"step": "finalize"},
+        name="category-image-upload-finalize",
+    ),
     # list and create categories
     path("categories/", CategoryListCreateView.as_view(), name="category-list-create"),
     # update and delete product details
@@ -1,7 +1,8 @@
+from django.conf import settings
 from django.shortcuts import get_object_or_404
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework import status
+from rest_framework import serializers, status
 from .serializers import (
     CategorySerializer,
     ProductOptionsSerializer,
@@ -10,23 +11,52 @@ from .serializers import (
     ProductImageSerializer,
 )
 from .models import Category, Product, ProductOptions, ProductImage
+from .images import ImageUploadError, refresh_primary_images, upload_product_images
+from .access_paths import owner_product_list
+from .counts import annotate_product_counts
+from .bulk import BulkProductUpdateSerializer, bulk_update_products
+from .exports import EXPORT_FORMATS, export_queryset, export_rows, stream_export
+from .imports import ProductImporter, import_format, read_records
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Count
-from rest_framework.pagination import PageNumberPagination
+from utils.querysets import optimize_queryset
+from utils.pagination import OwnerListPagination, StorePagination
+from utils.storage import atomic_with_uploads
+from utils.streaming import json_array_response
+from utils.uploads import DirectUploadView
 import json
 from django.core.files.uploadedfile import UploadedFile
+from django.http import Http404, StreamingHttpResponse
+
+
+def owner_products(owner):
+    """An owner's products, loading what ListCreateProductSerializer renders."""
+    return optimize_queryset(owner_product_list(owner.pk), ListCreateProductSerializer)
 
 
 class ProductCreateView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, format=None):
-        """Return a list of all products for the authenticated user"""
-        products = Product.objects.filter(owner=request.user).order_by("-created_at")
-        serializer = ListCreateProductSerializer(
-            products, many=True, context={"request": request}
-        )
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        """
+        Return the authenticated user's products as one JSON array, streamed
+        so memory stays flat. With `?page=`, `?page_size=` (up to 100) or
+        `?cursor=`, return a `{count, next, previous, results}` page instead.
+        """
+        products = owner_products(request.user)
+        context = {"request": request}
+
+        paginator = OwnerListPagination()
+        if not paginator.is_requested(request):
+            return json_array_response(
+                products,
+                ListCreateProductSerializer,
+                context,
+                chunk_size=settings.PRODUCT_EXPORT_CHUNK_SIZE,
+            )
+
+        page = paginator.paginate_queryset(products, request)
+        serializer = ListCreateProductSerializer(page, many=True, context=context)
+        return paginator.get_paginated_response(serializer.data)
 
     def post(self, request, format=None):
         print(request.data)  # Debug the incoming FormData
@@ -43,10 +73,81 @@ class ProductCreateView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class ProductImportView(APIView):
+    """
+    Bulk import products from an uploaded CSV or JSONL `file`. The format
+    follows the file extension unless `file_format` is given. Rows are read
+    as a stream and inserted in chunks; rows that fail are listed with
+    their errors while the rest are imported.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        file = request.FILES.get("file")
+        if file is None:
+            return Response(
+                {"error": "No file was uploaded"}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        fmt = import_format(file.name, request.data.get("file_format"))
+        if fmt is None:
+            return Response(
+                {"error": "Only CSV and JSONL files can be imported"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        report = ProductImporter(request.user).run(read_records(file, fmt))
+        if report["created"]:
+            return Response(report, status=status.HTTP_201_CREATED)
+        return Response(report, status=status.HTTP_400_BAD_REQUEST)
+
+
+class ProductExportView(APIView):
+    """
+    Stream the authenticated owner's whole catalog as CSV or JSONL, with
+    each product's options and image URLs. The response starts right away
+    and products are read in chunks, so large catalogs never sit in memory.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, fmt):
+        if fmt not in EXPORT_FORMATS:
+            raise Http404()
+
+        rows = export_rows(export_queryset(request.user), request)
+        response = StreamingHttpResponse(
+            stream_export(rows, fmt), content_type=EXPORT_FORMATS[fmt]
+        )
+        response["Content-Disposition"] = f'attachment; filename="products.{fmt}"'
+        return response
+
+
+class ProductBulkUpdateView(APIView):
+    """
+    PATCH a list of `{"id": ..., <field>: ...}` changes to update the
+    price, stock and flags of many products at once. Either every change
+    is applied or none is.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def patch(self, request):
+        serializer = BulkProductUpdateSerializer(data=request.data, allow_empty=False)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        products = bulk_update_products(request.user, serializer.validated_data)
+        return Response(
+            BulkProductUpdateSerializer(products).data, status=status.HTTP_200_OK
+        )
+
+
 class ProductDetailView(APIView):
     def get(self, request, pk):
-
-        product = get_object_or_404(Product, pk=pk)
+        products = optimize_queryset(Product.objects.all(), UpdateProductSerializer)
+        product = get_object_or_404(products, pk=pk)
         serializer = UpdateProductSerializer(product, context={"request": request})
         return Response(serializer.data)
 
@@ -95,7 +196,7 @@ class ProductImageUpdateView(APIView):
         else:
             images_data = []
 
-        created_images = []
+        uploads = []
 
         # Check if request explicitly sets a thumbnail
         thumbnail_requested = any(img.get("is_thumbnail", False) for img in images_data)
@@ -112,13 +213,26 @@ class ProductImageUpdateView(APIView):
                 file_data = request.FILES.get(f"image_files_{file_index}")
 
                 if file_data and isinstance(file_data, UploadedFile):
-                    new_image = ProductImage(product=product, is_thumbnail=is_thumbnail)
-                    new_image.image.save(file_data.name, file_data, save=True)
-
-                    created_images.append(ProductImageSerializer(new_image).data)
+                    uploads.append((file_data, is_thumbnail))
 
+        # Upload all files concurrently, then insert the rows in one go
+        try:
+            new_images = upload_product_images(product, uploads)
+        except ImageUploadError as e:
+            return Response({"error": str(e)}, status=status.HTTP_502_BAD_GATEWAY)
+
+        # Read the rows back for derivatives generated inline on commit
+        # (IMAGE_DERIVATIVE_WORKERS = 0). Background workers may not be
+        # done yet: image_srcset is then null and clients use `image`.
+        new_images = ProductImage.objects.filter(
+            pk__in=[image.pk for image in new_images]
+        ).order_by("pk")
+        created_images = ProductImageSerializer(
+            new_images, many=True, context={"request": request}
+        ).data
         return Response(created_images, status=status.HTTP_201_CREATED)
 
+    @atomic_with_uploads
     def put(self, request, product_pk, image_pk):
         """
         Update an existing image (e.g., set as thumbnail).
@@ -138,6 +252,8 @@ class ProductImageUpdateView(APIView):
                 ProductImage.objects.filter(product=product).exclude(
                     id=updated_image.id
                 ).update(is_thumbnail=False)
+                # The queryset update bypasses signals, resync explicitly
+                refresh_primary_images([product.id])
 
             return Response(serializer.data)
 
@@ -167,16 +283,63 @@ class ProductImageUpdateView(APIView):
             )
 
 
+class ProductImageDirectUploadView(DirectUploadView):
+    """
+    Upload a product image straight to storage, see DirectUploadView.
+    Finalize accepts `is_thumbnail` alongside the ticket.
+    """
+
+    upload_model = ProductImage
+    upload_field = "image"
+
+    def get_object(self, request, product_pk):
+        return get_object_or_404(Product, pk=product_pk, owner=request.user)
+
+    def finalize(self, request, product, name, **kwargs):
+        is_thumbnail = serializers.BooleanField().to_internal_value(
+            request.data.get("is_thumbnail", False)
+        )
+        image = ProductImage.objects.create(
+            product=product, image=name, is_thumbnail=is_thumbnail
+        )
+
+        # If this image is now the thumbnail, clear others
+        if is_thumbnail:
+            ProductImage.objects.filter(product=product).exclude(id=image.id).update(
+                is_thumbnail=False
+            )
+            refresh_primary_images([product.id])
+
+        serializer = ProductImageSerializer(image, context={"request": request})
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class CategoryImageDirectUploadView(DirectUploadView):
+    """Upload a category image straight to storage, see DirectUploadView."""
+
+    upload_model = Category
+    upload_field = "image"
+
+    def get_object(self, request, pk):
+        return get_object_or_404(Category, pk=pk)
+
+    def finalize(self, request, category, name, **kwargs):
+        category.image = name
+        category.save()
+        serializer = CategorySerializer(category, context={"request": request})
+        return Response(serializer.data)
+
+
 class PaginatedProductListView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, format=None):
-        products = Product.objects.filter(owner=request.user).order_by("-created_at")
+        products = owner_products(request.user)
         search = request.GET.get("search")
         if search:
             products = products.filter(name__icontains=search)
 
-        paginator = PageNumberPagination()
+        paginator = StorePagination()
         paginator.page_size = request.GET.get("page_size", 10)  # 👈 important
 
         queryset = paginator.paginate_queryset(products, request)
@@ -190,13 +353,14 @@ class CategoryListCreateView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        # Annotate product_count in the queryset
-        categories = Category.objects.annotate(product_count=Count("product"))
+        # Annotate the store's own product_count from the counters
+        categories = annotate_product_counts(Category.objects.all(), request.user.pk)
         serializer = CategorySerializer(
             categories, many=True, context={"request": request}
         )
         return Response(serializer.data)
 
+    @atomic_with_uploads
     def post(self, request):
         serializer = CategorySerializer(data=request.data, context={"request": request})
         if serializer.is_valid():
@@ -212,6 +376,7 @@ class CategoryDetailView(APIView):
         serializer = CategorySerializer(category)
         return Response(serializer.data)
 
+    @atomic_with_uploads
     def put(self, request, pk):  # Add pk here
         print("poster")
         category = get_object_or_404(Category, pk=pk)
@@ -234,12 +399,12 @@ class PaginatedCategoryListCreateView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        categories = Category.objects.annotate(product_count=Count("product"))
+        categories = annotate_product_counts(Category.objects.all(), request.user.pk)
         search = request.GET.get("search")
         if search:
             categories = categories.filter(name__icontains=search)
 
-        paginator = PageNumberPagination()
+        paginator = StorePagination()
         paginator.page_size = request.GET.get("page_size", 10)  # 👈 important
 
         queryset = paginator.paginate_queryset(categories, request)
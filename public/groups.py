@@ -0,0 +1,59 @@
+from collections import namedtuple
+
+from django.db.models import Count, Min, Q
+
+from product.models import Product
+
+
+# A storefront tile: ``key`` names the entry in the response payload and
+# ``filter`` is the Q object selecting the products it summarizes
+# (``None`` means every product of the store).
+ProductGroup = namedtuple("ProductGroup", ["key", "filter"])
+
+
+DEFAULT_PRODUCT_GROUPS = (
+    ProductGroup("total_products", None),
+    ProductGroup("featured_products", Q(featured=True)),
+    ProductGroup("recent_products", Q(recent=True)),
+)
+
+
+def summarize_product_groups(queryset, groups):
+    """
+    Compute the count and representative product of every group with a
+    single conditional-aggregate query.
+
+    Returns ``{key: {"count": int, "product_id": int | None}}``. The
+    representative product is the oldest one (lowest id) in the group.
+    """
+    aggregates = {}
+    for group in groups:
+        aggregates[f"{group.key}__count"] = Count("id", filter=group.filter)
+        aggregates[f"{group.key}__first"] = Min("id", filter=group.filter)
+
+    row = queryset.aggregate(**aggregates)
+
+    return {
+        group.key: {
+            "count": row[f"{group.key}__count"],
+            "product_id": row[f"{group.key}__first"],
+        }
+        for group in groups
+    }
+
+
+def primary_image_names(product_ids):
+    """
+    Return ``{product_id: image_name}`` for the given products in one query,
+    read from the denormalized primary image of each product.
+    """
+    product_ids = {pk for pk in product_ids if pk is not None}
+    if not product_ids:
+        return {}
+
+    rows = (
+        Product.objects.filter(pk__in=product_ids)
+        .exclude(primary_image_path="")
+        .values_list("id", "primary_image_path")
+    )
+    return dict(rows)
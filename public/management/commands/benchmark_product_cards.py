@@ -0,0 +1,68 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from product.models import Product
+from public.serializers import FeaturedProductSerializer, ProductCardSerializer
+from utils.stores import store_resolver
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare FeaturedProductSerializer and ProductCardSerializer on a "
+        "store's products, reporting time and queries per 100 products."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("store_name", help="Store whose products are serialized.")
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=100,
+            help="Number of products serialized per run.",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=10,
+            help="Number of runs; the best one is reported.",
+        )
+
+    def handle(self, *args, **options):
+        tenant = store_resolver.resolve(options["store_name"])
+        if tenant is None:
+            raise CommandError(f"Store '{options['store_name']}' not found.")
+
+        products = Product.objects.filter(owner_id=tenant.owner_id).order_by(
+            "-created_at"
+        )[: options["limit"]]
+        count = products.count()
+        if not count:
+            raise CommandError("The store has no products to serialize.")
+
+        request = RequestFactory().get("/", HTTP_HOST="localhost")
+        for serializer_class in (FeaturedProductSerializer, ProductCardSerializer):
+            seconds, queries = self.measure(
+                serializer_class, products, request, options["repeat"]
+            )
+            per_100 = seconds * 1000 * 100 / count
+            self.stdout.write(
+                f"{serializer_class.__name__:<28} {per_100:8.2f} ms/100 products"
+                f"  {queries:4d} queries ({count} products)"
+            )
+
+    def measure(self, serializer_class, products, request, repeat):
+        best = None
+        queries = 0
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                serializer_class(
+                    products.all(), many=True, context={"request": request}
+                ).data
+                elapsed = time.perf_counter() - start
+            queries = len(captured)
+            best = elapsed if best is None else min(best, elapsed)
+        return best, queries
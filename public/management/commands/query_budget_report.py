@@ -0,0 +1,64 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from utils.querybudget import measure_endpoints
+from utils.seed import seed_store
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed throwaway stores of the given catalog sizes and report queries, "
+        "duplicate queries and time of every API endpoint against its budget. "
+        "Nothing is kept in the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--products",
+            type=int,
+            nargs="+",
+            default=[3, 200],
+            help="Catalog sizes to seed and compare.",
+        )
+
+    def handle(self, *args, **options):
+        sizes = options["products"]
+        if any(size < 1 for size in sizes):
+            raise CommandError("Catalog sizes must be at least 1.")
+
+        with transaction.atomic():
+            runs = [
+                measure_endpoints(seed_store(f"Query Budget {size}", products=size))
+                for size in sizes
+            ]
+            transaction.set_rollback(True)
+
+        header = "".join(f"{f'{size} products':>28}" for size in sizes)
+        self.stdout.write(f"{'endpoint':<30}{'budget':>7}{header}")
+        self.stdout.write(f"{'':<37}" + f"{'queries   dup       ms':>28}" * len(sizes))
+
+        failures = 0
+        for measurements in zip(*runs):
+            endpoint = measurements[0].endpoint
+            cells = "".join(
+                f"{m.queries:>13d}{m.duplicates:>6d}{m.seconds * 1000:>9.1f}"
+                if m.status == endpoint.status
+                else f"{f'HTTP {m.status}':>28}"
+                for m in measurements
+            )
+            problems = []
+            if any(m.status != endpoint.status for m in measurements):
+                problems.append("unexpected status")
+            if any(m.queries > endpoint.budget for m in measurements):
+                problems.append("over budget")
+            if len({m.queries for m in measurements}) > 1:
+                problems.append("grows with catalog")
+            failures += bool(problems)
+
+            line = f"{endpoint.name:<30}{endpoint.budget:>7d}{cells}"
+            if problems:
+                line = self.style.ERROR(f"{line}  {', '.join(problems)}")
+            self.stdout.write(line)
+
+        if failures:
+            raise CommandError(f"{failures} endpoint(s) outside their query budget.")
+        self.stdout.write(self.style.SUCCESS("Every endpoint is within its budget."))
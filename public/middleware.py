@@ -0,0 +1,99 @@
+from django.conf import settings
+from django.http import Http404
+from django.http.request import split_domain_port
+from account.models import normalize_store_name
+from utils.replicas import primary_reads, read_from_replica, replica_alias
+from utils.stores import store_resolver
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class TenantMiddleware:
+    """
+    Attach the storefront a request targets to `request.tenant`.
+
+    The store is taken from the Host header (`<store>.sellexplore.shop`),
+    falling back to the `store_name`/`storename` URL argument of public
+    views. A URL naming another store than the host is a 404. Resolution
+    goes through the in-memory StoreResolver, so the endpoints a
+    storefront loads share one lookup.
+    """
+
+    url_kwargs = ("store_name", "storename")
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.tenant = None
+        request.tenant_host_name = self.store_name_from_host(request)
+        if request.tenant_host_name:
+            request.tenant = store_resolver.resolve(request.tenant_host_name)
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        for kwarg in self.url_kwargs:
+            if not view_kwargs.get(kwarg):
+                continue
+            if request.tenant_host_name is None:
+                request.tenant = store_resolver.resolve(view_kwargs[kwarg])
+            elif normalize_store_name(view_kwargs[kwarg]) != normalize_store_name(
+                request.tenant_host_name
+            ):
+                # One store's host serving another store's URL
+                raise Http404("The URL names another store than the host.")
+            break
+        return None
+
+    def store_name_from_host(self, request):
+        domain, _ = split_domain_port(request.get_host())
+        for suffix in getattr(settings, "TENANT_HOST_SUFFIXES", ()):
+            if domain.endswith(suffix):
+                subdomain = domain[: -len(suffix)]
+                if subdomain and "." not in subdomain and subdomain not in getattr(
+                    settings, "TENANT_RESERVED_SUBDOMAINS", ()
+                ):
+                    return subdomain
+        return None
+
+
+class ReadReplicaMiddleware:
+    """
+    Send the reads of safe-method requests to the views of
+    DATABASE_REPLICA_VIEWS (module prefixes, e.g. "public.") to the read
+    replica, see utils.replicas.
+
+    Unsafe requests read the primary. A client that sends one gets a
+    cookie keeping its reads on the primary for DATABASE_REPLICA_LAG
+    seconds, so owners see their own edits on the storefront straight
+    away. The frontends call the API cross-site, so the cookie is
+    SameSite=None (and therefore Secure) to come back with those XHRs.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        # Reads stay on the primary unless process_view picks the replica
+        with primary_reads():
+            response = self.get_response(request)
+
+        if request.method not in SAFE_METHODS and replica_alias():
+            response.set_cookie(
+                settings.DATABASE_REPLICA_COOKIE,
+                "1",
+                max_age=settings.DATABASE_REPLICA_LAG,
+                httponly=True,
+                secure=True,
+                samesite="None",
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (
+            request.method in SAFE_METHODS
+            and settings.DATABASE_REPLICA_COOKIE not in request.COOKIES
+            and view_func.__module__.startswith(tuple(settings.DATABASE_REPLICA_VIEWS))
+        ):
+            read_from_replica()
+        return None
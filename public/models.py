@@ -1,4 +1,24 @@
 from django.db import models
+from django.utils import timezone
+from account.models import User
 
-# Create your models here.
- 
\ No newline at end of file
+
+class StoreContentVersion(models.Model):
+    """
+    Content generation of a store's public pages.
+
+    Bumped by signals whenever anything rendered on the storefront changes,
+    so public views can derive their ETag/Last-Modified from this single row.
+    """
+
+    owner = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="content_version",
+    )
+    version = models.PositiveBigIntegerField(default=1)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.owner_id} - v{self.version}"
@@ -1,12 +1,17 @@
+from django.db.models import QuerySet
 from rest_framework import serializers
 from detail.models import StoreFAQ, Store
-from product.models import Product
+from product.loaders import load_categories, load_product_images
+from product.models import Category, Product, ProductImage
 from product.serializers import (
     CategorySerializer,
     ProductImageSerializer,
     ProductOptionsSerializer,
 )
 from store_setting.models import StoreConfigurations, Cover, Logo
+from utils.images import ImageMetaField, SrcsetField, build_srcset, public_image_meta
+from utils.loaders import LoaderField, LoaderListSerializer
+from utils.media import MediaURLBuilder
 
 
 class StoreFAQSerializer(serializers.ModelSerializer):
@@ -16,21 +21,34 @@ class StoreFAQSerializer(serializers.ModelSerializer):
 
 
 class StoreConfigurationsSerializer(serializers.ModelSerializer):
+    background_image_one_srcset = SrcsetField("background_image_one")
+    background_image_two_srcset = SrcsetField("background_image_two")
+    background_image_three_srcset = SrcsetField("background_image_three")
+    background_image_one_meta = ImageMetaField("background_image_one")
+    background_image_two_meta = ImageMetaField("background_image_two")
+    background_image_three_meta = ImageMetaField("background_image_three")
+
     class Meta:
         model = StoreConfigurations
-        fields = "__all__"
+        exclude = ["image_derivatives", "image_meta"]
 
 
 class CoverSerializer(serializers.ModelSerializer):
+    cover_image_srcset = SrcsetField("cover_image")
+    cover_image_meta = ImageMetaField("cover_image")
+
     class Meta:
         model = Cover
-        fields = "__all__"
+        exclude = ["image_derivatives", "image_meta"]
 
 
 class LogoSerializer(serializers.ModelSerializer):
+    logo_srcset = SrcsetField("logo")
+    logo_meta = ImageMetaField("logo")
+
     class Meta:
         model = Logo
-        fields = "__all__"
+        exclude = ["image_derivatives", "image_meta"]
 
 
 class StoreSerializer(serializers.ModelSerializer):
@@ -40,19 +58,26 @@ class StoreSerializer(serializers.ModelSerializer):
     )
     cover = CoverSerializer(source="user.logo", read_only=True)
     logo = LogoSerializer(source="user.background", read_only=True)
+    image_one_meta = ImageMetaField("image_one")
+    image_two_meta = ImageMetaField("image_two")
+    image_three_meta = ImageMetaField("image_three")
 
     class Meta:
         model = Store
-        fields = "__all__"
+        exclude = ["image_meta"]
 
 
 class FeaturedProductSerializer(serializers.ModelSerializer):
-    images = ProductImageSerializer(many=True, required=False)
+    # Loaded for the whole list at once, see utils.loaders
+    images = LoaderField(
+        "id", load_product_images, ProductImageSerializer(many=True), default=[]
+    )
     options = ProductOptionsSerializer(many=True, required=False)
-    category = CategorySerializer(required=False)
+    category = LoaderField("category_id", load_categories, CategorySerializer())
 
     class Meta:
         model = Product
+        list_serializer_class = LoaderListSerializer
         fields = [
             "id",
             "name",
@@ -69,3 +94,133 @@ class FeaturedProductSerializer(serializers.ModelSerializer):
             "images",
             "options",
         ]
+
+
+class ProductCardListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        return self.child.to_cards(data)
+
+
+class ProductCardSerializer(serializers.BaseSerializer):
+    """
+    Read-only drop-in for `FeaturedProductSerializer` on public lists.
+
+    Produces the same JSON, but reads products through a flat `.values()`
+    projection (or the already loaded instances), fetches categories and
+    images for the whole list in one query each and builds media URLs from
+    a prefix resolved once per list.
+    """
+
+    class Meta:
+        list_serializer_class = ProductCardListSerializer
+
+    # Scalar fields are rendered by the same DRF fields as the model
+    # serializer, so number and text formatting cannot drift
+    scalar_fields = [
+        "id",
+        "name",
+        "description",
+        "price",
+        "discount_price",
+        "quantity",
+        "availability",
+        "hot_deal",
+        "featured",
+        "recent",
+        "extra_info",
+    ]
+    _fields = None
+
+    @classmethod
+    def get_scalar_fields(cls):
+        if cls._fields is None:
+            fields = FeaturedProductSerializer().fields
+            cls._fields = {name: fields[name] for name in cls.scalar_fields}
+        return cls._fields
+
+    def to_representation(self, instance):
+        return self.to_cards([instance])[0]
+
+    def get_rows(self, data):
+        columns = [*self.scalar_fields, "category_id"]
+        if isinstance(data, QuerySet):
+            return list(data.values(*columns))
+        return [{column: getattr(obj, column) for column in columns} for obj in data]
+
+    def to_cards(self, data):
+        rows = self.get_rows(data)
+        if not rows:
+            return []
+
+        request = self.context.get("request")
+        categories = self.get_categories({row["category_id"] for row in rows}, request)
+        images = self.get_images([row["id"] for row in rows], request)
+
+        fields = self.get_scalar_fields()
+        cards = []
+        for row in rows:
+            # Same keys, in the same order, as FeaturedProductSerializer
+            card = {}
+            for name in FeaturedProductSerializer.Meta.fields:
+                if name == "category":
+                    card[name] = categories.get(row["category_id"])
+                elif name == "images":
+                    card[name] = images.get(row["id"], [])
+                elif name in fields:
+                    value = row[name]
+                    card[name] = None if value is None else fields[name].to_representation(value)
+            cards.append(card)
+        return cards
+
+    def get_categories(self, category_ids, request):
+        category_ids.discard(None)
+        if not category_ids:
+            return {}
+
+        urls = MediaURLBuilder.for_field(Category, "image", request)
+        rows = Category.objects.filter(pk__in=category_ids).values(
+            "id", "name", "image", "image_derivatives", "image_meta", "slug"
+        )
+        return {
+            row["id"]: {
+                "id": row["id"],
+                "name": row["name"],
+                "image": urls.url(row["image"]),
+                "image_srcset": build_srcset(
+                    row["image"], row["image_derivatives"].get("image"), urls.url
+                ),
+                "image_meta": public_image_meta(
+                    row["image"], row["image_meta"].get("image")
+                ),
+                "slug": row["slug"],
+            }
+            for row in rows
+        }
+
+    def get_images(self, product_ids, request):
+        urls = MediaURLBuilder.for_field(ProductImage, "image", request)
+        rows = (
+            ProductImage.objects.filter(product_id__in=product_ids)
+            .order_by("id")
+            .values_list(
+                "product_id",
+                "id",
+                "image",
+                "image_derivatives",
+                "image_meta",
+                "is_thumbnail",
+            )
+        )
+
+        images = {}
+        for product_id, pk, name, derivatives, meta, is_thumbnail in rows:
+            images.setdefault(product_id, []).append(
+                {
+                    "id": pk,
+                    "image": urls.url(name),
+                    "image_srcset": build_srcset(name, derivatives.get("image"), urls.url),
+                    "image_meta": public_image_meta(name, meta.get("image")),
+                    "is_thumbnail": is_thumbnail,
+                }
+            )
+        return images
@@ -0,0 +1,104 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from account.models import UserProfile
+from detail.models import Store, StoreFAQ
+from product.models import (
+    Category,
+    CategoryProductCount,
+    Product,
+    ProductImage,
+    ProductOptions,
+)
+from store_setting.models import Cover, Logo, StoreConfigurations
+from .versioning import bump_store_version, bump_store_versions
+
+
+def owner_of_product(product_id):
+    return (
+        Product.objects.filter(pk=product_id)
+        .values_list("owner_id", flat=True)
+        .first()
+    )
+
+
+def owner_of_profile(profile_id):
+    return (
+        UserProfile.objects.filter(pk=profile_id)
+        .values_list("user_id", flat=True)
+        .first()
+    )
+
+
+def owner_of_store(store_id):
+    return (
+        Store.objects.filter(pk=store_id)
+        .values_list("user__user_id", flat=True)
+        .first()
+    )
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def bump_for_product(sender, instance, **kwargs):
+    bump_store_version(instance.owner_id)
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=ProductOptions)
+@receiver(post_delete, sender=ProductOptions)
+def bump_for_product_child(sender, instance, **kwargs):
+    bump_store_version(owner_of_product(instance.product_id))
+
+
+def owners_in_category(category_id):
+    return list(
+        CategoryProductCount.objects.filter(category_id=category_id, count__gt=0)
+        .values_list("owner_id", flat=True)
+    )
+
+
+# Columns the image workers fill in after the upload
+CATEGORY_DERIVED_FIELDS = {"image_derivatives", "image_meta", "updated_at"}
+
+
+@receiver(post_save, sender=Category)
+def bump_for_category(sender, instance, update_fields=None, **kwargs):
+    # Only stores listing the category show it. Derivative and meta saves
+    # are skipped; those pages keep the original image until their next edit
+    if update_fields is not None and set(update_fields) <= CATEGORY_DERIVED_FIELDS:
+        return
+    bump_store_versions(owners_in_category(instance.pk))
+
+
+@receiver(pre_delete, sender=Category)
+def remember_category_owners(sender, instance, **kwargs):
+    # The counters are deleted along with the category
+    instance._owner_ids = owners_in_category(instance.pk)
+
+
+@receiver(post_delete, sender=Category)
+def bump_for_deleted_category(sender, instance, **kwargs):
+    bump_store_versions(getattr(instance, "_owner_ids", ()))
+
+
+@receiver(post_save, sender=Store)
+@receiver(post_delete, sender=Store)
+@receiver(post_save, sender=Logo)
+@receiver(post_delete, sender=Logo)
+@receiver(post_save, sender=Cover)
+@receiver(post_delete, sender=Cover)
+def bump_for_profile_child(sender, instance, **kwargs):
+    bump_store_version(owner_of_profile(instance.user_id))
+
+
+@receiver(post_save, sender=StoreFAQ)
+@receiver(post_delete, sender=StoreFAQ)
+def bump_for_faq(sender, instance, **kwargs):
+    bump_store_version(owner_of_store(instance.store_id))
+
+
+@receiver(post_save, sender=StoreConfigurations)
+@receiver(post_delete, sender=StoreConfigurations)
+def bump_for_configurations(sender, instance, **kwargs):
+    bump_store_version(instance.user_id)
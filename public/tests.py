@@ -1,3 +1,893 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-# Create your tests here.
+from datetime import timedelta
+from unittest import mock
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.http import Http404
+from django.db.models import F
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import resolve
+from django.utils import timezone
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework.views import APIView
+
+from account.models import User
+from detail.models import Store, StoreFAQ
+from product.models import Category, Product, ProductImage
+from product.serializers import CategorySerializer
+from store_setting.models import StoreConfigurations
+from utils.caching import CacheHeadersMixin
+from utils.loaders import DataLoader, get_loader
+from utils.cache_backends import LRUFileBasedCache
+from utils.querybudget import ENDPOINTS, EXEMPT, measure_endpoints, url_patterns
+from utils.replicas import replica_reads, stick_to_primary
+from utils.response_cache import ResponseCache, SingleFlight, response_cache
+from utils.seed import seed_store
+from utils.stores import StoreResolver, Tenant, store_resolver
+from .middleware import TenantMiddleware
+from .models import StoreContentVersion
+from .versioning import bump_store_version, get_store_version
+from .serializers import FeaturedProductSerializer, ProductCardSerializer
+
+
+class SlowStoreView(CacheHeadersMixin, APIView):
+    """Counts how often its response body is rebuilt."""
+
+    single_flight = True
+    version = 1
+    builds = 0
+    build_delay = 0.2
+    lock = threading.Lock()
+    updated_at = timezone.now()
+
+    def get_content_version(self):
+        return (SlowStoreView.version, SlowStoreView.updated_at)
+
+    def get(self, request):
+        self.store_owner_id = 1
+        return self.cached_response(request, self.build)
+
+    def build(self):
+        with SlowStoreView.lock:
+            SlowStoreView.builds += 1
+        time.sleep(self.build_delay)
+        return {"version": SlowStoreView.version}
+
+
+@override_settings(
+    CACHES={
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+        "responses": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "single-flight-tests",
+        },
+    },
+    RESPONSE_CACHE_ALIAS="responses",
+)
+class SingleFlightTests(SimpleTestCase):
+    parallel_requests = 8
+
+    def setUp(self):
+        SlowStoreView.version = 1
+        SlowStoreView.builds = 0
+        caches["responses"].clear()
+        self.view = SlowStoreView.as_view()
+        self.factory = APIRequestFactory()
+
+    def get_in_parallel(self):
+        barrier = threading.Barrier(self.parallel_requests)
+
+        def fetch(_):
+            request = self.factory.get("/store/")
+            barrier.wait()
+            return self.view(request)
+
+        with ThreadPoolExecutor(max_workers=self.parallel_requests) as pool:
+            return list(pool.map(fetch, range(self.parallel_requests)))
+
+    def test_only_one_rebuild_under_parallel_requests(self):
+        responses = self.get_in_parallel()
+
+        self.assertEqual(SlowStoreView.builds, 1)
+        self.assertTrue(all(r.status_code == 200 for r in responses))
+        statuses = sorted(r["X-Cache"] for r in responses)
+        self.assertEqual(statuses, ["HIT"] * (self.parallel_requests - 1) + ["MISS"])
+        self.assertEqual(len({r["ETag"] for r in responses}), 1)
+
+    def test_stale_body_is_served_while_one_worker_rebuilds(self):
+        self.view(self.factory.get("/store/"))
+        SlowStoreView.version = 2
+
+        responses = self.get_in_parallel()
+
+        self.assertEqual(SlowStoreView.builds, 2)
+        stale = [r for r in responses if r["X-Cache"] == "STALE"]
+        fresh = [r for r in responses if r["X-Cache"] == "MISS"]
+        self.assertEqual(len(fresh), 1)
+        self.assertEqual(len(stale), self.parallel_requests - 1)
+        self.assertEqual(fresh[0].content, b'{"version":2}')
+        for response in stale:
+            self.assertEqual(response.content, b'{"version":1}')
+            self.assertIn("stale-while-revalidate=", response["Cache-Control"])
+            self.assertNotEqual(response["ETag"], fresh[0]["ETag"])
+
+        self.assertEqual(self.view(self.factory.get("/store/"))["X-Cache"], "HIT")
+
+
+class FakeRedisCache(BaseCache):
+    """
+    Stands in for Redis shared by several processes: one store behind a
+    lock, with `add` as an atomic SET NX.
+    """
+
+    def __init__(self):
+        super().__init__({})
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        with self._lock:
+            if key in self._data:
+                return False
+            self._data[key] = value
+            return True
+
+    def get(self, key, default=None, version=None):
+        with self._lock:
+            return self._data.get(key, default)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        with self._lock:
+            self._data[key] = value
+
+    def delete(self, key, version=None):
+        with self._lock:
+            return self._data.pop(key, None) is not None
+
+
+class SharedBackendSingleFlightTests(SimpleTestCase):
+    """Workers in separate processes, each with its own SingleFlight."""
+
+    workers = 8
+
+    def claim_in_parallel(self, backend):
+        barrier = threading.Barrier(self.workers)
+
+        def claim(_):
+            barrier.wait()
+            return SingleFlight().acquire("response:1:StoreView::digest", backend)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            return list(pool.map(claim, range(self.workers)))
+
+    def test_one_process_rebuilds_with_redis(self):
+        self.assertEqual(self.claim_in_parallel(FakeRedisCache()).count(True), 1)
+
+    def test_one_process_rebuilds_with_the_file_cache(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location, ignore_errors=True)
+        backend = LRUFileBasedCache(location, {})
+        self.assertEqual(self.claim_in_parallel(backend).count(True), 1)
+
+    def test_release_lets_the_next_process_rebuild(self):
+        backend = FakeRedisCache()
+        key = "response:1:StoreView::digest"
+        first, second = SingleFlight(), SingleFlight()
+        self.assertTrue(first.acquire(key, backend))
+        self.assertFalse(second.acquire(key, backend))
+        first.release(key, backend)
+        self.assertTrue(second.acquire(key, backend))
+
+
+@override_settings(
+    CACHES={
+        alias: {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": f"response-cache-tests-{alias}",
+        }
+        for alias in ("default", "responses")
+    },
+    RESPONSE_CACHE_ALIAS="responses",
+)
+class ResponseCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = seed_store("Cached Store", products=2)
+        cls.url = "/api/item-group/Cached Store/"
+
+    def setUp(self):
+        for alias in ("default", "responses"):
+            caches[alias].clear()
+        store_resolver.clear()
+        response_cache.reset_stats()
+        self.client = APIClient()
+
+    def get(self, **extra):
+        response = self.client.get(self.url, **extra)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_hits_and_misses_are_counted_per_view(self):
+        self.assertEqual(self.get()["X-Cache"], "MISS")
+        self.assertEqual(self.get()["X-Cache"], "HIT")
+        self.assertEqual(self.get()["X-Cache"], "HIT")
+        self.assertEqual(
+            response_cache.stats(),
+            {"ProductGroupView": {"hits": 2, "misses": 1, "stale": 0}},
+        )
+
+    def test_query_order_shares_an_entry(self):
+        self.client.get(self.url + "?a=1&b=2")
+        self.assertEqual(self.client.get(self.url + "?b=2&a=1")["X-Cache"], "HIT")
+        self.assertEqual(self.client.get(self.url + "?a=2&b=2")["X-Cache"], "MISS")
+
+    def test_origins_do_not_share_entries(self):
+        # Image URLs are absolute, a body rendered for one host is wrong
+        # for any other
+        local = self.get(HTTP_HOST="localhost")
+        other = self.get(HTTP_HOST="127.0.0.1")
+        secure = self.get(HTTP_HOST="localhost", secure=True)
+        self.assertEqual([r["X-Cache"] for r in (local, other, secure)], ["MISS"] * 3)
+        self.assertIn(b"http://localhost/", local.content)
+        self.assertIn(b"http://127.0.0.1/", other.content)
+        self.assertIn(b"https://localhost/", secure.content)
+        self.assertNotIn(b"localhost", other.content)
+
+        again = self.get(HTTP_HOST="localhost")
+        self.assertEqual(again["X-Cache"], "HIT")
+        self.assertEqual(again.content, local.content)
+
+    def test_edits_make_entries_stale(self):
+        self.assertEqual(self.get().json()["featured_products"]["count"], 1)
+        Product.objects.filter(owner=self.owner).update(featured=True)
+        StoreContentVersion.objects.filter(owner=self.owner).update(
+            version=F("version") + 1
+        )
+        caches["default"].clear()
+        response = self.get()
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.json()["featured_products"]["count"], 2)
+
+
+
+@override_settings(
+    CACHES={
+        alias: {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": f"content-version-tests-{alias}",
+        }
+        for alias in ("default", "responses")
+    },
+    RESPONSE_CACHE_ALIAS="responses",
+)
+class ContentVersionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = seed_store("Version Store", products=2, categories=1)
+        cls.other = seed_store("Other Version Store", products=1, categories=1)
+        cls.lamps = Category.objects.create(name="Lamps")
+        product = cls.owner.products.order_by("id").first()
+        product.category = cls.lamps
+        product.save()
+        for owner in (cls.owner, cls.other):
+            StoreContentVersion.objects.create(owner=owner)
+        cls.url = "/api/stores/Version Store/"
+
+    def setUp(self):
+        for alias in ("default", "responses"):
+            caches[alias].clear()
+        store_resolver.clear()
+        self.client = APIClient()
+
+    def version(self, owner):
+        return StoreContentVersion.objects.get(owner=owner).version
+
+    def versions(self):
+        return self.version(self.owner), self.version(self.other)
+
+    def test_category_edits_bump_only_the_stores_listing_it(self):
+        before = self.versions()
+        self.lamps.name = "Desk lamps"
+        self.lamps.save()
+        self.assertEqual(self.versions(), (before[0] + 1, before[1]))
+
+        shared = Category.objects.get(name="Seed category 0")
+        shared.save()
+        self.assertEqual(self.versions(), (before[0] + 2, before[1] + 1))
+
+    def test_derivative_and_meta_saves_do_not_bump(self):
+        before = self.versions()
+        self.lamps.image_derivatives = {"image": {"source": "x", "widths": {}}}
+        self.lamps.save(update_fields=["image_derivatives"])
+        self.lamps.save(update_fields=["image_meta"])
+        self.assertEqual(self.versions(), before)
+
+    def test_deleting_a_category_bumps_its_stores(self):
+        before = self.versions()
+        self.lamps.delete()
+        self.assertEqual(self.versions(), (before[0] + 1, before[1]))
+
+    def test_a_read_does_not_overwrite_a_newer_bump(self):
+        get_or_create = StoreContentVersion.objects.get_or_create
+
+        def read_then_bump(**kwargs):
+            # The bump commits between the reader's query and its cache write
+            result = get_or_create(**kwargs)
+            with self.captureOnCommitCallbacks(execute=True):
+                bump_store_version(self.owner.pk)
+            return result
+
+        with mock.patch.object(
+            StoreContentVersion.objects, "get_or_create", side_effect=read_then_bump
+        ):
+            stale, _ = get_store_version(self.owner.pk)
+        self.assertEqual(get_store_version(self.owner.pk)[0], stale + 1)
+
+    def test_unchanged_store_answers_not_modified(self):
+        etag = self.client.get(self.url)["ETag"]
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def assert_edit_changes_the_validator(self, edit):
+        etag = self.client.get(self.url)["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            edit()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_faq_edits_change_the_validator(self):
+        faq = StoreFAQ.objects.filter(store__user__user=self.owner).first()
+
+        def edit():
+            faq.answer = "A new answer."
+            faq.save()
+
+        self.assert_edit_changes_the_validator(edit)
+
+    def test_configuration_edits_change_the_validator(self):
+        configurations = StoreConfigurations.objects.get(user=self.owner)
+
+        def edit():
+            configurations.headline = "A new headline"
+            configurations.save()
+
+        self.assert_edit_changes_the_validator(edit)
+
+
+class LRUFileBasedCacheTests(SimpleTestCase):
+    """The file cache standing in for Redis between worker processes."""
+
+    def setUp(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location, ignore_errors=True)
+        self.params = {"OPTIONS": {"MAX_ENTRIES": 3, "CULL_FREQUENCY": 3}}
+        self.location = location
+        self.cache = LRUFileBasedCache(location, self.params)
+
+    def age(self, key, seconds):
+        os.utime(self.cache._key_to_file(key), (seconds, seconds))
+
+    def test_least_recently_used_entry_is_evicted(self):
+        for age, key in enumerate("abc", start=1):
+            self.cache.set(key, key)
+            self.age(key, age * 100)
+
+        # Reading "a" makes "b" the least recently used entry
+        self.assertEqual(self.cache.get("a"), "a")
+        self.cache.set("d", "d")
+
+        self.assertEqual(
+            {key: self.cache.get(key) for key in "abcd"},
+            {"a": "a", "b": None, "c": "c", "d": "d"},
+        )
+
+    def test_workers_share_entries(self):
+        first, second = ResponseCache(), ResponseCache()
+        with override_settings(
+            CACHES={
+                "responses": {
+                    "BACKEND": "utils.cache_backends.LRUFileBasedCache",
+                    "LOCATION": self.location,
+                    **self.params,
+                }
+            },
+            RESPONSE_CACHE_ALIAS="responses",
+        ):
+            key = "response:1:StoreView::digest"
+            # Fresh at the version it was rendered at, stale at any other
+            entry = {"version": 3, "body": b"{}"}
+            first.set(key, entry)
+            self.assertEqual(second.lookup(key, 3), (entry, True))
+            self.assertFalse(second.lookup(key, 4)[1])
+            # Metrics are per process
+            self.assertEqual(
+                second.stats(), {"StoreView": {"hits": 1, "misses": 0, "stale": 0}}
+            )
+            self.assertEqual(first.stats(), {})
+
+
+class DataLoaderTests(SimpleTestCase):
+    def setUp(self):
+        self.calls = []
+
+    def batch_load(self, keys):
+        self.calls.append(sorted(keys))
+        return {key: key * 10 for key in keys if key != 3}
+
+    def test_registered_keys_load_in_one_batch(self):
+        loader = DataLoader(self.batch_load, default=0)
+        for key in (1, 2, 3, 2, None):
+            loader.register(key)
+
+        self.assertEqual([loader.load(key) for key in (1, 2, 3, None)], [10, 20, 0, 0])
+        self.assertEqual(self.calls, [[1, 2, 3]])
+
+        # Cached keys are never fetched again, new ones are
+        self.assertEqual(loader.load(2), 20)
+        self.assertEqual(loader.load(4), 40)
+        self.assertEqual(self.calls, [[1, 2, 3], [4]])
+
+    def test_loaders_are_shared_per_request(self):
+        first = {"request": APIRequestFactory().get("/")}
+        second = {"request": APIRequestFactory().get("/")}
+        shared = {"request": first["request"]}
+
+        loader = get_loader(first, self.batch_load)
+        self.assertIs(get_loader(shared, self.batch_load), loader)
+        self.assertIsNot(get_loader(second, self.batch_load), loader)
+
+
+class LoaderSerializerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            email="owner@example.com",
+            store_name="Owner Store",
+            niche="fashion",
+            password="x",
+        )
+        cls.categories = [
+            Category.objects.create(name=f"Category {i}") for i in range(3)
+        ]
+
+    def add_products(self, count):
+        products = Product.objects.bulk_create(
+            Product(
+                owner=self.owner,
+                name=f"Product {i}",
+                price=i + 1,
+                category=self.categories[i % 3] if i % 4 else None,
+            )
+            for i in range(count)
+        )
+        products = Product.objects.filter(owner=self.owner, images__isnull=True)
+        ProductImage.objects.bulk_create(
+            ProductImage(product=product, image=f"products/images/{product.pk}.jpg")
+            for product in products
+        )
+
+    def serialize(self, queries):
+        products = Product.objects.filter(owner=self.owner).order_by("id")
+        context = {"request": APIRequestFactory().get("/")}
+        # The products, then one query for images and one for categories
+        with self.assertNumQueries(queries):
+            return FeaturedProductSerializer(products, many=True, context=context).data
+
+    def test_list_queries_do_not_grow_with_list_size(self):
+        self.add_products(4)
+        data = self.serialize(3)
+        self.assertEqual(len(data), 4)
+
+        self.add_products(40)
+        data = self.serialize(3)
+        self.assertEqual(len(data), 44)
+        self.assertIsNone(data[0]["category"])
+        self.assertEqual(data[1]["category"]["slug"], "category-1")
+        self.assertEqual(len(data[1]["images"]), 1)
+
+    def test_single_object_still_loads(self):
+        self.add_products(2)
+        product = Product.objects.order_by("id").last()
+        data = FeaturedProductSerializer(
+            product, context={"request": APIRequestFactory().get("/")}
+        ).data
+        self.assertEqual(data["category"]["id"], product.category_id)
+        self.assertEqual(data["images"][0]["id"], product.images.get().id)
+
+    def test_image_urls_need_no_queries(self):
+        request = APIRequestFactory().get("/")
+        with self.assertNumQueries(1):
+            data = CategorySerializer(
+                Category.objects.all(), many=True, context={"request": request}
+            ).data
+        self.assertEqual([category["image"] for category in data], [None] * 3)
+
+
+class ProductCardSerializerTests(TestCase):
+    """ProductCardSerializer renders what FeaturedProductSerializer does."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            email="cards@example.com",
+            store_name="Card Store",
+            niche="fashion",
+            password="x",
+        )
+        derivatives = {"image": {"source": "category/images/c.jpg", "widths": [320]}}
+        meta = {
+            "image": {
+                "source": "category/images/c.jpg",
+                "width": 800,
+                "height": 600,
+                "size": 1234,
+                "mime": "image/jpeg",
+                "lqip": "data:image/webp;base64,AA==",
+            }
+        }
+        with_image = Category.objects.create(
+            name="With Image",
+            image="category/images/c.jpg",
+            image_derivatives=derivatives,
+            image_meta=meta,
+        )
+        without_image = Category.objects.create(name="Without Image")
+
+        # Every combination of category (none, with and without image) and
+        # images (none, plain, with derivatives and meta)
+        for i, category in enumerate([None, with_image, without_image]):
+            for images in range(3):
+                product = Product.objects.create(
+                    owner=cls.owner,
+                    name=f"Product {i}-{images}",
+                    description="" if images else "Described",
+                    price=i + 1.5,
+                    discount_price=None if images else 1,
+                    category=category,
+                    extra_info={"size": i} if images else {},
+                )
+                # Bulk inserted: no signals trying to measure missing files
+                ProductImage.objects.bulk_create(
+                    cls.image(product, n, meta["image"]) for n in range(images)
+                )
+
+    @staticmethod
+    def image(product, n, meta):
+        """The first image is bare, the others have derivatives and meta."""
+        name = f"products/images/{product.pk}-{n}.jpg"
+        image = ProductImage(product=product, image=name, is_thumbnail=n == 0)
+        if n:
+            image.image_derivatives = {"image": {"source": name, "widths": [320, 640]}}
+            image.image_meta = {"image": {**meta, "source": name}}
+        return image
+
+    def setUp(self):
+        self.context = {"request": APIRequestFactory().get("/")}
+
+    def assert_same_cards(self, data):
+        expected = FeaturedProductSerializer(data, many=True, context=self.context).data
+        cards = ProductCardSerializer(data, many=True, context=self.context).data
+        self.assertEqual(len(cards), 9)
+        for card, product in zip(cards, expected):
+            with self.subTest(product["name"]):
+                self.assertEqual(list(card), list(product))
+                for field, value in product.items():
+                    self.assertEqual(card[field], value, field)
+
+    def test_queryset_cards_match(self):
+        self.assert_same_cards(Product.objects.filter(owner=self.owner).order_by("id"))
+
+    def test_instance_cards_match(self):
+        products = Product.objects.filter(owner=self.owner).order_by("id")
+        self.assert_same_cards(list(products))
+
+    def test_single_card_matches(self):
+        product = Product.objects.filter(images__image_meta__has_key="image").first()
+        self.assertEqual(
+            ProductCardSerializer(product, context=self.context).data,
+            FeaturedProductSerializer(product, context=self.context).data,
+        )
+
+
+class QueryBudgetTests(TestCase):
+    """Every endpoint stays within its query budget at any catalog size."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.small = seed_store("Small Seed Store", products=3)
+        cls.large = seed_store("Large Seed Store", products=40)
+
+    def test_queries_do_not_grow_with_catalog_size(self):
+        small = measure_endpoints(self.small)
+        large = measure_endpoints(self.large)
+        for before, after in zip(small, large):
+            endpoint = before.endpoint
+            with self.subTest(endpoint.name):
+                self.assertEqual(before.status, endpoint.status)
+                self.assertEqual(after.status, endpoint.status)
+                self.assertLessEqual(before.queries, endpoint.budget)
+                self.assertEqual(after.queries, before.queries)
+
+    def test_every_url_has_a_budget(self):
+        params = dict.fromkeys(["product", "image", "category", "faq", "option"], 1)
+        covered = {
+            resolve(endpoint.path.split("?")[0].format(store="shop", **params)).route
+            for endpoint in ENDPOINTS
+        }
+        for route in url_patterns():
+            with self.subTest(route):
+                exempt = any(route.startswith(prefix) for prefix in EXEMPT)
+                self.assertTrue(exempt or route in covered)
+
+
+@override_settings(
+    DATABASE_REPLICA_ROUTING=True,
+    CACHES={
+        alias: {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": f"replica-tests-{alias}",
+        }
+        for alias in ("default", "responses")
+    },
+)
+class ReadReplicaTests(TestCase):
+    """
+    Two SQLite files stand in for primary and replica. The store is copied
+    to the replica, then renamed on the primary only, as if replication
+    lagged behind.
+    """
+
+    databases = {"default", "replica"}
+    replicated_apps = ("account", "detail", "store_setting", "product", "public")
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = seed_store("Replica Store", products=2)
+        cls.product = cls.owner.products.order_by("id").first()
+        cls.replicate()
+        Product.objects.filter(pk=cls.product.pk).update(name="Primary name")
+
+    @classmethod
+    def replicate(cls):
+        for label in cls.replicated_apps:
+            for model in apps.get_app_config(label).get_models():
+                rows = list(model._base_manager.using("default").order_by("pk"))
+                model._base_manager.using("replica").bulk_create(rows)
+
+    def setUp(self):
+        for alias in ("default", "responses"):
+            caches[alias].clear()
+        store_resolver.clear()
+        self.client = APIClient()
+        # Edited long enough ago for the replica to have caught up
+        StoreContentVersion.objects.update_or_create(
+            owner=self.owner,
+            defaults={"updated_at": timezone.now() - timedelta(minutes=5)},
+        )
+
+    def product_names(self):
+        response = self.client.get("/api/items/Replica Store/items/?page_size=10")
+        self.assertEqual(response.status_code, 200)
+        return {product["name"] for product in response.json()["results"]}
+
+    def test_public_reads_use_the_replica(self):
+        self.assertNotIn("Primary name", self.product_names())
+        self.assertIn(self.product.name, self.product_names())
+
+    def test_dashboard_reads_use_the_primary(self):
+        self.client.force_authenticate(self.owner)
+        response = self.client.get("/api/products/?page=1")
+        names = {product["name"] for product in response.json()["results"]}
+        self.assertIn("Primary name", names)
+
+    def test_client_reads_its_own_writes(self):
+        self.client.force_authenticate(self.owner)
+        response = self.client.patch(
+            "/api/products/bulk/",
+            [{"id": self.product.pk, "featured": True}],
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        cookie = response.cookies[settings.DATABASE_REPLICA_COOKIE]
+        self.assertEqual(cookie["max-age"], settings.DATABASE_REPLICA_LAG)
+        # Sent along with the dashboard's cross-site requests
+        self.assertEqual(cookie["samesite"], "None")
+        self.assertTrue(cookie["secure"])
+
+        self.assertIn("Primary name", self.product_names())
+
+    def test_recently_edited_store_reads_the_primary(self):
+        url = "/api/featured-and-category/Replica Store/"
+        names = {p["name"] for p in self.client.get(url).json()["featured_products"]}
+        self.assertNotIn("Primary name", names)
+
+        StoreContentVersion.objects.filter(owner=self.owner).update(
+            version=F("version") + 1, updated_at=timezone.now()
+        )
+        caches["default"].clear()
+        names = {p["name"] for p in self.client.get(url).json()["featured_products"]}
+        self.assertIn("Primary name", names)
+
+    def test_recently_edited_store_lists_from_the_primary(self):
+        self.assertNotIn("Primary name", self.product_names())
+
+        StoreContentVersion.objects.filter(owner=self.owner).update(
+            version=F("version") + 1, updated_at=timezone.now()
+        )
+        caches["default"].clear()
+        self.assertIn("Primary name", self.product_names())
+
+    @override_settings(DATABASE_REPLICA_ROUTING=False)
+    def test_routing_can_be_turned_off(self):
+        self.assertIn("Primary name", self.product_names())
+        self.client.force_authenticate(self.owner)
+        response = self.client.patch(
+            "/api/products/bulk/",
+            [{"id": self.product.pk, "featured": True}],
+            format="json",
+        )
+        self.assertNotIn(settings.DATABASE_REPLICA_COOKIE, response.cookies)
+
+    def test_objects_read_from_the_replica_are_saved_to_the_primary(self):
+        with replica_reads():
+            product = Product.objects.get(pk=self.product.pk)
+            self.assertEqual(product._state.db, "replica")
+            product.quantity = 99
+            product.save(update_fields=["quantity"])
+            # Routing a write does not move the block's reads
+            self.assertNotEqual(Product.objects.get(pk=product.pk).quantity, 99)
+            stick_to_primary()
+            self.assertEqual(Product.objects.get(pk=product.pk).quantity, 99)
+
+        primary = Product.objects.using("default").get(pk=product.pk)
+        self.assertEqual(primary.quantity, 99)
+
+
+class StoreResolverTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            email="tenant@example.com",
+            store_name="Tenant Shop",
+            niche="fashion",
+            password="x",
+        )
+
+    def setUp(self):
+        # The shared resolver, the one the signals invalidate
+        self.resolver = store_resolver
+        self.resolver.clear()
+
+    def tenant(self):
+        return Tenant(
+            self.owner.pk,
+            self.owner.profile.store.pk,
+            self.owner.configurations.pk,
+        )
+
+    def test_resolves_case_insensitively(self):
+        self.assertEqual(self.resolver.resolve(" tenant SHOP"), self.tenant())
+        with self.assertNumQueries(0):
+            self.assertEqual(self.resolver.resolve("Tenant Shop"), self.tenant())
+
+    def test_unknown_and_inactive_stores_do_not_resolve(self):
+        self.assertIsNone(self.resolver.resolve("No Such Shop"))
+        self.resolver.resolve("Tenant Shop")
+        self.owner.is_active = False
+        self.owner.save()
+        self.assertIsNone(self.resolver.resolve("Tenant Shop"))
+
+    def test_entries_expire(self):
+        resolver = StoreResolver(timeout=0)
+        resolver.resolve("Tenant Shop")
+        with self.assertNumQueries(1):
+            resolver.resolve("Tenant Shop")
+
+    def test_least_recently_used_entries_are_dropped(self):
+        resolver = StoreResolver(max_entries=2)
+        for name in ("Tenant Shop", "Other", "Third"):
+            resolver.resolve(name)
+        with self.assertNumQueries(1):
+            resolver.resolve("Tenant Shop")
+
+    def test_user_save_invalidates(self):
+        self.assertIsNone(self.resolver.resolve("Fresh Shop"))
+        fresh = User.objects.create_user(
+            email="fresh@example.com",
+            store_name="Fresh Shop",
+            niche="fashion",
+            password="x",
+        )
+        self.assertEqual(self.resolver.resolve("fresh shop").owner_id, fresh.pk)
+
+        self.resolver.resolve("Tenant Shop")
+        owner = User.objects.get(pk=self.owner.pk)
+        owner.store_name = "Renamed Shop"
+        owner.save(update_fields=["store_name"])
+        self.assertIsNone(self.resolver.resolve("Tenant Shop"))
+        self.assertEqual(self.resolver.resolve("Renamed Shop"), self.tenant())
+
+    def test_store_save_invalidates(self):
+        self.assertEqual(self.resolver.resolve("Tenant Shop"), self.tenant())
+        self.owner.profile.store.delete()
+        self.assertIsNone(self.resolver.resolve("Tenant Shop").store_id)
+
+        store = Store.objects.create(user=self.owner.profile, name="Tenant Shop")
+        self.assertEqual(self.resolver.resolve("Tenant Shop").store_id, store.pk)
+
+    def test_configurations_save_invalidates(self):
+        self.assertEqual(self.resolver.resolve("Tenant Shop"), self.tenant())
+        self.owner.configurations.delete()
+        self.assertIsNone(self.resolver.resolve("Tenant Shop").configuration_id)
+
+        configurations = StoreConfigurations.objects.create(user=self.owner)
+        self.assertEqual(
+            self.resolver.resolve("Tenant Shop").configuration_id, configurations.pk
+        )
+
+
+@override_settings(ALLOWED_HOSTS=[".sellexplore.shop", "testserver"])
+class TenantMiddlewareTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            email="host@example.com",
+            store_name="HostShop",
+            niche="fashion",
+            password="x",
+        )
+
+    def setUp(self):
+        store_resolver.clear()
+        self.factory = RequestFactory()
+        self.middleware = TenantMiddleware(lambda request: request)
+
+    def tenant_for(self, host="testserver", **view_kwargs):
+        request = self.middleware(self.factory.get("/", HTTP_HOST=host))
+        self.middleware.process_view(request, None, (), view_kwargs)
+        return request.tenant
+
+    def test_resolves_by_host(self):
+        tenant = self.tenant_for("hostshop.sellexplore.shop")
+        self.assertEqual(tenant.owner_id, self.owner.pk)
+        tenant = self.tenant_for("HostShop.sellexplore.shop:8000")
+        self.assertEqual(tenant.owner_id, self.owner.pk)
+
+    def test_resolves_by_url_kwarg(self):
+        self.assertEqual(self.tenant_for(store_name="hostshop").owner_id, self.owner.pk)
+        self.assertEqual(self.tenant_for(storename="HostShop").owner_id, self.owner.pk)
+
+    def test_url_kwarg_must_name_the_host_store(self):
+        tenant = self.tenant_for("hostshop.sellexplore.shop", store_name="HOSTSHOP")
+        self.assertEqual(tenant.owner_id, self.owner.pk)
+        with self.assertRaises(Http404):
+            self.tenant_for("hostshop.sellexplore.shop", store_name="Other")
+
+        response = self.client.get(
+            "/api/item-group/other/", HTTP_HOST="hostshop.sellexplore.shop"
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_reserved_and_nested_subdomains_are_ignored(self):
+        self.assertIsNone(self.tenant_for("www.sellexplore.shop"))
+        self.assertIsNone(self.tenant_for("api.sellexplore.shop"))
+        self.assertIsNone(self.tenant_for("a.hostshop.sellexplore.shop"))
+        self.assertIsNone(self.tenant_for("sellexplore.shop"))
+
+    def test_public_views_see_the_tenant(self):
+        response = self.client.get(
+            "/api/items/hostshop/items/", HTTP_HOST="hostshop.sellexplore.shop"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.wsgi_request.tenant.owner_id, self.owner.pk)
@@ -0,0 +1,85 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from utils.replicas import primary_reads, stick_to_primary, within_replica_lag
+
+from .models import StoreContentVersion
+
+
+CACHE_KEY = "store-content-version:{}"
+CACHE_TIMEOUT = 300
+
+
+def _cache_key(owner_id):
+    return CACHE_KEY.format(owner_id)
+
+
+def get_store_version(owner_id):
+    """
+    Return ``(version, updated_at)`` for a store owner, served from the
+    cache when possible. The row is created lazily on first read.
+    """
+    key = _cache_key(owner_id)
+    cached = cache.get(key)
+    if cached is None:
+        # The primary's version: rendering a replica's older content under
+        # it would cache stale responses until the next bump
+        with primary_reads():
+            row, _ = StoreContentVersion.objects.get_or_create(owner_id=owner_id)
+        cached = (row.version, row.updated_at)
+        # add, not set: a bump committed since the read has already cached
+        # its newer version, which must not be overwritten
+        cache.add(key, cached, CACHE_TIMEOUT)
+    return cached
+
+
+def cache_store_versions(owner_ids):
+    """Cache the committed versions of `owner_ids`, replacing older entries."""
+    with primary_reads():
+        rows = StoreContentVersion.objects.filter(owner_id__in=owner_ids).values_list(
+            "owner_id", "version", "updated_at"
+        )
+        entries = {
+            _cache_key(owner_id): (version, updated_at)
+            for owner_id, version, updated_at in rows
+        }
+    cache.set_many(entries, CACHE_TIMEOUT)
+
+
+def get_read_version(owner_id):
+    """
+    `get_store_version` for a request about to read the store's content.
+    A store edited moments ago may not have reached the replica yet, so
+    the rest of the request then reads the primary.
+    """
+    version = get_store_version(owner_id)
+    if within_replica_lag(version[1]):
+        stick_to_primary()
+    return version
+
+
+def bump_store_version(owner_id):
+    """
+    Advance a store's content version.
+
+    Stores that were never read have no row yet; their first read creates
+    one with a fresh timestamp, so there is nothing to bump.
+    """
+    if owner_id is None:
+        return
+    StoreContentVersion.objects.filter(owner_id=owner_id).update(
+        version=F("version") + 1, updated_at=timezone.now()
+    )
+    transaction.on_commit(lambda: cache_store_versions([owner_id]))
+
+
+def bump_store_versions(owner_ids):
+    """Advance the versions of several stores, e.g. when a category changes."""
+    owner_ids = [pk for pk in owner_ids if pk is not None]
+    if not owner_ids:
+        return
+    StoreContentVersion.objects.filter(owner_id__in=owner_ids).update(
+        version=F("version") + 1, updated_at=timezone.now()
+    )
+    transaction.on_commit(lambda: cache_store_versions(owner_ids))
@@ -4,18 +4,26 @@ from datetime import timezone
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from django.db.models import Prefetch
-from product.models import Product, ProductImage, Category
+from rest_framework.exceptions import NotFound
+from product.access_paths import featured_products, newest_products
+from product.counts import store_categories
+from product.models import Product, ProductImage
+from product.search import search_products
 from utils.caching import CacheHeadersMixin
-from rest_framework.pagination import PageNumberPagination
+from utils.stores import request_tenant
+from utils.pagination import StorePagination
+from utils.querysets import optimize_queryset
 from product.serializers import ListCreateProductSerializer
-from django.shortcuts import get_object_or_404
-from django.db.models import Q
-from account.models import User
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework import generics
 from detail.models import Store
-from .serializers import FeaturedProductSerializer, CategorySerializer, StoreSerializer
+from .serializers import ProductCardSerializer, CategorySerializer, StoreSerializer
+from .versioning import get_read_version
+from .groups import (
+    DEFAULT_PRODUCT_GROUPS,
+    primary_image_names,
+    summarize_product_groups,
+)
 from django.utils.timezone import now
 
 
@@ -24,108 +32,102 @@ from django.utils.timezone import now
 # -------------------
 class PublicStoreDetailView(CacheHeadersMixin, APIView):
     def get(self, request, store_name):
-        # 1. Retrieve the object
-        store = (
-            Store.objects.select_related(
-                "user__user__configurations",
-                "user__logo",
-                "user__background",
-            )
-            .prefetch_related("faqs")
-            .filter(user__user__store_name__iexact=store_name)
-            .first()
-        )
-
-        if not store:
+        # 1. Resolve the store (usually already done by TenantMiddleware)
+        tenant = request_tenant(request, store_name)
+        if tenant is None or tenant.store_id is None:
             return Response(
                 {"detail": "Store not found."}, status=status.HTTP_404_NOT_FOUND
             )
 
-        # 2. Set the target for the cache mixin
-        self.object = store
+        # 2. Set the target for the cache mixin. The store's content version
+        #    covers FAQ, configuration, logo and cover edits as well.
+        self.store_owner_id = tenant.owner_id
 
         # 3. Check if the client cache is valid and return 304 if so
         not_modified = self.check_not_modified(request)
         if not_modified:
             return not_modified
 
-        # 4. If cache is invalid, serialize and return the full response
+        # 4. If cache is invalid, serve the rendered store from the server-side
+        #    cache, or serialize it
+        return self.cached_response(
+            request, lambda: self.get_store_data(request, tenant.store_id)
+        )
+
+    def get_store_data(self, request, store_id):
+        # Relations and columns follow StoreSerializer's declarations
+        store = optimize_queryset(
+            Store.objects.filter(pk=store_id), StoreSerializer
+        ).first()
+
+        if not store:
+            raise NotFound("Store not found.")
+
         serializer = StoreSerializer(store, context={"request": request})
-        return Response(serializer.data)
+        return serializer.data
 
 
 # -------------------
 # Product group view
 # -------------------
 class ProductGroupView(CacheHeadersMixin, APIView):
-    def get_primary_image_url(self, product, request):
-        """Helper to safely get the first image URL for a given product instance."""
-        if not product:
+    # Tiles rendered on the storefront home. Append a ProductGroup (or
+    # override get_product_groups) to add tiles such as hot deals or
+    # per-category groups; they are all computed in the same query.
+    product_groups = DEFAULT_PRODUCT_GROUPS
+
+    def get_product_groups(self):
+        return self.product_groups
+
+    def get_image_url(self, name, request):
+        """Build the absolute URL of a stored product image name."""
+        if not name:
             return None
-        # Assuming the related name is 'images' and it's pre-fetched and ordered
-        primary_image = product.images.first()
-        if primary_image and hasattr(primary_image.image, "url"):
-            return request.build_absolute_uri(primary_image.image.url)
-        return None
+        storage = ProductImage._meta.get_field("image").storage
+        return request.build_absolute_uri(storage.url(name))
 
     def get(self, request, storename):
         # 1. Define the base queryset for the store
-        all_products_queryset = (
-            Product.objects.filter(owner__store_name__iexact=storename)
-            .select_related("owner")
-            .prefetch_related(
-                # Crucial prefetch to get images efficiently
-                Prefetch(
-                    "images",
-                    queryset=ProductImage.objects.order_by("-is_thumbnail"),
-                    to_attr="ordered_images_list",  # Use a custom attribute to avoid conflicts
-                )
-            )
-        )
+        tenant = request_tenant(request, storename)
+        owner_id = tenant.owner_id if tenant else None
+        all_products_queryset = Product.objects.filter(owner_id=owner_id)
 
-        # 2. Set the target for the cache mixin. The ETag will be based on the most
-        #    recently updated product in this store.
-        self.queryset = all_products_queryset
+        # 2. Set the target for the cache mixin. The ETag is derived from the
+        #    store's content version.
+        self.store_owner_id = owner_id
 
         # 3. Check if client cache is valid BEFORE doing any more work.
         not_modified = self.check_not_modified(request)
         if not_modified:
             return not_modified
 
-        # 4. If cache is invalid, efficiently get the data from the DB.
-        #    This is far more efficient than loading all products into memory.
-
-        # Get counts directly from the database
-        total_products_count = all_products_queryset.count()
-        featured_products_count = all_products_queryset.filter(featured=True).count()
-        # Assuming 'recent' is a flag. If it's based on creation date,
-        # you would filter by `created_at` instead.
-        recent_products_count = all_products_queryset.filter(recent=True).count()
-
-        # Get the specific products we need for their images
-        # We re-use the prefetch for efficiency
-        first_product_overall = all_products_queryset.first()
-        first_featured_product = all_products_queryset.filter(featured=True).first()
-        first_recent_product = all_products_queryset.filter(recent=True).first()
-
-        # 5. Build the response payload
-        response_data = {
-            "storename": storename,
-            "total_products": {
-                "count": total_products_count,
-                "image": self.get_primary_image_url(first_product_overall, request),
-            },
-            "featured_products": {
-                "count": featured_products_count,
-                "image": self.get_primary_image_url(first_featured_product, request),
-            },
-            "recent_products": {
-                "count": recent_products_count,
-                "image": self.get_primary_image_url(first_recent_product, request),
-            },
-        }
+        # 4. Serve the tiles from the server-side cache, or compute them
+        return self.cached_response(
+            request,
+            lambda: self.get_group_data(request, storename, all_products_queryset),
+        )
 
-        return Response(response_data)
+    def get_group_data(self, request, storename, products):
+        # One conditional-aggregate query for every tile's count and
+        # representative product, then one query for their images.
+        groups = self.get_product_groups()
+        summary = summarize_product_groups(products, groups)
+        image_names = primary_image_names(
+            tile["product_id"] for tile in summary.values()
+        )
+
+        # Build the response payload
+        response_data = {"storename": storename}
+        for group in groups:
+            tile = summary[group.key]
+            response_data[group.key] = {
+                "count": tile["count"],
+                "image": self.get_image_url(
+                    image_names.get(tile["product_id"]), request
+                ),
+            }
+
+        return response_data
 
 
 class PaginatedProductListView(APIView):
@@ -135,23 +137,28 @@ class PaginatedProductListView(APIView):
     - ?category=<slug>   (single)
     - ?categories=slug1,slug2 (multiple)
     - ?page_size=20
+    - ?cursor=            (keyset pagination, see StorePagination)
+    - ?skip_count=true
     """
 
     permission_classes = [AllowAny]  # ❌ change to IsAuthenticated if private
 
     def get(self, request, store_name, format=None):
         # 1️⃣ Get store (User)
-        store = get_object_or_404(User, store_name__iexact=store_name, is_active=True)
+        tenant = request_tenant(request, store_name)
+        if tenant is None:
+            raise NotFound()
+        owner_id = tenant.owner_id
+        # A store edited moments ago is read from the primary
+        get_read_version(owner_id)
 
         # 2️⃣ Base queryset → products belonging to that store
-        products = Product.objects.filter(owner=store).order_by("-created_at")
+        products = newest_products(owner_id)
 
         # 3️⃣ Search filter
         search = request.GET.get("search")
         if search:
-            products = products.filter(
-                Q(name__icontains=search) | Q(description__icontains=search)
-            )
+            products = search_products(products, owner_id, search)
 
         # 4️⃣ Category filters
         category_slug = request.GET.get("category")
@@ -164,11 +171,11 @@ class PaginatedProductListView(APIView):
             products = products.filter(category__slug__in=slug_list)
 
         # 5️⃣ Pagination
-        paginator = PageNumberPagination()
-        paginator.page_size = int(request.GET.get("page_size", 10))
+        paginator = StorePagination()
+        paginator.page_size = request.GET.get("page_size", 10)
 
         queryset = paginator.paginate_queryset(products, request)
-        serializer = FeaturedProductSerializer(
+        serializer = ProductCardSerializer(
             queryset, many=True, context={"request": request}
         )
         return paginator.get_paginated_response(serializer.data)
@@ -177,28 +184,34 @@ class PaginatedProductListView(APIView):
 
 
 class CategoriesAndFeaturedItems(CacheHeadersMixin, generics.GenericAPIView):
-    serializer_class = FeaturedProductSerializer
+    serializer_class = ProductCardSerializer
+    single_flight = True
 
     def get(self, request, *args, **kwargs):
+        tenant = request_tenant(request, self.kwargs["store_name"])
+        owner_id = tenant.owner_id if tenant else None
+
         # build the querysets
-        featured_qs = Product.objects.filter(
-            owner__store_name__iexact=self.kwargs["store_name"],
-            featured=True,
-        ).order_by("id")[:20]
+        featured_qs = featured_products(owner_id)
 
-        categories_qs = Category.objects.all()
+        # Only the categories this store has products in, with its counts
+        categories_qs = store_categories(owner_id)
 
-        # 👇 Tell the mixin what to use for caching
-        # you can combine them in a tuple so ETag/Last-Modified
-        # changes if either changes
-        self.queryset = (featured_qs, categories_qs)
+        # 👇 Tell the mixin what to use for caching: the store's content
+        # version changes whenever its products or the categories change
+        self.store_owner_id = owner_id
 
         # now check client cache
         not_modified = self.check_not_modified(request)
         if not_modified:
             return not_modified
 
-        # serialize
+        # serialize, or serve the rendered body from the server-side cache
+        return self.cached_response(
+            request, lambda: self.get_data(request, featured_qs, categories_qs)
+        )
+
+    def get_data(self, request, featured_qs, categories_qs):
         featured_data = self.get_serializer(
             featured_qs, many=True, context={"request": request}
         ).data
@@ -206,20 +219,13 @@ class CategoriesAndFeaturedItems(CacheHeadersMixin, generics.GenericAPIView):
             categories_qs, many=True, context={"request": request}
         ).data
 
-        response = Response({
+        return {
             "featured_products": featured_data,
             "categories": categories_data,
-        })
-
-        return self.finalize_response(request, response)
-
-
-
-
-
+        }
 
 
-class ProductListFilterView(APIView):
+class ProductListFilterView(CacheHeadersMixin, APIView):
     """
     Public endpoint to list products by store_name.
     Returns:
@@ -232,22 +238,35 @@ class ProductListFilterView(APIView):
     """
 
     permission_classes = [AllowAny]  # ❌ change to IsAuthenticated if private
+    single_flight = True
 
     def get(self, request, store_name, format=None):
         # 1️⃣ Get store (User)
-        store = get_object_or_404(User, store_name__iexact=store_name, is_active=True)
+        tenant = request_tenant(request, store_name)
+        if tenant is None:
+            raise NotFound()
+        owner_id = tenant.owner_id
 
-        # 2️⃣ Base queryset → products belonging to that store
-        products = Product.objects.filter(owner=store).order_by("-created_at")
+        # 2️⃣ Validators and server-side cache follow the store's content version
+        self.store_owner_id = owner_id
+        not_modified = self.check_not_modified(request)
+        if not_modified:
+            return not_modified
 
-        # 3️⃣ Search filter
+        return self.cached_response(
+            request, lambda: self.get_data(request, owner_id)
+        )
+
+    def get_data(self, request, owner_id):
+        # 3️⃣ Base queryset → products belonging to that store
+        products = newest_products(owner_id)
+
+        # 4️⃣ Search filter
         search = request.GET.get("search")
         if search:
-            products = products.filter(
-                Q(name__icontains=search) | Q(description__icontains=search)
-            )
+            products = search_products(products, owner_id, search)
 
-        # 4️⃣ Category filters
+        # 5️⃣ Category filters
         category_slug = request.GET.get("category")
         if category_slug:
             products = products.filter(category__slug=category_slug)
@@ -257,15 +276,15 @@ class ProductListFilterView(APIView):
             slug_list = [slug.strip() for slug in categories.split(",") if slug.strip()]
             products = products.filter(category__slug__in=slug_list)
 
-        # 5️⃣ Prepare response → count + first 4 products
+        # 6️⃣ Prepare response → count + first 4 products
         total_count = products.count()
         first_four = products[:4]
 
-        serializer = FeaturedProductSerializer(
+        serializer = ProductCardSerializer(
             first_four, many=True, context={"request": request}
         )
 
-        return Response({
+        return {
             "count": total_count,
             "results": serializer.data
-        })
+        }
@@ -11,6 +11,10 @@ class StoreConfigurations(models.Model):
     background_image_one = models.ImageField(upload_to="", null=True, blank=True)
     background_image_two = models.ImageField(upload_to="", null=True, blank=True)
     background_image_three = models.ImageField(upload_to="", null=True, blank=True)
+    # Resized WebP/JPEG variants and measurements of the images above,
+    # see utils.images
+    image_derivatives = models.JSONField(default=dict, blank=True, editable=False)
+    image_meta = models.JSONField(default=dict, blank=True, editable=False)
 
     # Branding colors
     brand_color_dark = models.CharField(max_length=20, default="#fb923c")
@@ -50,6 +54,8 @@ class Cover(models.Model):
         UserProfile, on_delete=models.CASCADE, related_name="logo"
     )
     cover_image = models.ImageField(upload_to="", null=True, blank=True)
+    image_derivatives = models.JSONField(default=dict, blank=True, editable=False)
+    image_meta = models.JSONField(default=dict, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -59,5 +65,7 @@ class Logo(models.Model):
         UserProfile, on_delete=models.CASCADE, related_name="background"
     )
     logo = models.ImageField(upload_to="", null=True, blank=True)
+    image_derivatives = models.JSONField(default=dict, blank=True, editable=False)
+    image_meta = models.JSONField(default=dict, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -1,4 +1,6 @@
 from rest_framework import serializers
+from utils.images import ImageMetaField, SrcsetField
+from utils.media import MediaURLBuilder
 from .models import StoreConfigurations, Cover, Logo
 
 
@@ -6,29 +8,33 @@ class ConfigurationsSerializer(serializers.ModelSerializer):
     background_image_one = serializers.SerializerMethodField()
     background_image_two = serializers.SerializerMethodField()
     background_image_three = serializers.SerializerMethodField()
+    background_image_one_srcset = SrcsetField("background_image_one")
+    background_image_two_srcset = SrcsetField("background_image_two")
+    background_image_three_srcset = SrcsetField("background_image_three")
+    background_image_one_meta = ImageMetaField("background_image_one")
+    background_image_two_meta = ImageMetaField("background_image_two")
+    background_image_three_meta = ImageMetaField("background_image_three")
 
     class Meta:
         model = StoreConfigurations
-        fields = "__all__"
+        exclude = ["image_derivatives", "image_meta"]
         read_only_fields = ["id", "user", "created_at", "updated_at"]
 
+    def image_url(self, file):
+        # One URL builder per request instead of a storage call per image
+        urls = MediaURLBuilder.for_context(
+            self.context, StoreConfigurations, file.field.name
+        )
+        return urls.url(file.name)
+
     def get_background_image_one(self, obj):
-        request = self.context.get("request")
-        if obj.background_image_one and hasattr(obj.background_image_one, "url"):
-            return request.build_absolute_uri(obj.background_image_one.url)
-        return None
+        return self.image_url(obj.background_image_one)
 
     def get_background_image_two(self, obj):
-        request = self.context.get("request")
-        if obj.background_image_two and hasattr(obj.background_image_two, "url"):
-            return request.build_absolute_uri(obj.background_image_two.url)
-        return None
+        return self.image_url(obj.background_image_two)
 
     def get_background_image_three(self, obj):
-        request = self.context.get("request")
-        if obj.background_image_three and hasattr(obj.background_image_three, "url"):
-            return request.build_absolute_uri(obj.background_image_three.url)
-        return None
+        return self.image_url(obj.background_image_three)
 
 
 
@@ -36,10 +42,12 @@ class ConfigurationsSerializer(serializers.ModelSerializer):
 
 class CoverSerializer(serializers.ModelSerializer):
     cover_image = serializers.ImageField(required=False, allow_null=True)
+    cover_image_srcset = SrcsetField("cover_image")
+    cover_image_meta = ImageMetaField("cover_image")
 
     class Meta:
         model = Cover
-        fields = ["cover_image"]
+        fields = ["cover_image", "cover_image_srcset", "cover_image_meta"]
 
     def to_representation(self, instance):
         rep = super().to_representation(instance)
@@ -51,10 +59,12 @@ class CoverSerializer(serializers.ModelSerializer):
 
 class LogoSerializer(serializers.ModelSerializer):
     logo = serializers.ImageField(required=False, allow_null=True)
+    logo_srcset = SrcsetField("logo")
+    logo_meta = ImageMetaField("logo")
 
     class Meta:
         model = Logo
-        fields = ["logo"]
+        fields = ["logo", "logo_srcset", "logo_meta"]
 
     def to_representation(self, instance):
         rep = super().to_representation(instance)
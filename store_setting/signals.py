@@ -1,6 +1,14 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
 from account.models import User
+from utils.images import capture_image_meta, schedule_derivatives
+from utils.storage import (
+    claim_new_blobs,
+    release_deleted_blobs,
+    release_replaced_blobs,
+    remember_blobs,
+)
+from utils.stores import store_resolver
 from .models import StoreConfigurations, Logo, Cover
 
 
@@ -14,19 +22,59 @@ def create_store_for_new_user(sender, instance, created, **kwargs):
 
 
 @receiver(post_save, sender=User)
-def create_store_for_new_user(sender, instance, created, **kwargs):
+def create_logo_for_new_user(sender, instance, created, **kwargs):
     if created:
-        # Automatically create a store for every new user
+        # Logos hang off the profile account.signals created just before
         Logo.objects.create(
-            user=instance,
+            user=instance.profile,
         )
 
 
-
 @receiver(post_save, sender=User)
-def create_store_for_new_user(sender, instance, created, **kwargs):
+def create_cover_for_new_user(sender, instance, created, **kwargs):
     if created:
-        # Automatically create a store for every new user
         Cover.objects.create(
-            user=instance,
+            user=instance.profile,
         )
+
+
+@receiver(post_save, sender=StoreConfigurations)
+def invalidate_new_configurations_tenant(sender, instance, created, **kwargs):
+    # The resolved tenant carries the configurations id
+    if created:
+        store_resolver.invalidate_matching(owner_id=instance.user_id)
+
+
+@receiver(post_delete, sender=StoreConfigurations)
+def invalidate_deleted_configurations_tenant(sender, instance, **kwargs):
+    store_resolver.invalidate_matching(configuration_id=instance.pk)
+
+
+@receiver(post_save, sender=StoreConfigurations)
+@receiver(post_save, sender=Cover)
+@receiver(post_save, sender=Logo)
+def generate_image_derivatives(sender, instance, **kwargs):
+    schedule_derivatives(instance)
+
+
+@receiver(pre_save, sender=StoreConfigurations)
+@receiver(pre_save, sender=Cover)
+@receiver(pre_save, sender=Logo)
+def prepare_image_fields(sender, instance, update_fields=None, **kwargs):
+    remember_blobs(instance, update_fields)
+    claim_new_blobs(instance, update_fields)
+    capture_image_meta(instance, update_fields)
+
+
+@receiver(post_save, sender=StoreConfigurations)
+@receiver(post_save, sender=Cover)
+@receiver(post_save, sender=Logo)
+def release_replaced_image_blobs(sender, instance, **kwargs):
+    release_replaced_blobs(instance)
+
+
+@receiver(post_delete, sender=StoreConfigurations)
+@receiver(post_delete, sender=Cover)
+@receiver(post_delete, sender=Logo)
+def release_deleted_image_blobs(sender, instance, **kwargs):
+    release_deleted_blobs(instance)
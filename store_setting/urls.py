@@ -1,6 +1,12 @@
 from django.urls import path
 
-from .views import ConfigurationsView, PublicConfigurationsView, LogoView, CoverView
+from .views import (
+    ConfigurationsView,
+    PublicConfigurationsView,
+    LogoView,
+    CoverView,
+    StoreImageDirectUploadView,
+)
 
 urlpatterns = [
     path("configurations/", ConfigurationsView.as_view(), name="configurations"),
@@ -11,4 +17,17 @@ urlpatterns = [
     ),
     path("logo/", LogoView.as_view(), name="logo"),
     path("cover/", CoverView.as_view(), name="cover"),
+    # direct-to-storage upload of logo, cover or background_image_*
+    path(
+        "store-images/<str:field>/upload/ticket/",
+        StoreImageDirectUploadView.as_view(),
+        {"step": "ticket"},
+        name="store-image-upload-ticket",
+    ),
+    path(
+        "store-images/<str:field>/upload/finalize/",
+        StoreImageDirectUploadView.as_view(),
+        {"step": "finalize"},
+        name="store-image-upload-finalize",
+    ),
 ]
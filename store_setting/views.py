@@ -7,6 +7,11 @@ from rest_framework.permissions import IsAuthenticated
 from .models import Cover, Logo, StoreConfigurations
 from .serializers import ConfigurationsSerializer, CoverSerializer, LogoSerializer
 from rest_framework import status, permissions
+from rest_framework.exceptions import NotFound
+from utils.caching import CacheHeadersMixin
+from utils.storage import atomic_with_uploads
+from utils.stores import request_tenant
+from utils.uploads import DirectUploadView
 
 
 # for updating configurations and displaying configurations
@@ -28,6 +33,7 @@ class ConfigurationsView(APIView):
 
         return Response(serializer.data, status=status.HTTP_200_OK)
 
+    @atomic_with_uploads
     def put(self, request):
         """
         Update existing configurations for the current user
@@ -45,18 +51,30 @@ class ConfigurationsView(APIView):
 
 
 # For public use
-class PublicConfigurationsView(APIView):
+class PublicConfigurationsView(CacheHeadersMixin, APIView):
     """
     Public endpoint to fetch a store's configuration by store_name
     """
 
     def get(self, request, store_name):
-        config = get_object_or_404(
-            StoreConfigurations, user__store_name__iexact=store_name
+        tenant = request_tenant(request, store_name)
+        if tenant is None or tenant.configuration_id is None:
+            raise NotFound("No StoreConfigurations matches the given query.")
+
+        self.store_owner_id = tenant.owner_id
+        not_modified = self.check_not_modified(request)
+        if not_modified:
+            return not_modified
+
+        return self.cached_response(
+            request, lambda: self.get_data(request, tenant.configuration_id)
         )
+
+    def get_data(self, request, configuration_id):
+        config = get_object_or_404(StoreConfigurations, pk=configuration_id)
         serializer = ConfigurationsSerializer(config, context={"request": request})
-        
-        return Response(serializer.data, status=status.HTTP_200_OK)
+
+        return serializer.data
 
 
 class CoverView(APIView):
@@ -69,6 +87,7 @@ class CoverView(APIView):
         serializer = CoverSerializer(obj, context={"request": request})
         return Response(serializer.data)
 
+    @atomic_with_uploads
     def put(self, request):
         user_profile = request.user.profile
         obj, _ = Cover.objects.get_or_create(user=user_profile)
@@ -91,6 +110,7 @@ class LogoView(APIView):
         serializer = LogoSerializer(obj, context={"request": request})
         return Response(serializer.data)
 
+    @atomic_with_uploads
     def put(self, request):
         user_profile = request.user.profile
         obj, _ = Logo.objects.get_or_create(user=user_profile)
@@ -101,3 +121,53 @@ class LogoView(APIView):
             serializer.save()
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+# Direct-to-storage uploads of the store's images
+# url field -> (model, image field, serializer)
+STORE_IMAGE_FIELDS = {
+    "logo": (Logo, "logo", LogoSerializer),
+    "cover": (Cover, "cover_image", CoverSerializer),
+    "background_image_one": (
+        StoreConfigurations,
+        "background_image_one",
+        ConfigurationsSerializer,
+    ),
+    "background_image_two": (
+        StoreConfigurations,
+        "background_image_two",
+        ConfigurationsSerializer,
+    ),
+    "background_image_three": (
+        StoreConfigurations,
+        "background_image_three",
+        ConfigurationsSerializer,
+    ),
+}
+
+
+class StoreImageDirectUploadView(DirectUploadView):
+    """
+    Upload the logo, cover or a background image straight to storage,
+    see DirectUploadView.
+    """
+
+    def get_upload_target(self, field):
+        if field not in STORE_IMAGE_FIELDS:
+            raise NotFound("Unknown store image.")
+        model, field_name, _ = STORE_IMAGE_FIELDS[field]
+        return model, field_name
+
+    def get_object(self, request, field):
+        model, _, _ = STORE_IMAGE_FIELDS[field]
+        if model is StoreConfigurations:
+            return get_object_or_404(StoreConfigurations, user=request.user)
+        obj, _ = model.objects.get_or_create(user=request.user.profile)
+        return obj
+
+    def finalize(self, request, obj, name, field):
+        _, field_name, serializer_class = STORE_IMAGE_FIELDS[field]
+        setattr(obj, field_name, name)
+        obj.save()
+        serializer = serializer_class(obj, context={"request": request})
+        return Response(serializer.data)
@@ -0,0 +1,56 @@
+import os
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.files import locks
+
+
+class LRUFileBasedCache(FileBasedCache):
+    """
+    FileBasedCache that evicts the least recently used entries once
+    MAX_ENTRIES is reached, instead of a random sample.
+
+    Reads refresh the entry's mtime, which is what culling sorts on. `add`
+    is atomic across processes, as SingleFlight's lock key needs.
+    """
+
+    lock_file_name = "add.lock"
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        # FileBasedCache checks for the key and writes it in two steps, so
+        # two processes could both add it. Adds hold an exclusive lock on a
+        # file in the cache directory; culling only sees *.djcache files.
+        self._createdir()
+        with open(os.path.join(self._dir, self.lock_file_name), "ab") as lock_file:
+            locks.lock(lock_file, locks.LOCK_EX)
+            try:
+                return super().add(key, value, timeout, version)
+            finally:
+                locks.unlock(lock_file)
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, default, version)
+        if value is not default:
+            try:
+                os.utime(self._key_to_file(key, version))
+            except OSError:
+                pass
+        return value
+
+    def _cull(self):
+        filelist = self._list_cache_files()
+        num_entries = len(filelist)
+        if num_entries < self._max_entries:
+            return  # return early if no culling is required
+        if self._cull_frequency == 0:
+            return self.clear()  # Clear the cache when CULL_FREQUENCY = 0
+
+        def last_used(fname):
+            try:
+                return os.path.getmtime(fname)
+            except OSError:
+                return 0
+
+        filelist.sort(key=last_used)
+        for fname in filelist[: int(num_entries / self._cull_frequency)]:
+            self._delete(fname)
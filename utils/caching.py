@@ -1,7 +1,10 @@
 import zlib
-from django.http import HttpResponseNotModified
+from django.http import HttpResponse, HttpResponseNotModified
 from django.utils.http import parse_http_date_safe, http_date
 from django.db.models import Max
+from rest_framework.response import Response
+from public.versioning import get_read_version
+from .response_cache import response_cache, single_flight
 
 
 class CacheHeadersMixin:
@@ -11,15 +14,145 @@ class CacheHeadersMixin:
     Usage:
     1. Inherit this mixin in your View.
     2. In your `get` method, retrieve your object or queryset.
-    3. Set `self.object = ...` or `self.queryset = ...` (can be a single queryset or a tuple of querysets).
+    3. Set `self.store_owner_id = ...` to derive validators from the store's
+       content version (one cached key lookup), or set `self.object = ...` or
+       `self.queryset = ...` (can be a single queryset or a tuple of querysets).
     4. Call `not_modified = self.check_not_modified(request)` at the beginning.
     5. If `not_modified`, return it immediately to short-circuit the view.
 
     The mixin's `finalize_response` will automatically add the correct
     cache headers to successful (200 OK) responses.
+
+    Views keyed by `store_owner_id` can also return
+    `self.cached_response(request, build)` to serve the rendered body from
+    the server-side response cache while the store's content is unchanged.
+    Setting `single_flight = True` lets only one worker rebuild an entry
+    after an edit; the others serve the previous body marked with
+    `stale-while-revalidate`, or wait up to `single_flight_wait` seconds.
     """
 
     cache_control = "public, max-age=0, must-revalidate"
+    store_owner_id = None
+    single_flight = False
+    single_flight_wait = 2.0
+    stale_while_revalidate = 30
+
+    def get_validators(self):
+        """
+        Return the `(etag, last_modified)` pair for this request.
+
+        Computed once per request and reused by `check_not_modified` and
+        `finalize_response`.
+        """
+        if not hasattr(self, "_validators"):
+            if self.store_owner_id is not None:
+                self._validators = self.get_version_validators()
+            else:
+                target = getattr(self, "object", None) or getattr(
+                    self, "queryset", None
+                )
+                if target is None:
+                    self._validators = (None, None)
+                else:
+                    self._validators = (
+                        self.get_etag(target),
+                        self.get_last_modified(target),
+                    )
+        return self._validators
+
+    def get_content_version(self):
+        """Return the store's `(version, updated_at)`, looked up once per request."""
+        if not hasattr(self, "_content_version"):
+            self._content_version = get_read_version(self.store_owner_id)
+        return self._content_version
+
+    def get_version_validators(self):
+        """Derive the ETag and Last-Modified from the store's content version."""
+        version, updated_at = self.get_content_version()
+        etag_string = f"{self.store_owner_id}-{version}-{self.__class__.__name__}"
+        etag_crc = zlib.crc32(etag_string.encode())
+        return f'W/"{etag_crc:x}"', updated_at
+
+    def cached_response(self, request, build):
+        """
+        Return the response for `build()`, a callable producing the response
+        data, served from the response cache when an entry rendered at the
+        store's current content version exists.
+        """
+        if self.store_owner_id is None:
+            return Response(build())
+
+        version, _ = self.get_content_version()
+        key = response_cache.make_key(
+            self.store_owner_id, self.__class__.__name__, request
+        )
+        entry, fresh = response_cache.lookup(key, version)
+        if fresh:
+            return self.response_from_entry(entry, "HIT")
+
+        if self.single_flight:
+            return self.coalesced_response(request, build, key, version, entry)
+
+        return self.rebuild_response(request, build, key, version)
+
+    def rebuild_response(self, request, build, key, version):
+        response_cache.record(key, response_cache.misses)
+        entry = self.render_entry(request, build(), version)
+        response_cache.set(key, entry)
+        return self.response_from_entry(entry, "MISS")
+
+    def coalesced_response(self, request, build, key, version, stale_entry):
+        """
+        Rebuild the entry in exactly one worker. The others serve the stale
+        entry when there is one, or wait briefly for the rebuilt one.
+        """
+        backend = response_cache.backend
+        if single_flight.acquire(key, backend):
+            try:
+                return self.rebuild_response(request, build, key, version)
+            finally:
+                single_flight.release(key, backend)
+
+        if stale_entry is not None:
+            response_cache.record(key, response_cache.stale)
+            response = self.response_from_entry(stale_entry, "STALE")
+            response["Cache-Control"] = (
+                "public, max-age=0, "
+                f"stale-while-revalidate={self.stale_while_revalidate}"
+            )
+            return response
+
+        single_flight.wait(key, backend, self.single_flight_wait)
+        entry, fresh = response_cache.lookup(key, version)
+        if fresh:
+            return self.response_from_entry(entry, "HIT")
+        return self.rebuild_response(request, build, key, version)
+
+    def render_entry(self, request, data, version):
+        """Render `data` with the negotiated renderer into a cache entry."""
+        response = Response(data)
+        response.accepted_renderer = request.accepted_renderer
+        response.accepted_media_type = request.accepted_media_type
+        response.renderer_context = self.get_renderer_context()
+        response.render()
+
+        etag, last_modified = self.get_validators()
+        return {
+            "version": version,
+            "etag": etag,
+            "last_modified": last_modified,
+            "content_type": response["Content-Type"],
+            "body": response.content,
+        }
+
+    def response_from_entry(self, entry, cache_status):
+        response = HttpResponse(entry["body"], content_type=entry["content_type"])
+        if entry["etag"]:
+            response["ETag"] = entry["etag"]
+        if entry["last_modified"]:
+            response["Last-Modified"] = http_date(entry["last_modified"].timestamp())
+        response["X-Cache"] = cache_status
+        return response
 
     def get_last_modified(self, target):
         """Return the latest modified timestamp for an object, queryset, or tuple of querysets."""
@@ -93,13 +226,10 @@ class CacheHeadersMixin:
         Checks request headers against the target's ETag/Last-Modified.
         Returns HttpResponseNotModified if the client's cache is still valid, else None.
         """
-        target = getattr(self, "object", None) or getattr(self, "queryset", None)
-        if target is None:
+        etag, last_modified = self.get_validators()
+        if etag is None and last_modified is None:
             return None
 
-        etag = self.get_etag(target)
-        last_modified = self.get_last_modified(target)
-
         # ETag check
         if_none_match = request.headers.get("If-None-Match")
         if if_none_match and etag:
@@ -136,21 +266,19 @@ class CacheHeadersMixin:
         """
         final_response = super().finalize_response(request, response, *args, **kwargs)
 
-        target = getattr(self, "object", None) or getattr(self, "queryset", None)
-        if (
-            request.method == "GET"
-            and target is not None
-            and final_response.status_code == 200
-        ):
-            etag = self.get_etag(target)
-            last_modified = self.get_last_modified(target)
+        etag, last_modified = (None, None)
+        if request.method == "GET" and final_response.status_code == 200:
+            etag, last_modified = self.get_validators()
 
-            if etag:
+        if etag or last_modified:
+            # Responses served from the response cache carry their own validators
+            if etag and "ETag" not in final_response:
                 final_response["ETag"] = etag
-            if last_modified:
+            if last_modified and "Last-Modified" not in final_response:
                 final_response["Last-Modified"] = http_date(last_modified.timestamp())
 
-            final_response["Cache-Control"] = self.cache_control
+            if "Cache-Control" not in final_response:
+                final_response["Cache-Control"] = self.cache_control
 
             # Optional Vary support
             vary_headers = []
@@ -0,0 +1,81 @@
+import json
+import uuid
+
+from django.db import connections
+
+
+def bulk_create_with_pks(scope, objs, batch_size=None):
+    """
+    `bulk_create` that always leaves primary keys set on `objs`.
+
+    Backends without multi-row INSERT ... RETURNING (MySQL) still insert
+    in bulk. The rows are stamped with one `insert_batch` marker, which the
+    model must declare, and their keys are read back in one query. The
+    rows of an INSERT get increasing keys in VALUES order, even with
+    InnoDB's interleaved auto-increment, so sorting by key matches them to
+    `objs`. Keys are never guessed from the newest rows: concurrent inserts
+    would hand out other tenants' rows.
+    """
+    objs = list(objs)
+    if not objs or connections[scope.db].features.can_return_rows_from_bulk_insert:
+        return scope.bulk_create(objs, batch_size=batch_size)
+
+    marker = uuid.uuid4()
+    for obj in objs:
+        obj.insert_batch = marker
+    scope.bulk_create(objs, batch_size=batch_size)
+
+    pks = (
+        scope.model._base_manager.using(scope.db)
+        .filter(insert_batch=marker)
+        .order_by("pk")
+        .values_list("pk", flat=True)
+    )
+    for obj, pk in zip(objs, pks, strict=True):
+        obj.pk = pk
+        obj._state.adding = False
+        obj._state.db = scope.db
+    return objs
+
+
+def plan_problems(queryset):
+    """
+    Full table scans and sorts in the database's plan for `queryset`, as
+    a list of plan lines (empty for an indexed plan). Supports SQLite,
+    MySQL and PostgreSQL; other backends raise NotImplementedError.
+    """
+    vendor = connections[queryset.db].vendor
+    if vendor == "sqlite":
+        # Rows read "<id> <parent> <notused> <detail>"
+        details = [line.split(" ", 3)[-1] for line in queryset.explain().splitlines()]
+        return [
+            detail
+            for detail in details
+            if detail.startswith("SCAN ") or detail.startswith("USE TEMP B-TREE")
+        ]
+    if vendor == "mysql":
+        plan = json.loads(queryset.explain(format="json"))
+        return [
+            f"{key} on {node.get('table_name', '?')}"
+            for node in plan_nodes(plan)
+            for key in ("access_type", "using_filesort")
+            if node.get(key) in ("ALL", True)
+        ]
+    if vendor == "postgresql":
+        plan = json.loads(queryset.explain(format="json"))
+        return [
+            f"{node['Node Type']} on {node.get('Relation Name', '?')}"
+            for node in plan_nodes(plan)
+            if node.get("Node Type") in ("Seq Scan", "Sort")
+        ]
+    raise NotImplementedError(f"No query plan checks for {vendor}.")
+
+
+def plan_nodes(value):
+    """Every dict nested in a JSON query plan."""
+    if isinstance(value, dict):
+        yield value
+        value = list(value.values())
+    if isinstance(value, list):
+        for item in value:
+            yield from plan_nodes(item)
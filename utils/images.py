@@ -0,0 +1,402 @@
+import base64
+import logging
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from PIL import ExifTags, Image, ImageFilter, ImageOps
+from rest_framework import serializers
+from utils.storage import blob_fields, unwrap
+
+
+logger = logging.getLogger(__name__)
+
+# Image fields that get derivatives, by model label. Each model stores what
+# was generated in its `image_derivatives` JSON field, keyed by field name:
+# {"image": {"source": "products/images/a.jpg", "widths": [320, 640]}}
+DERIVATIVE_FIELDS = {
+    "product.ProductImage": ["image"],
+    "product.Category": ["image"],
+    "store_setting.Cover": ["cover_image"],
+    "store_setting.Logo": ["logo"],
+    "store_setting.StoreConfigurations": [
+        "background_image_one",
+        "background_image_two",
+        "background_image_three",
+    ],
+}
+
+# Longest side of the blurred placeholder embedded in image_meta
+LQIP_SIZE = 16
+# EXIF orientations that swap width and height once applied
+ROTATED_ORIENTATIONS = (5, 6, 7, 8)
+
+FORMAT_EXTENSIONS = {"webp": "webp", "jpeg": "jpg"}
+SAVE_OPTIONS = {
+    "webp": {"format": "WEBP", "quality": 80, "method": 4},
+    "jpeg": {"format": "JPEG", "quality": 82, "optimize": True, "progressive": True},
+}
+
+
+def derivative_fields(model):
+    return DERIVATIVE_FIELDS.get(model._meta.label, [])
+
+
+def derivative_models():
+    return [apps.get_model(label) for label in DERIVATIVE_FIELDS]
+
+
+def derivative_widths(width):
+    """Target widths for an original `width` pixels wide, never upscaling."""
+    return sorted({min(target, width) for target in settings.IMAGE_DERIVATIVE_WIDTHS})
+
+
+def derivative_name(name, width, fmt):
+    """`products/images/a.jpg` -> `products/images/derivatives/a-320w.webp`"""
+    directory, filename = posixpath.split(name)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(
+        directory, "derivatives", f"{stem}-{width}w.{FORMAT_EXTENSIONS[fmt]}"
+    )
+
+
+def encode(image, fmt):
+    if fmt == "jpeg" and image.mode != "RGB":
+        image = image.convert("RGB")
+    elif fmt == "webp" and image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+    buffer = BytesIO()
+    image.save(buffer, **SAVE_OPTIONS[fmt])
+    return buffer.getvalue()
+
+
+def generate_derivatives(storage, name, content=None):
+    """
+    Write every missing derivative of `name` to `storage`.
+
+    Derivative names are derived from the source name, so existing files
+    are skipped and the function can be re-run safely. They are written
+    under that exact name, bypassing content addressing. `content`, the
+    source already read, saves opening it again. Returns the widths that
+    are available.
+    """
+    storage = unwrap(storage)
+    if content is None:
+        with storage.open(name, "rb") as source:
+            content = ContentFile(source.read())
+    content.seek(0)
+    image = Image.open(content)
+    image = ImageOps.exif_transpose(image)
+    image.load()
+
+    widths = derivative_widths(image.width)
+    for width in widths:
+        targets = [
+            (fmt, derivative_name(name, width, fmt))
+            for fmt in settings.IMAGE_DERIVATIVE_FORMATS
+        ]
+        targets = [(fmt, target) for fmt, target in targets if not storage.exists(target)]
+        if not targets:
+            continue
+
+        if width == image.width:
+            resized = image
+        else:
+            height = max(1, round(image.height * width / image.width))
+            resized = image.resize((width, height), Image.LANCZOS)
+
+        for fmt, target in targets:
+            storage.save(target, ContentFile(encode(resized, fmt)))
+
+    return widths
+
+
+def needs_derivatives(instance, field_name):
+    file = getattr(instance, field_name)
+    entry = (instance.image_derivatives or {}).get(field_name)
+    if not file:
+        return entry is not None
+    return entry is None or entry.get("source") != file.name
+
+
+def worker_fields(instance):
+    """The image fields of `instance` the derivative worker has to process."""
+    return [
+        name
+        for name in derivative_fields(type(instance))
+        if needs_derivatives(instance, name) or stale_image_meta(instance, name)
+    ]
+
+
+def process_derivatives(model, pk, field_names):
+    """
+    Generate derivatives for the given fields and record them on the row,
+    measuring the images whose image_meta is stale from the same read.
+    """
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None:
+        return
+
+    derivatives = dict(instance.image_derivatives or {})
+    meta = dict(instance.image_meta or {})
+    changed = set()
+    for field_name in field_names:
+        file = getattr(instance, field_name)
+        if not file:
+            if derivatives.pop(field_name, None) is not None:
+                changed.add("image_derivatives")
+            if meta.pop(field_name, None) is not None:
+                changed.add("image_meta")
+            continue
+        if not (
+            needs_derivatives(instance, field_name)
+            or stale_image_meta(instance, field_name)
+        ):
+            continue
+        try:
+            with file.storage.open(file.name, "rb") as source:
+                content = ContentFile(source.read())
+            if stale_image_meta(instance, field_name):
+                meta[field_name] = {**read_image_meta(content), "source": file.name}
+                changed.add("image_meta")
+            if needs_derivatives(instance, field_name):
+                widths = generate_derivatives(file.storage, file.name, content)
+                derivatives[field_name] = {"source": file.name, "widths": widths}
+                changed.add("image_derivatives")
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not process {file.name}: {e}")
+
+    if changed:
+        instance.image_derivatives = derivatives
+        instance.image_meta = meta
+        # A regular save, so content versions and caches follow the new srcset
+        instance.save(update_fields=sorted(changed))
+
+
+# -------------------
+# Image measurements
+# -------------------
+# Every stored image field keeps its measurements in the model's
+# `image_meta` JSON field, keyed by field name:
+# {"image": {"source": ..., "width": 800, "height": 600, "size": 51234,
+#            "mime": "image/jpeg", "lqip": "data:image/webp;base64,..."}}
+def read_image_meta(content):
+    """Measure an image file: displayed size, bytes, MIME type and LQIP."""
+    content.seek(0)
+    image = Image.open(content)
+    mime = Image.MIME.get(image.format)
+    width, height = image.size
+    if image.getexif().get(ExifTags.Base.Orientation) in ROTATED_ORIENTATIONS:
+        width, height = height, width
+
+    # Decode a reduced JPEG where possible, the placeholder is tiny
+    image.draft("RGB", (LQIP_SIZE * 4, LQIP_SIZE * 4))
+    placeholder = ImageOps.exif_transpose(image).convert("RGB")
+    placeholder.thumbnail((LQIP_SIZE, LQIP_SIZE))
+    placeholder = placeholder.filter(ImageFilter.GaussianBlur(1))
+    buffer = BytesIO()
+    placeholder.save(buffer, format="WEBP", quality=40)
+
+    content.seek(0)
+    return {
+        "width": width,
+        "height": height,
+        "size": content.size,
+        "mime": mime,
+        "lqip": "data:image/webp;base64," + base64.b64encode(buffer.getvalue()).decode(),
+    }
+
+
+def stale_image_meta(instance, field_name):
+    file = getattr(instance, field_name)
+    entry = (instance.image_meta or {}).get(field_name)
+    if not file:
+        return entry is not None
+    return entry is None or entry.get("source") != file.name
+
+
+def measure_image(instance, field_name):
+    """
+    Return the image_meta entry of one image field. A pending upload is
+    read from memory and committed to storage here, to learn its final
+    name; a stored file is read back from storage (backfills only).
+    """
+    file = getattr(instance, field_name)
+    if not file._committed:
+        entry = read_image_meta(file.file)
+        file.save(file.name, file.file, save=False)
+    else:
+        with file.storage.open(file.name, "rb") as content:
+            entry = read_image_meta(content)
+    entry["source"] = file.name
+    return entry
+
+
+def update_image_meta(instance, field_names):
+    meta = dict(instance.image_meta or {})
+    for field_name in field_names:
+        file = getattr(instance, field_name)
+        if not file:
+            meta.pop(field_name, None)
+            continue
+        try:
+            meta[field_name] = measure_image(instance, field_name)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not measure {file.name}: {e}")
+    instance.image_meta = meta
+
+
+def capture_image_meta(instance, update_fields=None):
+    """
+    pre_save hook: measure uploads still in memory, so nothing has to
+    download them later. Call after utils.storage.remember_blobs. Files
+    already in storage, e.g. direct uploads, are measured by the derivative
+    worker (see `process_derivatives`) or the backfill_image_meta command.
+    """
+    if update_fields is not None:
+        return
+
+    field_names = []
+    for field_name in blob_fields(type(instance)):
+        if not stale_image_meta(instance, field_name):
+            continue
+        file = getattr(instance, field_name)
+        if file and file._committed:
+            continue
+        field_names.append(field_name)
+    update_image_meta(instance, field_names)
+
+
+def process_image_meta(model, pk):
+    """Measure the stale image fields of one row and record them."""
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None:
+        return
+    field_names = [
+        name for name in blob_fields(model) if stale_image_meta(instance, name)
+    ]
+    if field_names:
+        update_image_meta(instance, field_names)
+        instance.save(update_fields=["image_meta"])
+
+
+def public_image_meta(name, entry):
+    """An image_meta entry as exposed to clients, if it describes `name`."""
+    if not name or not entry or entry.get("source") != name:
+        return None
+    return {key: value for key, value in entry.items() if key != "source"}
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_DERIVATIVE_WORKERS,
+                thread_name_prefix="image-derivatives",
+            )
+        return _executor
+
+
+def run_in_worker(model, pk, field_names):
+    close_old_connections()
+    try:
+        process_derivatives(model, pk, field_names)
+    except Exception:
+        logger.exception(f"Derivative generation failed for {model.__name__} {pk}")
+    finally:
+        close_old_connections()
+
+
+def schedule_derivatives(instance):
+    """
+    Queue derivative generation, and the measuring of images stored before
+    the row, for the image fields of `instance` that changed, once the
+    surrounding transaction commits. With IMAGE_DERIVATIVE_WORKERS = 0
+    generation runs inline instead.
+    """
+    model = type(instance)
+    field_names = worker_fields(instance)
+    if not field_names:
+        return
+
+    def submit():
+        if settings.IMAGE_DERIVATIVE_WORKERS:
+            get_executor().submit(run_in_worker, model, instance.pk, field_names)
+        else:
+            process_derivatives(model, instance.pk, field_names)
+
+    transaction.on_commit(submit)
+
+
+def build_srcset(name, entry, url):
+    """
+    Return `{format: "url 320w, url 640w"}` for a file, or None when its
+    derivatives are missing or were generated for a previous file.
+    """
+    if not name or not entry or entry.get("source") != name:
+        return None
+    return {
+        fmt: ", ".join(
+            f"{url(derivative_name(name, width, fmt))} {width}w"
+            for width in entry["widths"]
+        )
+        for fmt in settings.IMAGE_DERIVATIVE_FORMATS
+    }
+
+
+class SrcsetField(serializers.Field):
+    """
+    Read-only `srcset` map of an image field's WebP and JPEG derivatives.
+    None until they exist: they are generated once the row is committed.
+    """
+
+    def __init__(self, image_field, **kwargs):
+        self.image_field = image_field
+        kwargs["source"] = "*"
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    @property
+    def source_fields(self):
+        # Columns read, for utils.querysets.optimize_queryset
+        return [self.image_field, "image_derivatives"]
+
+    def to_representation(self, instance):
+        file = getattr(instance, self.image_field)
+        entry = (instance.image_derivatives or {}).get(self.image_field)
+        request = self.context.get("request")
+
+        def url(name):
+            url = file.storage.url(name)
+            return request.build_absolute_uri(url) if request else url
+
+        return build_srcset(file.name if file else None, entry, url)
+
+
+class ImageMetaField(serializers.Field):
+    """Read-only width, height, size, MIME type and LQIP of an image field."""
+
+    def __init__(self, image_field, **kwargs):
+        self.image_field = image_field
+        kwargs["source"] = "*"
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    @property
+    def source_fields(self):
+        return [self.image_field, "image_meta"]
+
+    def to_representation(self, instance):
+        file = getattr(instance, self.image_field)
+        entry = (instance.image_meta or {}).get(self.image_field)
+        return public_image_meta(file.name if file else None, entry)
@@ -0,0 +1,128 @@
+from django.db.models import Manager, QuerySet
+from rest_framework import serializers
+
+
+def request_scoped(context, name, factory):
+    """
+    Return the object stored under `name` for the request in a serializer
+    `context`, creating it with `factory()` on first use. Every serializer
+    rendering the same request shares it. Without a request the object
+    lives in the context itself.
+    """
+    request = context.get("request")
+    if request is not None:
+        scope = request.__dict__.setdefault("_request_scoped", {})
+    else:
+        scope = context.setdefault("_request_scoped", {})
+    if name not in scope:
+        scope[name] = factory()
+    return scope[name]
+
+
+class DataLoader:
+    """
+    Batches lookups by key, in the style of a DataLoader.
+
+    Keys are `register`ed first, then the first `load` resolves every
+    pending key with one call to `batch_load(keys)`, which returns a
+    `{key: value}` dict. Results are cached, so a key is only ever fetched
+    once; keys missing from the result load as `default`.
+    """
+
+    def __init__(self, batch_load, default=None):
+        self.batch_load = batch_load
+        self.default = default
+        self.cache = {}
+        self.pending = {}
+
+    def register(self, key):
+        if key is not None and key not in self.cache:
+            self.pending[key] = None
+
+    def prime(self, key, value):
+        self.cache[key] = value
+        self.pending.pop(key, None)
+
+    def dispatch(self):
+        keys = list(self.pending)
+        self.pending = {}
+        if not keys:
+            return
+        results = self.batch_load(keys)
+        for key in keys:
+            self.cache[key] = results.get(key, self.default)
+
+    def load(self, key):
+        if key is None:
+            return self.default
+        if key not in self.cache:
+            self.register(key)
+            self.dispatch()
+        return self.cache[key]
+
+
+def get_loader(context, batch_load, default=None):
+    """The request-scoped DataLoader of `batch_load`."""
+    name = f"loader:{batch_load.__module__}.{batch_load.__qualname__}"
+    return request_scoped(context, name, lambda: DataLoader(batch_load, default))
+
+
+class LoaderField(serializers.Field):
+    """
+    Read-only field resolved through a request-scoped DataLoader.
+
+    `key` names the attribute looked up (e.g. "category_id"), `batch_load`
+    maps a list of keys to `{key: value}`. Values are rendered by
+    `serializer` when given. Inside a LoaderListSerializer every row
+    registers its key first, so the list costs one query per field.
+    """
+
+    def __init__(self, key, batch_load, serializer=None, default=None, **kwargs):
+        self.key = key
+        self.batch_load = batch_load
+        self.serializer = serializer
+        self.default_value = default
+        kwargs["source"] = "*"
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def bind(self, field_name, parent):
+        super().bind(field_name, parent)
+        if self.serializer is not None:
+            self.serializer.bind(field_name, self)
+
+    @property
+    def source_fields(self):
+        # Columns read, for utils.querysets.optimize_queryset
+        return [self.key]
+
+    @property
+    def loader(self):
+        return get_loader(self.context, self.batch_load, self.default_value)
+
+    def register(self, instance):
+        self.loader.register(getattr(instance, self.key))
+
+    def to_representation(self, instance):
+        value = self.loader.load(getattr(instance, self.key))
+        if value is None or self.serializer is None:
+            return value
+        return self.serializer.to_representation(value)
+
+
+class LoaderListSerializer(serializers.ListSerializer):
+    """
+    ListSerializer registering the keys of every row with the child's
+    LoaderFields before rendering any of them.
+    """
+
+    def to_representation(self, data):
+        if isinstance(data, (Manager, QuerySet)):
+            data = data.all()
+        items = list(data)
+
+        for field in self.child._readable_fields:
+            if isinstance(field, LoaderField):
+                for item in items:
+                    field.register(item)
+        return super().to_representation(items)
@@ -0,0 +1,49 @@
+from django.utils.encoding import filepath_to_uri
+from utils.loaders import request_scoped
+
+
+class MediaURLBuilder:
+    """
+    Build absolute URLs for stored files without a storage call per file.
+
+    When the storage produces plain `<prefix><name>` URLs (file system,
+    public buckets) the prefix is resolved once and names are appended to
+    it. Storages that sign or otherwise vary URLs per file fall back to
+    `storage.url()` for every name.
+    """
+
+    probe_name = "__probe__"
+
+    def __init__(self, storage, request=None):
+        self.storage = storage
+        self.request = request
+        self.prefix = None
+
+        probe = storage.url(self.probe_name)
+        if probe.endswith(self.probe_name):
+            self.prefix = self.absolute(probe[: -len(self.probe_name)])
+
+    def absolute(self, url):
+        if self.request is None or url.startswith(("http://", "https://")):
+            return url
+        return self.request.build_absolute_uri(url)
+
+    def url(self, name):
+        if not name:
+            return None
+        if self.prefix is not None:
+            return self.prefix + filepath_to_uri(name)
+        return self.absolute(self.storage.url(name))
+
+    @classmethod
+    def for_field(cls, model, field_name, request=None):
+        return cls(model._meta.get_field(field_name).storage, request)
+
+    @classmethod
+    def for_context(cls, context, model, field_name):
+        """The builder of `model.field_name` shared by a whole request."""
+        return request_scoped(
+            context,
+            f"media:{model._meta.label}.{field_name}",
+            lambda: cls.for_field(model, field_name, context.get("request")),
+        )
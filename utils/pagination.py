@@ -0,0 +1,180 @@
+from datetime import datetime
+
+from django.core import signing
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+TRUE_VALUES = ("1", "true", "yes")
+
+
+class StorePagination(PageNumberPagination):
+    """
+    Page-number pagination with two opt-in modes for large catalogs:
+
+    - Keyset mode, when the request carries `?cursor=` (empty for the first
+      page). Rows are ordered on `(-created_at, -id)` and each page starts
+      right after the previous one, so deep pages cost the same as the
+      first. Cursors are signed and rejected if tampered with.
+    - `?skip_count=true` drops the `COUNT(*)` query (and the `count` key)
+      in either mode.
+
+    Without those parameters it behaves exactly like PageNumberPagination,
+    including the `page`/`page_size` query parameters. Querysets in another
+    order than newest first, such as search results ranked by relevance,
+    keep their order and are paged by number even when `?cursor=` is given.
+    """
+
+    cursor_query_param = "cursor"
+    skip_count_query_param = "skip_count"
+    cursor_salt = "utils.pagination.StorePagination"
+
+    def is_requested(self, request):
+        """Whether `request` asks for a page, for views whose default is a list."""
+        params = (
+            self.page_query_param,
+            self.page_size_query_param,
+            self.cursor_query_param,
+        )
+        return any(param in request.query_params for param in params if param)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.cursor_mode = (
+            self.cursor_query_param in request.query_params
+            and self.keyset_applies(queryset)
+        )
+        self.skip_count = (
+            request.query_params.get(self.skip_count_query_param, "").lower()
+            in TRUE_VALUES
+        )
+
+        if self.cursor_mode:
+            return self.paginate_keyset(queryset, request)
+        if self.skip_count:
+            return self.paginate_uncounted(queryset, request)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if not (self.cursor_mode or self.skip_count):
+            return super().get_paginated_response(data)
+
+        payload = {}
+        if self.count is not None:
+            payload["count"] = self.count
+        payload["next"] = self.next_link
+        if not self.cursor_mode:
+            payload["previous"] = self.get_previous_link()
+        payload["results"] = data
+        return Response(payload)
+
+    def get_page_size(self, request):
+        """
+        The requested page size as an int of at least 1, capped at
+        `max_page_size`. Views may set `page_size` to a raw query value.
+        """
+        page_size = super().get_page_size(request)
+        if page_size is None:
+            return None
+        try:
+            page_size = max(int(page_size), 1)
+        except (TypeError, ValueError):
+            raise NotFound("Invalid page size.")
+        if self.max_page_size:
+            page_size = min(page_size, self.max_page_size)
+        return page_size
+
+    # -------------------
+    # Keyset mode
+    # -------------------
+    def keyset_applies(self, queryset):
+        """Whether `queryset` reads newest first, the order keyset pages walk."""
+        order = queryset.query.order_by
+        return not order or order[0] == "-created_at"
+
+    def paginate_keyset(self, queryset, request):
+        page_size = self.get_page_size(request)
+        self.count = None if self.skip_count else queryset.count()
+
+        queryset = queryset.order_by("-created_at", "-id")
+        position = self.decode_cursor(
+            request.query_params.get(self.cursor_query_param)
+        )
+        if position is not None:
+            created_at, pk = position
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+            )
+
+        rows = list(queryset[: page_size + 1])
+        page = rows[:page_size]
+
+        self.next_link = None
+        if len(rows) > page_size:
+            last = page[-1]
+            url = request.build_absolute_uri()
+            self.next_link = replace_query_param(
+                url, self.cursor_query_param, self.encode_cursor(last)
+            )
+        return page
+
+    def encode_cursor(self, instance):
+        position = [instance.created_at.isoformat(), instance.pk]
+        return signing.dumps(position, salt=self.cursor_salt, compress=True)
+
+    def decode_cursor(self, cursor):
+        if not cursor:
+            return None
+        try:
+            created_at, pk = signing.loads(cursor, salt=self.cursor_salt)
+            return datetime.fromisoformat(created_at), int(pk)
+        except (signing.BadSignature, TypeError, ValueError):
+            raise NotFound("Invalid cursor")
+
+    # -------------------
+    # Page-number mode without COUNT(*)
+    # -------------------
+    def paginate_uncounted(self, queryset, request):
+        page_size = self.get_page_size(request)
+        try:
+            self.page_number = int(request.query_params.get(self.page_query_param, 1))
+        except ValueError:
+            raise NotFound("Invalid page.")
+        if self.page_number < 1:
+            raise NotFound("Invalid page.")
+
+        offset = (self.page_number - 1) * page_size
+        rows = list(queryset[offset : offset + page_size + 1])
+        page = rows[:page_size]
+        if not page and self.page_number > 1:
+            raise NotFound("Invalid page.")
+
+        self.count = None
+        url = request.build_absolute_uri()
+        self.next_link = None
+        if len(rows) > page_size:
+            self.next_link = replace_query_param(
+                url, self.page_query_param, self.page_number + 1
+            )
+        return page
+
+    def get_previous_link(self):
+        if not self.skip_count:
+            return super().get_previous_link()
+        if self.page_number <= 1:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.page_number == 2:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, self.page_number - 1)
+
+
+class OwnerListPagination(StorePagination):
+    """StorePagination for dashboard lists: `?page_size=` capped at 100."""
+
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
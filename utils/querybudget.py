@@ -0,0 +1,283 @@
+import time
+from collections import Counter, namedtuple
+
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from detail.models import StoreFAQ
+from product.models import ProductImage, ProductOptions
+from utils.seed import SEED_PASSWORD
+from utils.stores import store_resolver
+
+
+# One request per URL of core/urls.py. `path` is formatted with the
+# parameters of `endpoint_params`; `budget` is the most queries the request
+# may run, whatever the size of the catalog. Owner endpoints authenticate
+# with a real JWT, so their budgets include the user lookup.
+Endpoint = namedtuple(
+    "Endpoint",
+    ["name", "method", "path", "budget", "status", "auth", "data", "format"],
+    defaults=[True, None, "json"],
+)
+
+ENDPOINTS = [
+    # account
+    Endpoint(
+        "signup",
+        "POST",
+        "/api/signup/",
+        18,
+        201,
+        auth=False,
+        data={
+            "email": "budget@example.com",
+            "store_name": "Budget Signup",
+            "password": "budget-password",
+        },
+    ),
+    Endpoint(
+        "signin",
+        "POST",
+        "/api/signin/",
+        1,
+        200,
+        auth=False,
+        data={"email": "{email}", "password": SEED_PASSWORD},
+    ),
+    Endpoint(
+        "token_obtain_pair",
+        "POST",
+        "/api/token/",
+        1,
+        200,
+        auth=False,
+        data={"email": "{email}", "password": SEED_PASSWORD},
+    ),
+    Endpoint(
+        "token_refresh",
+        "POST",
+        "/api/token/refresh/",
+        1,
+        200,
+        auth=False,
+        data={"refresh": "{refresh}"},
+    ),
+    # store_setting
+    Endpoint("configurations", "GET", "/api/configurations/", 2, 200),
+    Endpoint(
+        "public-configurations", "GET", "/api/configurations/{store}/", 6, 200, auth=False
+    ),
+    Endpoint("logo", "GET", "/api/logo/", 3, 200),
+    Endpoint("cover", "GET", "/api/cover/", 3, 200),
+    Endpoint(
+        "store-image-upload-ticket",
+        "POST",
+        "/api/store-images/logo/upload/ticket/",
+        3,
+        201,
+        data={"content_type": "image/png", "size": 68, "sha256": "0" * 64},
+    ),
+    # detail
+    Endpoint("store-detail", "GET", "/api/store/", 4, 200),
+    Endpoint("store-faqs", "GET", "/api/store/faqs/", 4, 200),
+    Endpoint(
+        "store-faq-detail",
+        "PUT",
+        "/api/store/faqs/{faq}/",
+        7,
+        200,
+        data={"question": "Updated?", "answer": "Updated."},
+    ),
+    # public
+    Endpoint(
+        "public-store-detail", "GET", "/api/stores/{store}/", 7, 200, auth=False
+    ),
+    Endpoint("item-group", "GET", "/api/item-group/{store}/", 7, 200, auth=False),
+    Endpoint("items", "GET", "/api/items/{store}/items/", 9, 200, auth=False),
+    Endpoint("filter", "GET", "/api/items/{store}/filtered/", 9, 200, auth=False),
+    Endpoint(
+        "featured", "GET", "/api/featured-and-category/{store}/", 9, 200, auth=False
+    ),
+    # product
+    Endpoint("products-paginated", "GET", "/api/products-paginated/", 4, 200),
+    Endpoint("product-list", "GET", "/api/products/", 3, 200),
+    Endpoint("product-list-page", "GET", "/api/products/?page=1", 4, 200),
+    Endpoint(
+        "product-import",
+        "POST",
+        "/api/products/import/",
+        7,
+        201,
+        data={"file": "budget.jsonl"},
+        format="multipart",
+    ),
+    Endpoint(
+        "product-bulk-update",
+        "PATCH",
+        "/api/products/bulk/",
+        6,
+        200,
+        data=[{"id": "{product}", "price": "5.00", "featured": True}],
+    ),
+    Endpoint("product-export", "GET", "/api/products/export/jsonl/", 4, 200),
+    Endpoint(
+        "productimage-thumbnail",
+        "PUT",
+        "/api/products/{product}/images/{image}/",
+        14,
+        200,
+        data={"is_thumbnail": True},
+    ),
+    Endpoint(
+        "productimage-delete", "DELETE", "/api/products/images/{image}/", 9, 200
+    ),
+    Endpoint(
+        "productimage-upload-ticket",
+        "POST",
+        "/api/products/{product}/images/upload/ticket/",
+        2,
+        201,
+        data={"content_type": "image/png", "size": 68, "sha256": "0" * 64},
+    ),
+    Endpoint("categories-paginated", "GET", "/api/categories-paginated/", 3, 200),
+    Endpoint("categories", "GET", "/api/categories/", 2, 200),
+    Endpoint("category-detail", "GET", "/api/categories/{category}/", 2, 200),
+    Endpoint(
+        "category-image-upload-ticket",
+        "POST",
+        "/api/categories/{category}/image/upload/ticket/",
+        2,
+        201,
+        data={"content_type": "image/png", "size": 68, "sha256": "0" * 64},
+    ),
+    Endpoint("product-detail", "GET", "/api/products/{product}/", 3, 200),
+    Endpoint("product-options", "GET", "/api/product-options/", 2, 200),
+    Endpoint(
+        "product-option-detail", "GET", "/api/product-options/{option}/", 2, 200
+    ),
+]
+
+# URL patterns deliberately left out of the budgets, with the reason
+EXEMPT = {
+    "admin/": "Django admin",
+    "api/products/<int:product_pk>/images/update/": "writes image files to storage",
+    "api/products/<int:product_pk>/images/upload/finalize/": "needs a file in storage",
+    "api/categories/<int:pk>/image/upload/finalize/": "needs a file in storage",
+    "api/store-images/<str:field>/upload/finalize/": "needs a file in storage",
+    "uploads/local/<str:token>/": "needs a presigned upload",
+}
+
+Measurement = namedtuple(
+    "Measurement", ["endpoint", "status", "queries", "duplicates", "seconds"]
+)
+
+
+def url_patterns(resolver=None, prefix=""):
+    """Every route of the URLconf, as `api/products/<int:pk>/`."""
+    resolver = resolver or get_resolver()
+    for pattern in resolver.url_patterns:
+        route = prefix + str(pattern.pattern)
+        if isinstance(pattern, URLResolver):
+            yield from url_patterns(pattern, route)
+        elif isinstance(pattern, URLPattern):
+            yield route
+
+
+def endpoint_params(owner):
+    """Values for the placeholders of Endpoint paths and data."""
+    product = owner.products.order_by("id").first()
+    return {
+        "store": owner.store_name,
+        "email": owner.email,
+        "refresh": str(RefreshToken.for_user(owner)),
+        "product": product.pk,
+        "image": ProductImage.objects.filter(product=product).order_by("id").first().pk,
+        "category": product.category_id,
+        "faq": StoreFAQ.objects.filter(store__user__user=owner).order_by("id").first().pk,
+        "option": ProductOptions.objects.filter(product=product).order_by("id").first().pk,
+    }
+
+
+def fill(value, params):
+    """Format the placeholders of `value`; a lone "{name}" keeps its type."""
+    if isinstance(value, str):
+        if value[1:-1] in params and value == f"{{{value[1:-1]}}}":
+            return params[value[1:-1]]
+        return value.format(**params)
+    if isinstance(value, dict):
+        return {key: fill(item, params) for key, item in value.items()}
+    if isinstance(value, list):
+        return [fill(item, params) for item in value]
+    return value
+
+
+def request_data(endpoint, params):
+    data = fill(endpoint.data, params)
+    if endpoint.format == "multipart" and data and "file" in data:
+        # Imports upload a small JSONL file of new products
+        lines = [
+            f'{{"name": "Imported {i}", "price": "{i + 1}.00"}}' for i in range(3)
+        ]
+        data["file"] = SimpleUploadedFile(data["file"], "\n".join(lines).encode())
+    return data
+
+
+def measure(endpoint, owner, params):
+    """
+    Send one request to `endpoint` and measure it. Writes are rolled back,
+    and caches and the store resolver start empty, so every request is
+    measured on its cold path and leaves the database as it was.
+    """
+    client = APIClient()
+    if endpoint.auth:
+        token = RefreshToken.for_user(owner).access_token
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+    path = endpoint.path.format(**params)
+    data = request_data(endpoint, params)
+
+    for cache in caches.all():
+        cache.clear()
+    store_resolver.clear()
+
+    with transaction.atomic():
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = getattr(client, endpoint.method.lower())(
+                path, data, format=endpoint.format
+            )
+            if response.streaming:
+                b"".join(response.streaming_content)
+            seconds = time.perf_counter() - start
+        transaction.set_rollback(True)
+
+    sql = Counter(query["sql"] for query in captured.captured_queries)
+    return Measurement(
+        endpoint,
+        response.status_code,
+        len(captured),
+        sum(count - 1 for count in sql.values()),
+        seconds,
+    )
+
+
+# Caches are swapped for private in-memory ones while measuring
+MEASUREMENT_CACHES = {
+    alias: {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": f"query-budget-{alias}",
+    }
+    for alias in ("default", "responses")
+}
+
+
+def measure_endpoints(owner, endpoints=None):
+    """Measure every endpoint (or the given ones) against `owner`'s store."""
+    params = endpoint_params(owner)
+    with override_settings(CACHES=MEASUREMENT_CACHES):
+        return [measure(endpoint, owner, params) for endpoint in endpoints or ENDPOINTS]
+
@@ -0,0 +1,134 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+
+class QueryPlan:
+    """The relations and columns a serializer reads, gathered by `optimize_queryset`."""
+
+    def __init__(self):
+        self.select = []
+        self.prefetch = []
+        self.columns = set()
+
+    def add_column(self, path):
+        self.columns.add(path)
+
+    def add_model(self, model, prefix):
+        """Load every column of `model`, for fields whose reads are unknown."""
+        for field in model._meta.concrete_fields:
+            self.columns.add(join(prefix, field.name))
+
+    def add_select(self, path):
+        if path not in self.select:
+            self.select.append(path)
+
+    def apply(self, queryset):
+        if self.select:
+            queryset = queryset.select_related(*self.select)
+        if self.prefetch:
+            queryset = queryset.prefetch_related(*self.prefetch)
+        return queryset.only(*sorted(self.columns))
+
+
+def join(prefix, name):
+    return f"{prefix}__{name}" if prefix else name
+
+
+def serializer_fields(serializer):
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+    return getattr(serializer, "fields", None)
+
+
+def plan_serializer(plan, serializer, model, prefix=""):
+    fields = serializer_fields(serializer)
+    if fields is None:
+        # Serializers without declared fields read anything
+        plan.add_model(model, prefix)
+        return
+
+    for field in fields.values():
+        if field.write_only:
+            continue
+        # Fields reading the whole object declare the columns they need
+        declared = getattr(field, "source_fields", None)
+        if declared is not None:
+            for name in declared:
+                plan.add_column(join(prefix, name))
+        elif isinstance(field, serializers.SerializerMethodField) or field.source == "*":
+            if isinstance(field, serializers.BaseSerializer):
+                plan_serializer(plan, field, model, prefix)
+            else:
+                plan.add_model(model, prefix)
+        else:
+            plan_source(plan, field, model, prefix)
+
+
+def plan_source(plan, field, model, prefix):
+    """Follow a field's dotted source through the models it crosses."""
+    attrs = field.source_attrs
+    for index, attr in enumerate(attrs):
+        last = index == len(attrs) - 1
+        try:
+            model_field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            if hasattr(model, attr):
+                # A property or method: no telling which columns it reads
+                plan.add_model(model, prefix)
+            # Otherwise the attribute does not exist and DRF skips the field
+            return
+
+        path = join(prefix, attr)
+        if not model_field.is_relation:
+            plan.add_column(path)
+            return
+
+        nested = last and isinstance(field, serializers.BaseSerializer)
+        if model_field.one_to_many or model_field.many_to_many:
+            queryset = model_field.related_model._default_manager.all()
+            if nested:
+                queryset = optimize_queryset(queryset, field, related_to=model_field)
+            plan.prefetch.append(Prefetch(path, queryset=queryset))
+            return
+
+        if last and not nested and model_field.concrete:
+            # Primary key related fields only read the foreign key column
+            plan.add_column(path)
+            return
+
+        plan.add_select(path)
+        if model_field.concrete:
+            plan.add_column(path)
+        model = model_field.related_model
+        prefix = path
+        if last:
+            if nested:
+                plan_serializer(plan, field, model, prefix)
+            else:
+                plan.add_model(model, prefix)
+
+
+def optimize_queryset(queryset, serializer, related_to=None):
+    """
+    Return `queryset` loading exactly what `serializer` (a class or an
+    instance) renders: `select_related` for forward and one-to-one
+    relations, a `Prefetch` with its own optimized queryset for reverse and
+    many-to-many relations, and `only()` the serialized columns.
+
+    Fields that read the whole object (`source="*"`) declare their columns
+    with a `source_fields` attribute; method fields and properties load
+    every column of their model. Serializers without declared fields, such
+    as hand-written BaseSerializers, leave the queryset untouched.
+    """
+    if isinstance(serializer, type):
+        serializer = serializer()
+    if serializer_fields(serializer) is None:
+        return queryset
+
+    plan = QueryPlan()
+    if related_to is not None and related_to.one_to_many:
+        # Prefetched rows are matched to their parent through this column
+        plan.add_column(related_to.field.name)
+    plan_serializer(plan, serializer, queryset.model)
+    return plan.apply(queryset)
@@ -0,0 +1,82 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+
+
+# The alias reads go to in the current context, None for the primary
+_read_alias = ContextVar("database_read_alias", default=None)
+
+
+def replica_alias():
+    """The replica alias when replica routing is on and configured, else None."""
+    alias = settings.DATABASE_REPLICA_ALIAS
+    if settings.DATABASE_REPLICA_ROUTING and alias in settings.DATABASES:
+        return alias
+    return None
+
+
+@contextmanager
+def replica_reads():
+    """Send the reads of the block to the replica, if there is one."""
+    token = _read_alias.set(replica_alias())
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+@contextmanager
+def primary_reads():
+    """Send the reads of the block to the primary."""
+    token = _read_alias.set(None)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+def read_from_replica():
+    """Send every further read of the current context to the replica, if any."""
+    _read_alias.set(replica_alias())
+
+
+def stick_to_primary():
+    """Send every further read of the current context to the primary."""
+    _read_alias.set(None)
+
+
+def within_replica_lag(moment):
+    """Whether `moment` is recent enough for the replica to lag behind it."""
+    return timezone.now() - moment < timedelta(seconds=settings.DATABASE_REPLICA_LAG)
+
+
+class ReplicaRouter:
+    """
+    Sends reads to the replica inside `replica_reads()` (see
+    public.middleware.ReadReplicaMiddleware), everything else to the primary.
+
+    Writes always go to the primary, so objects read from the replica are
+    saved there. The router has no side effects: code that must read back
+    its own writes pins the context with `stick_to_primary()` or
+    `primary_reads()`. Migrations run on every alias: in production only
+    `default` is migrated, the replica copies its schema.
+    """
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # Named explicitly: left to Django, saving an object read from the
+        # replica would write to the replica
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Primary and replica hold the same rows
+        aliases = {DEFAULT_DB_ALIAS, settings.DATABASE_REPLICA_ALIAS}
+        if {obj1._state.db, obj2._state.db} <= aliases:
+            return True
+        return None
@@ -0,0 +1,163 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """
+    Server-side cache of rendered public responses.
+
+    Entries are stored per store, view, renderer format, origin (scheme and
+    host, which absolute URLs in the body depend on) and normalized query
+    string, and carry the store content version they were rendered at. An
+    entry whose version no longer matches the store's current version is
+    stale: it is never served as fresh, so edits invalidate exactly that
+    store's entries, but it can still be served while another worker
+    rebuilds it (see `SingleFlight`).
+
+    The backend is any Django cache alias (`RESPONSE_CACHE_ALIAS`); size
+    bounds and LRU eviction come from the alias configuration.
+    """
+
+    def __init__(self, alias=None, timeout=None):
+        self._alias = alias
+        self._timeout = timeout
+        self._lock = threading.Lock()
+        self.hits = Counter()
+        self.misses = Counter()
+        self.stale = Counter()
+
+    @property
+    def backend(self):
+        return caches[self._alias or getattr(settings, "RESPONSE_CACHE_ALIAS", "default")]
+
+    @property
+    def timeout(self):
+        if self._timeout is not None:
+            return self._timeout
+        return getattr(settings, "RESPONSE_CACHE_TIMEOUT", 60 * 60 * 24)
+
+    @staticmethod
+    def make_key(owner_id, view_name, request):
+        """
+        Build the cache key for a request, ignoring query parameter order.
+        Bodies hold absolute media URLs, so the origin is part of the key.
+        """
+        origin = request.build_absolute_uri("/")
+        query = sorted(
+            (name, value)
+            for name, values in request.GET.lists()
+            for value in values
+        )
+        digest = hashlib.sha1(repr((origin, query)).encode()).hexdigest()
+        renderer_format = getattr(request, "accepted_renderer", None)
+        renderer_format = getattr(renderer_format, "format", "")
+        return f"response:{owner_id}:{view_name}:{renderer_format}:{digest}"
+
+    def lookup(self, key, version):
+        """
+        Return `(entry, fresh)` for `key`. `entry` is None when nothing is
+        stored; `fresh` tells whether it was rendered at `version`.
+        """
+        entry = self.backend.get(key)
+        fresh = entry is not None and entry["version"] == version
+        if fresh:
+            self.record(key, self.hits)
+        return entry, fresh
+
+    def set(self, key, entry):
+        self.backend.set(key, entry, self.timeout)
+
+    def record(self, key, counter):
+        view_name = key.split(":")[2]
+        with self._lock:
+            counter[view_name] += 1
+
+    def stats(self):
+        """Return hit/miss/stale counters per view for this process."""
+        with self._lock:
+            views = set(self.hits) | set(self.misses) | set(self.stale)
+            return {
+                view: {
+                    "hits": self.hits[view],
+                    "misses": self.misses[view],
+                    "stale": self.stale[view],
+                }
+                for view in sorted(views)
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits.clear()
+            self.misses.clear()
+            self.stale.clear()
+
+
+class SingleFlight:
+    """
+    Lets exactly one worker rebuild a response cache entry at a time.
+
+    Threads of the same process coalesce on an in-memory event; other
+    processes are kept out by a lock key added to the response cache
+    backend. That needs an atomic `add`, as the local memory, Redis and
+    LRUFileBasedCache backends have; Django's plain FileBasedCache does not.
+    """
+
+    poll_interval = 0.05
+
+    def __init__(self, lock_timeout=30):
+        self.lock_timeout = lock_timeout
+        self._lock = threading.Lock()
+        self._inflight = {}
+
+    @staticmethod
+    def lock_key(key):
+        return f"{key}:rebuild"
+
+    def acquire(self, key, backend):
+        """Try to become the worker rebuilding `key`. Never blocks."""
+        with self._lock:
+            if key in self._inflight:
+                return False
+            self._inflight[key] = threading.Event()
+
+        if backend.add(self.lock_key(key), True, self.lock_timeout):
+            return True
+
+        self._finish(key)
+        return False
+
+    def release(self, key, backend):
+        backend.delete(self.lock_key(key))
+        self._finish(key)
+
+    def wait(self, key, backend, timeout):
+        """Wait up to `timeout` seconds for the current rebuild of `key`."""
+        with self._lock:
+            event = self._inflight.get(key)
+        if event is not None:
+            event.wait(timeout)
+            return
+
+        # Rebuilt by another process: poll its lock key
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline and backend.get(self.lock_key(key)):
+            time.sleep(self.poll_interval)
+
+    def _finish(self, key):
+        with self._lock:
+            event = self._inflight.pop(key, None)
+        if event is not None:
+            event.set()
+
+
+response_cache = ResponseCache()
+single_flight = SingleFlight()
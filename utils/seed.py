@@ -0,0 +1,123 @@
+from decimal import Decimal
+
+from django.db import transaction
+from account.models import User, normalize_store_name
+from detail.models import StoreFAQ
+from product.counts import reconcile_category_counts
+from product.images import refresh_primary_images
+from product.models import Category, OptionsNote, Product, ProductImage, ProductOptions
+from product.search import get_search_backend
+from public.versioning import bump_store_version
+from utils.db import bulk_create_with_pks
+
+
+SEED_PASSWORD = "seed-password"
+
+
+def seed_categories(count):
+    """Shared categories named `Seed category <n>`, created when missing."""
+    return [
+        Category.objects.get_or_create(name=f"Seed category {i}")[0]
+        for i in range(count)
+    ]
+
+
+def seed_image(name, product, is_thumbnail):
+    """A ProductImage whose image_meta stands in for the missing file."""
+    meta = {"source": name, "width": 800, "height": 800, "size": 51234, "mime": "image/jpeg"}
+    return ProductImage(
+        product=product,
+        image=name,
+        is_thumbnail=is_thumbnail,
+        image_meta={"image": meta},
+    )
+
+
+@transaction.atomic
+def seed_store(
+    store_name,
+    products=20,
+    images=2,
+    options=1,
+    faqs=3,
+    categories=4,
+    password=SEED_PASSWORD,
+):
+    """
+    Create an owner and a realistic store for `store_name`: store details,
+    configurations, FAQs and `products` products spread over shared
+    categories, each with `images` images (the first one the thumbnail) and
+    `options` option sets with a note. Image rows name files that need not
+    exist, their dimensions are recorded in image_meta. Returns the owner.
+
+    Rows are bulk inserted, so the denormalized data the signals would
+    maintain (primary images, category counts, search index, content
+    version) is brought up to date explicitly.
+    """
+    key = normalize_store_name(store_name).replace(" ", "-")
+    owner = User.objects.create_user(
+        email=f"{key}@seed.example.com",
+        store_name=store_name,
+        full_name=f"{store_name} Owner",
+        niche="seed",
+        password=password,
+    )
+
+    store = owner.profile.store
+    store.description = f"{store_name} sells everything a seeded store needs."
+    store.country = "Nigeria"
+    store.product_types = ["clothing", "shoes"]
+    store.save()
+    StoreFAQ.objects.bulk_create(
+        StoreFAQ(store=store, question=f"Question {i}?", answer=f"Answer {i}.")
+        for i in range(faqs)
+    )
+
+    configurations = owner.configurations
+    configurations.headline = f"Welcome to {store_name}"
+    configurations.save()
+
+    shared = seed_categories(categories)
+    catalog = bulk_create_with_pks(
+        Product.objects.filter(owner=owner),
+        [
+            Product(
+                owner=owner,
+                name=f"{store_name} product {i}",
+                category=shared[i % len(shared)] if shared else None,
+                description=f"Description of product {i}.",
+                price=Decimal(10 + i),
+                discount_price=Decimal(8 + i) if i % 3 == 0 else None,
+                quantity=i % 7,
+                availability=i % 5 != 0,
+                hot_deal=i % 4 == 0,
+                featured=i % 2 == 0,
+                recent=i % 3 == 0,
+            )
+            for i in range(products)
+        ],
+    )
+
+    ProductImage.objects.bulk_create(
+        seed_image(f"products/images/seed-{product.pk}-{i}.jpg", product, i == 0)
+        for product in catalog
+        for i in range(images)
+    )
+
+    notes = bulk_create_with_pks(
+        OptionsNote.objects.all(),
+        [OptionsNote(note="Pick a size") for _ in range(len(catalog) * options)],
+    )
+    notes = iter(notes)
+    ProductOptions.objects.bulk_create(
+        ProductOptions(product=product, note=next(notes), options=["S", "M", "L"])
+        for product in catalog
+        for _ in range(options)
+    )
+
+    product_ids = [product.pk for product in catalog]
+    refresh_primary_images(product_ids)
+    reconcile_category_counts([owner.pk])
+    get_search_backend().index(catalog)
+    bump_store_version(owner.pk)
+    return owner
@@ -0,0 +1,23 @@
+from django.db.backends.sqlite3 import base, operations
+from django.db.models import Exists, ExpressionWrapper, Lookup
+
+
+class DatabaseOperations(operations.DatabaseOperations):
+    def conditional_expression_supported_in_where_clause(self, expression):
+        # As on MySQL: `filter(featured=True)` renders `featured = 1`, not a
+        # bare `featured`, which SQLite never seeks an index on
+        if isinstance(expression, (Exists, Lookup)):
+            return True
+        if isinstance(expression, ExpressionWrapper) and expression.conditional:
+            return self.conditional_expression_supported_in_where_clause(
+                expression.expression
+            )
+        if getattr(expression, "conditional", False):
+            return False
+        return super().conditional_expression_supported_in_where_clause(expression)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """SQLite with boolean columns compared explicitly, see DatabaseOperations."""
+
+    ops_class = DatabaseOperations
@@ -0,0 +1,351 @@
+import functools
+import hashlib
+import logging
+import posixpath
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import Storage, default_storage
+from django.db import transaction
+from django.utils.module_loading import import_string
+from django.views.static import serve
+
+
+logger = logging.getLogger(__name__)
+
+BLOB_PREFIX = "blobs"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Image fields whose files are shared blobs, by model label. A blob is
+# deleted once none of these fields references it any more.
+BLOB_FIELDS = {
+    "product.ProductImage": ["image"],
+    "product.Category": ["image"],
+    "detail.Store": ["image_one", "image_two", "image_three"],
+    "store_setting.Cover": ["cover_image"],
+    "store_setting.Logo": ["logo"],
+    "store_setting.StoreConfigurations": [
+        "background_image_one",
+        "background_image_two",
+        "background_image_three",
+    ],
+}
+
+
+def is_blob_name(name):
+    return bool(name) and name.startswith(f"{BLOB_PREFIX}/")
+
+
+def content_hash(content):
+    # Kept on the upload, so the claim and the storage hash it only once
+    cached = getattr(content, "_content_hash", None)
+    if cached is not None:
+        return cached
+    digest = hashlib.sha256()
+    if hasattr(content, "seek"):
+        content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    if hasattr(content, "seek"):
+        content.seek(0)
+    content._content_hash = digest.hexdigest()
+    return content._content_hash
+
+
+def blob_path(digest, extension):
+    return f"{BLOB_PREFIX}/{digest[:2]}/{digest}{extension}"
+
+
+def blob_name(name, content):
+    """`products/images/a.JPG` -> `blobs/3f/3f9a...e1.jpg`"""
+    extension = posixpath.splitext(name)[1].lower()
+    return blob_path(content_hash(content), extension)
+
+
+def unwrap(storage):
+    """The storage that actually holds the files, behind any wrapper."""
+    return getattr(storage, "backend", storage)
+
+
+class ContentAddressedStorage(Storage):
+    """
+    Storage wrapper naming every upload by its SHA-256 digest.
+
+    Identical files share one blob, so an upload whose blob already exists
+    is not written again. Blob names never change content, which is what
+    allows them to be served as immutable. Everything except naming is
+    delegated to the wrapped `backend`.
+    """
+
+    def __init__(self, backend="django.core.files.storage.FileSystemStorage", options=None):
+        self.backend = import_string(backend)(**(options or {}))
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+
+        if not is_blob_name(name):
+            name = blob_name(name, content)
+        if self.backend.exists(name):
+            return name
+        return self.backend.save(name, content, max_length=max_length)
+
+    def _open(self, name, mode="rb"):
+        return self.backend.open(name, mode)
+
+    def delete(self, name):
+        return self.backend.delete(name)
+
+    def exists(self, name):
+        return self.backend.exists(name)
+
+    def url(self, name):
+        return self.backend.url(name)
+
+    def size(self, name):
+        return self.backend.size(name)
+
+    def path(self, name):
+        return self.backend.path(name)
+
+    def listdir(self, path):
+        return self.backend.listdir(path)
+
+    def get_accessed_time(self, name):
+        return self.backend.get_accessed_time(name)
+
+    def get_created_time(self, name):
+        return self.backend.get_created_time(name)
+
+    def get_modified_time(self, name):
+        return self.backend.get_modified_time(name)
+
+
+# -------------------
+# Reference counting
+# -------------------
+def blob_fields(model):
+    return BLOB_FIELDS.get(model._meta.label, [])
+
+
+def blob_references(name):
+    """Number of rows, across every registered field, referencing `name`."""
+    count = 0
+    for label, field_names in BLOB_FIELDS.items():
+        model = apps.get_model(label)
+        for field_name in field_names:
+            count += model.objects.filter(**{field_name: name}).count()
+    return count
+
+
+# -------------------
+# Blob locks
+# -------------------
+# Checking that a blob exists before referencing it, and counting its
+# references before deleting it, are serialized on a product.Blob row:
+# either the release sees the new row and keeps the file, or it deletes
+# the file first and the save finds it missing and stores it again.
+def lock_blobs(names):
+    """
+    Lock the Blob rows of `names` until the current transaction ends,
+    creating the missing ones. Rows are locked in name order, so callers
+    locking several blobs cannot deadlock.
+    """
+    Blob = apps.get_model("product", "Blob")
+    names = sorted({name for name in names if is_blob_name(name)})
+    while names:
+        Blob.objects.bulk_create(
+            [Blob(name=name) for name in names], ignore_conflicts=True
+        )
+        locked = set(
+            Blob.objects.select_for_update()
+            .filter(name__in=names)
+            .order_by("name")
+            .values_list("name", flat=True)
+        )
+        # A release deleted the row while we waited for its lock
+        names = [name for name in names if name not in locked]
+
+
+def claim_blobs(names, storage=None):
+    """
+    Lock the blobs `names` for rows about to reference them and return the
+    ones whose file is missing, which the caller must store (again). Call
+    inside the transaction that writes those rows.
+    """
+    storage = unwrap(storage or default_storage)
+    lock_blobs(names)
+    return [name for name in names if is_blob_name(name) and not storage.exists(name)]
+
+
+def claim_new_blobs(instance, update_fields=None):
+    """
+    pre_save hook: lock the blobs the row starts referencing before the
+    storage is asked whether they exist. Call after remember_blobs and
+    before anything stores the row's files. The lock lasts until the
+    saving transaction ends; outside of one it covers nothing but this
+    check, which is why the views saving image rows are atomic (see
+    `atomic_with_uploads`).
+    """
+    model = type(instance)
+    field_names = blob_fields(model)
+    if update_fields is not None:
+        field_names = [name for name in field_names if name in update_fields]
+    previous = getattr(instance, "_previous_blobs", None) or {}
+
+    names = []
+    for field_name in field_names:
+        file = getattr(instance, field_name)
+        if not file:
+            continue
+        name = file.name
+        if not file._committed and isinstance(file.storage, ContentAddressedStorage):
+            # The name the storage will give the pending upload
+            field = model._meta.get_field(field_name)
+            name = blob_name(field.generate_filename(instance, file.name), file.file)
+        if is_blob_name(name) and name not in previous:
+            names.append(name)
+
+    if names:
+        with transaction.atomic(savepoint=False):
+            lock_blobs(names)
+
+
+def store_uploads(files, storage=None):
+    """
+    Store uploaded `files` as blobs ahead of the transaction saving the
+    rows that reference them. Returns the names that were written.
+
+    The saves then find their blobs in storage and upload nothing while
+    the Blob rows are locked. A blob released in between is written again
+    by the save, under the lock.
+    """
+    storage = storage or default_storage
+    if not isinstance(storage, ContentAddressedStorage):
+        return []
+    written = []
+    for file in files:
+        name = blob_name(storage.get_valid_name(posixpath.basename(file.name)), file)
+        if not storage.exists(name):
+            written.append(storage.save(name, file))
+        # Left as it came for the view that validates and saves it
+        file.seek(0)
+    return written
+
+
+def atomic_with_uploads(view):
+    """
+    `transaction.atomic` for view methods saving the request's files to
+    blob fields. The files are stored before the transaction starts (see
+    `store_uploads`); blobs that no row took up, e.g. after a validation
+    error, are released again afterwards.
+    """
+
+    @functools.wraps(view)
+    def wrapper(self, request, *args, **kwargs):
+        files = [
+            file for key in request.FILES for file in request.FILES.getlist(key)
+        ]
+        written = store_uploads(files)
+        try:
+            with transaction.atomic():
+                return view(self, request, *args, **kwargs)
+        finally:
+            if written:
+                release_blobs({name: [] for name in written})
+
+    return wrapper
+
+
+def release_blobs(blobs, storage=None):
+    """
+    Delete the given blobs, and their derivatives, once nothing references
+    them. `blobs` maps names to the derivative widths generated for them.
+    """
+    # Imported here, utils.images depends on this module
+    from utils.images import derivative_name
+
+    Blob = apps.get_model("product", "Blob")
+    storage = unwrap(storage or default_storage)
+    for name, widths in blobs.items():
+        if not is_blob_name(name):
+            continue
+        with transaction.atomic():
+            lock_blobs([name])
+            if blob_references(name):
+                continue
+            names = [name] + [
+                derivative_name(name, width, fmt)
+                for width in widths
+                for fmt in settings.IMAGE_DERIVATIVE_FORMATS
+            ]
+            for target in names:
+                try:
+                    storage.delete(target)
+                except OSError as e:
+                    logger.warning(f"Could not delete blob {target}: {e}")
+            Blob.objects.filter(name=name).delete()
+
+
+def instance_blobs(instance, values=None, derivatives=None):
+    """`{name: derivative widths}` of the blobs referenced by `instance`."""
+    if values is None:
+        values = {
+            field_name: getattr(instance, field_name).name
+            for field_name in blob_fields(type(instance))
+        }
+    if derivatives is None:
+        derivatives = getattr(instance, "image_derivatives", None) or {}
+
+    blobs = {}
+    for field_name, name in values.items():
+        if name:
+            entry = derivatives.get(field_name) or {}
+            widths = entry.get("widths", []) if entry.get("source") == name else []
+            blobs[name] = widths
+    return blobs
+
+
+def remember_blobs(instance, update_fields=None):
+    """pre_save hook: note the blobs the row references before the save."""
+    field_names = blob_fields(type(instance))
+    if update_fields is not None:
+        field_names = [name for name in field_names if name in update_fields]
+    instance._previous_blobs = {}
+    if instance.pk is None or not field_names:
+        return
+
+    columns = list(field_names)
+    if hasattr(instance, "image_derivatives"):
+        columns.append("image_derivatives")
+    row = type(instance).objects.filter(pk=instance.pk).values(*columns).first()
+    if row is not None:
+        derivatives = row.pop("image_derivatives", None) or {}
+        instance._previous_blobs = instance_blobs(instance, row, derivatives)
+
+
+def release_replaced_blobs(instance):
+    """post_save hook: release blobs the row stopped referencing."""
+    previous = getattr(instance, "_previous_blobs", None) or {}
+    current = instance_blobs(instance)
+    replaced = {name: widths for name, widths in previous.items() if name not in current}
+    if replaced:
+        transaction.on_commit(lambda: release_blobs(replaced))
+
+
+def release_deleted_blobs(instance):
+    """post_delete hook: release every blob the row referenced."""
+    blobs = instance_blobs(instance)
+    if blobs:
+        transaction.on_commit(lambda: release_blobs(blobs))
+
+
+def serve_media(request, path, document_root=None, show_indexes=False):
+    """`django.views.static.serve` marking blobs as immutable, for DEBUG."""
+    response = serve(request, path, document_root, show_indexes)
+    if is_blob_name(path):
+        response["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+    return response
@@ -0,0 +1,83 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from account.models import User, normalize_store_name
+from .replicas import primary_reads
+
+
+# Everything a public request needs to know about the store it targets
+Tenant = namedtuple("Tenant", ["owner_id", "store_id", "configuration_id"])
+
+
+class StoreResolver:
+    """
+    Process-local, size-bounded cache of store name -> Tenant.
+
+    Only active stores resolve. Entries (including misses) are dropped when
+    the user, its Store or its StoreConfigurations are saved or deleted in
+    this process (see the account, detail and store_setting signals) and
+    expire after `timeout` seconds so other processes catch up.
+    """
+
+    def __init__(self, max_entries=1024, timeout=60):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # store_key -> (tenant, expires_at)
+
+    def resolve(self, store_name):
+        """Return the Tenant of the active store named `store_name`, or None."""
+        key = normalize_store_name(store_name)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                return entry[0]
+
+        # From the primary: a miss read from a lagging replica would be
+        # cached, hiding a new store for `timeout` seconds
+        with primary_reads():
+            row = (
+                User.objects.filter(store_key=key, is_active=True)
+                .values_list("id", "profile__store__id", "configurations__id")
+                .first()
+            )
+        tenant = Tenant(*row) if row else None
+
+        with self._lock:
+            self._entries[key] = (tenant, now + self.timeout)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return tenant
+
+    def invalidate(self, *store_keys):
+        with self._lock:
+            for key in store_keys:
+                self._entries.pop(key, None)
+
+    def invalidate_matching(self, **fields):
+        """Drop cached tenants whose fields equal `fields`, e.g. owner_id=3."""
+        with self._lock:
+            for key, (tenant, _) in list(self._entries.items()):
+                if tenant is not None and all(
+                    getattr(tenant, name) == value for name, value in fields.items()
+                ):
+                    del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+store_resolver = StoreResolver()
+
+
+def request_tenant(request, store_name):
+    """
+    Return the Tenant attached to `request` by TenantMiddleware, resolving
+    `store_name` when the middleware did not.
+    """
+    return getattr(request, "tenant", None) or store_resolver.resolve(store_name)
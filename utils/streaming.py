@@ -0,0 +1,38 @@
+import json
+from itertools import islice
+
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+
+def iter_chunks(queryset, chunk_size):
+    """Evaluate `queryset` `chunk_size` rows at a time, prefetches included."""
+    rows = queryset.iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def stream_json_array(queryset, serializer_class, context=None, chunk_size=500):
+    """
+    Yield a JSON array of every row of `queryset`, serialized one chunk at
+    a time so memory stays flat. The opening bracket goes out before the
+    first query runs.
+    """
+    yield "["
+    separator = ""
+    for chunk in iter_chunks(queryset, chunk_size):
+        data = serializer_class(chunk, many=True, context=context).data
+        for item in data:
+            yield separator + json.dumps(item, cls=JSONEncoder)
+            separator = ","
+    yield "]"
+
+
+def json_array_response(queryset, serializer_class, context=None, chunk_size=500):
+    return StreamingHttpResponse(
+        stream_json_array(queryset, serializer_class, context, chunk_size),
+        content_type="application/json",
+    )
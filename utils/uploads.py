@@ -0,0 +1,296 @@
+import base64
+import hashlib
+import mimetypes
+
+from django.conf import settings
+from django.core import signing
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import transaction
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseBadRequest,
+    HttpResponseForbidden,
+)
+from django.urls import reverse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+from rest_framework import serializers, status
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from utils.storage import blob_path, claim_blobs, content_hash, release_blobs, unwrap
+
+
+TICKET_SALT = "utils.uploads.ticket"
+LOCAL_UPLOAD_SALT = "utils.uploads.local"
+
+# Accepted uploads and the extension their blob is stored under
+CONTENT_TYPES = {
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+    "image/webp": ".webp",
+    "image/gif": ".gif",
+}
+
+# Presign parameters a client must echo back as headers on its PUT
+PARAMETER_HEADERS = {
+    "ACL": "x-amz-acl",
+    "CacheControl": "Cache-Control",
+}
+
+
+class UploadTicketSerializer(serializers.Serializer):
+    content_type = serializers.ChoiceField(choices=list(CONTENT_TYPES))
+    size = serializers.IntegerField(min_value=1)
+    sha256 = serializers.RegexField(r"^[0-9a-f]{64}$")
+
+    def validate_size(self, value):
+        if value > settings.UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(
+                f"Files larger than {settings.UPLOAD_MAX_SIZE} bytes are not accepted."
+            )
+        return value
+
+
+def presigned_put(storage, name, content_type, sha256):
+    """
+    Return `(url, headers)` letting a client PUT `name` straight into the
+    storage. The SHA-256 checksum is part of the signature, so the storage
+    rejects any other content.
+    """
+    storage = unwrap(storage)
+    if hasattr(storage, "presigned_put"):
+        return storage.presigned_put(name, content_type, sha256)
+
+    # S3-compatible backends (django-storages S3Storage, e.g. R2)
+    checksum = base64.b64encode(bytes.fromhex(sha256)).decode()
+    params = {
+        "Bucket": storage.bucket_name,
+        "Key": storage._normalize_name(name),
+        "ContentType": content_type,
+        "ChecksumSHA256": checksum,
+        **storage.get_object_parameters(name),
+    }
+    if storage.default_acl:
+        params["ACL"] = storage.default_acl
+
+    url = storage.bucket.meta.client.generate_presigned_url(
+        "put_object",
+        Params=params,
+        ExpiresIn=settings.UPLOAD_TICKET_MAX_AGE,
+        HttpMethod="PUT",
+    )
+    headers = {"Content-Type": content_type, "x-amz-checksum-sha256": checksum}
+    for param, header in PARAMETER_HEADERS.items():
+        if param in params:
+            headers[header] = params[param]
+    return url, headers
+
+
+def issue_upload_ticket(user, model, field_name, data):
+    """
+    Validate an upload request for `model.field_name` and return the ticket
+    payload: the signed ticket, the presigned PUT (unless the blob already
+    exists, in which case the client can finalize right away) and its
+    headers.
+    """
+    serializer = UploadTicketSerializer(data=data)
+    serializer.is_valid(raise_exception=True)
+    content_type = serializer.validated_data["content_type"]
+    sha256 = serializer.validated_data["sha256"]
+
+    name = blob_path(sha256, CONTENT_TYPES[content_type])
+    ticket = signing.dumps(
+        {
+            "user": user.pk,
+            "target": f"{model._meta.label}.{field_name}",
+            "name": name,
+            "size": serializer.validated_data["size"],
+            "sha256": sha256,
+            "content_type": content_type,
+        },
+        salt=TICKET_SALT,
+        compress=True,
+    )
+
+    storage = model._meta.get_field(field_name).storage
+    payload = {"ticket": ticket, "exists": storage.exists(name)}
+    if payload["exists"]:
+        payload["upload_url"], payload["headers"] = None, {}
+    else:
+        payload["upload_url"], payload["headers"] = presigned_put(
+            storage, name, content_type, sha256
+        )
+    return payload
+
+
+def stored_object_metadata(storage, name):
+    """
+    Return `{"size", "content_type", "sha256"}` of the stored object `name`
+    from the storage's metadata, without downloading it: a HEAD request on
+    S3-compatible backends. `sha256` is the checksum a presigned PUT was
+    signed with, or None for objects the app stored itself.
+    """
+    storage = unwrap(storage)
+    if hasattr(storage, "object_metadata"):
+        return storage.object_metadata(name)
+
+    # S3-compatible backends (django-storages S3Storage, e.g. R2)
+    head = storage.bucket.meta.client.head_object(
+        Bucket=storage.bucket_name,
+        Key=storage._normalize_name(name),
+        ChecksumMode="ENABLED",
+    )
+    checksum = head.get("ChecksumSHA256")
+    # Multipart uploads carry a checksum of checksums ("...-3")
+    if checksum and "-" not in checksum:
+        sha256 = base64.b64decode(checksum).hex()
+    else:
+        sha256 = None
+    return {
+        "size": head["ContentLength"],
+        "content_type": head.get("ContentType"),
+        "sha256": sha256,
+    }
+
+
+def uploaded_object_matches(metadata, data):
+    """
+    Whether stored object `metadata` matches the ticket `data`. Objects
+    without a SHA-256 checksum were not stored by a presigned PUT but by
+    the app, which named them by their digest.
+    """
+    return (
+        metadata["size"] == data["size"]
+        and metadata["content_type"] == data["content_type"]
+        and metadata["sha256"] in (None, data["sha256"])
+    )
+
+
+def redeem_upload_ticket(user, model, field_name, ticket):
+    """
+    Check a ticket issued for `model.field_name` and the object uploaded
+    with it, returning the stored name to record on the row. The object's
+    size, content type and checksum must match the ticket; it is decoded
+    and measured later by the derivative worker. Call inside the
+    transaction that records it.
+    """
+    try:
+        data = signing.loads(
+            ticket or "", salt=TICKET_SALT, max_age=settings.UPLOAD_TICKET_MAX_AGE
+        )
+    except signing.BadSignature:
+        raise ValidationError({"ticket": "Invalid or expired upload ticket."})
+
+    if data["user"] != user.pk or data["target"] != f"{model._meta.label}.{field_name}":
+        raise ValidationError({"ticket": "This ticket was issued for another upload."})
+
+    storage = model._meta.get_field(field_name).storage
+    # Also locks the blob until the row referencing it is written
+    if claim_blobs([data["name"]], storage):
+        raise ValidationError({"ticket": "The file has not been uploaded yet."})
+    if not uploaded_object_matches(stored_object_metadata(storage, data["name"]), data):
+        # The blob name promises this content: drop the object, unless rows
+        # already use it, so that the next ticket asks for a fresh upload
+        release_blobs({data["name"]: []}, storage)
+        raise ValidationError({"ticket": "The uploaded file does not match the ticket."})
+    return data["name"]
+
+
+class DirectUploadView(APIView):
+    """
+    Two-step upload of one image field that keeps the file off the app
+    server:
+
+    1. POST `.../ticket/` with `content_type`, `size` and `sha256` returns
+       a ticket and a presigned PUT URL (and the headers to send with it).
+    2. After the PUT, POST `.../finalize/` with the ticket records the file.
+
+    Routes pass `step` ("ticket" or "finalize") as a URL kwarg. Subclasses
+    set `upload_model`/`upload_field` (or override `get_upload_target`),
+    return the row concerned from `get_object` and implement `finalize`.
+    """
+
+    permission_classes = [IsAuthenticated]
+    upload_model = None
+    upload_field = None
+
+    def get_upload_target(self, **kwargs):
+        return self.upload_model, self.upload_field
+
+    def get_object(self, request, **kwargs):
+        raise NotImplementedError
+
+    def finalize(self, request, obj, name, **kwargs):
+        raise NotImplementedError
+
+    def post(self, request, step, **kwargs):
+        model, field_name = self.get_upload_target(**kwargs)
+        obj = self.get_object(request, **kwargs)
+
+        if step == "ticket":
+            payload = issue_upload_ticket(request.user, model, field_name, request.data)
+            return Response(payload, status=status.HTTP_201_CREATED)
+
+        with transaction.atomic():
+            name = redeem_upload_ticket(
+                request.user, model, field_name, request.data.get("ticket")
+            )
+            return self.finalize(request, obj, name, **kwargs)
+
+
+class LocalUploadStorage(FileSystemStorage):
+    """
+    File system storage accepting presigned PUTs, standing in for an
+    S3-compatible bucket in development and tests. Uploads go to
+    `local_upload`, which checks the signature and checksum like S3 would.
+    """
+
+    def presigned_put(self, name, content_type, sha256):
+        token = signing.dumps(
+            {"name": name, "content_type": content_type, "sha256": sha256},
+            salt=LOCAL_UPLOAD_SALT,
+        )
+        url = reverse("local-upload", args=[token])
+        return url, {"Content-Type": content_type}
+
+    def object_metadata(self, name):
+        # Hashes the file on disk, where reading it costs what a HEAD costs
+        # a bucket. Like S3, any other content fails the checksum.
+        with self.open(name, "rb") as content:
+            sha256 = content_hash(File(content))
+        return {
+            "size": self.size(name),
+            "content_type": mimetypes.guess_type(name)[0],
+            "sha256": sha256,
+        }
+
+
+@csrf_exempt
+@require_http_methods(["PUT"])
+def local_upload(request, token):
+    """PUT endpoint behind LocalUploadStorage presigned URLs."""
+    storage = unwrap(default_storage)
+    if not isinstance(storage, LocalUploadStorage):
+        raise Http404()
+
+    try:
+        data = signing.loads(
+            token, salt=LOCAL_UPLOAD_SALT, max_age=settings.UPLOAD_TICKET_MAX_AGE
+        )
+    except signing.BadSignature:
+        return HttpResponseForbidden("Invalid or expired upload URL.")
+
+    if request.content_type != data["content_type"]:
+        return HttpResponseBadRequest("Content-Type does not match the signature.")
+    body = request.body
+    if hashlib.sha256(body).hexdigest() != data["sha256"]:
+        return HttpResponseBadRequest("Checksum does not match the signature.")
+
+    if not storage.exists(data["name"]):
+        storage.save(data["name"], ContentFile(body))
+    return HttpResponse(status=200)